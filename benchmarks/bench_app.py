@@ -0,0 +1,112 @@
+"""
+Measure app cold-start and rerun latency with Streamlit's AppTest (no server or browser).
+
+Usage: python benchmarks/bench_app.py [--tabs "VaR Analysis" ...] [--repeat 5] [--output results.json]
+
+cold_start: first run of the Overview tab in a fresh interpreter, with the number of modules it
+    imported and which heavy dependencies were among them
+first_run: the run that navigates to a tab (lazy imports and cache misses included)
+rerun: median time of a plain rerun on a tab afterwards, which is what every widget change costs
+
+Prices come from the price store, so set PRICE_SOURCE_DIR (and PRICE_STORE_DIR) to run offline.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "src", "app.py")
+DEFAULT_OUTPUT = os.path.join(HERE, "results", "app.json")
+TABS = ["Market Data and Trends", "VaR Analysis", "Portfolio Risk Analysis", "Stress Testing and Scenario Analysis",
+        "Alerts and Monitoring"]
+HEAVY_MODULES = ["yfinance", "plotly", "scipy", "pyarrow", "matplotlib"]
+PORTFOLIO = [("FRPT", 0.6), ("AAPL", 0.4)]
+
+
+def cold_start():
+    """First Overview run in this (fresh) interpreter."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+    before = set(sys.modules)
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    loaded = set(sys.modules) - before
+    return {
+        "import_streamlit": imported - start,
+        "first_run": time.perf_counter() - imported,
+        "modules_loaded": len(loaded),
+        "heavy_modules": sorted(m for m in HEAVY_MODULES if m in loaded),
+        "exceptions": [e.value for e in at.exception],
+    }
+
+
+def set_portfolio(at, portfolio=PORTFOLIO):
+    """Enter a portfolio in the sidebar and submit it."""
+    for _ in range(len(portfolio) - 1):
+        at.sidebar.button(key="add_stock_button").click().run()
+    for i, (asset, weight) in enumerate(portfolio):
+        at.sidebar.text_input(key=f"asset_{i}").set_value(asset)
+        at.sidebar.number_input(key=f"weight_{i}").set_value(weight)
+    submit = [b for b in at.sidebar.button if b.label == "Apply"]
+    if submit:
+        submit[0].click()
+    at.run()
+
+
+def tab_latency(tabs, repeat):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    set_portfolio(at)
+    results = {}
+    for tab in tabs:
+        start = time.perf_counter()
+        at.sidebar.radio(key="navigation_tabs").set_value(tab).run()
+        first = time.perf_counter() - start
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            at.run()
+            timings.append(time.perf_counter() - start)
+        results[tab] = {"first_run": first, "rerun": statistics.median(timings),
+                        "exceptions": [e.value for e in at.exception]}
+        print(f"{tab:<40} first {first * 1000:>8.0f} ms   rerun {results[tab]['rerun'] * 1000:>8.0f} ms", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tabs", nargs="+", default=TABS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--cold", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold:
+        print(json.dumps(cold_start()))
+        return 0
+    # A child interpreter so nothing is imported or cached yet
+    child = subprocess.run([sys.executable, __file__, "--cold"], capture_output=True, text=True, check=True)
+    cold = json.loads(child.stdout.strip().splitlines()[-1])
+    print(f"cold start: streamlit import {cold['import_streamlit'] * 1000:.0f} ms, first run "
+          f"{cold['first_run'] * 1000:.0f} ms, {cold['modules_loaded']} modules "
+          f"(heavy: {', '.join(cold['heavy_modules']) or 'none'})", flush=True)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cold_start": cold,
+        "tabs": tab_latency(args.tabs, args.repeat),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Benchmark the risk hot paths on synthetic prices and flag regressions against a baseline.
+
+Usage: python benchmarks/bench_risk.py [--assets 10 100 1000] [--years 1 5] [--full]
+                                       [--output results.json] [--save-baseline] [--tolerance 0.25]
+                                       [--check-time]
+
+Every case runs ``--repeat`` times for the best wall time, then once more under tracemalloc for
+the peak traced memory and the number of allocations (the blocks held after the call by every
+source line that allocated during it).
+Results are written as JSON; cases whose peak memory or allocations exceed the stored baseline by
+more than the tolerance are reported and make the script exit with status 1. Wall times vary from
+run to run on the same machine, so they are only gated with ``--check-time``. Runs offline.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from synthetic import synthetic_prices  # noqa: E402
+from utils.monte_carlo import simulate_var  # noqa: E402
+from utils.returns_block import ReturnsBlock  # noqa: E402
+from utils.risk_state import RiskState  # noqa: E402
+from utils.scenarios import evaluate, factor_exposures, historical_moves, load_library, shock_matrix  # noqa: E402
+from utils.var_engine import CONFIDENCE_GRID, VarTable, historical_var_cvar  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(HERE, "results", "latest.json")
+QUICK_GRID = {"assets": [10, 100, 1000], "years": [1, 5]}
+FULL_GRID = {"assets": [10, 100, 1000, 5000], "years": [1, 5, 20]}
+MONTE_CARLO_PATHS = 10_000
+# Differences below these are measurement noise, whatever the relative change
+NOISE_FLOOR = {"seconds": 0.025, "peak_bytes": 256 * 1024, "allocations": 100}
+GATED_METRICS = ("peak_bytes", "allocations")
+
+
+def _equal_weights(n):
+    return np.full(n, 1.0 / n)
+
+
+def _returns(prices):
+    return prices.pct_change().iloc[1:]
+
+
+def _monte_carlo_setup(prices):
+    return _returns(prices).to_numpy(), _equal_weights(prices.shape[1])
+
+
+def _monte_carlo(context):
+    returns, weights = context
+    # Chunks of about 2M draws keep memory flat as the asset count grows
+    chunk_size = max(100, 2_000_000 // returns.shape[1])
+    return simulate_var(returns, weights, 0.95, method="bootstrap", n_paths=MONTE_CARLO_PATHS,
+                        chunk_size=chunk_size, seed=0)
+
+
+def _float32_returns(prices):
+    return ReturnsBlock.from_prices(prices, np.float32)
+
+
+def _state_setup(prices):
+    return RiskState(prices), _equal_weights(prices.shape[1])
+
+
+def _stress_setup(prices):
+    # The first assets stand in for the library's factor proxies
+    state = RiskState(prices)
+    factors, scenarios = load_library()
+    proxies = dict(zip(factors, state.assets))
+    factor_returns = state.returns[list(proxies.values())].set_axis(list(factors), axis=1)
+    return state, prices, scenarios, factor_returns, proxies, _equal_weights(len(state.assets))
+
+
+def _window_prices(prices):
+    return lambda tickers, start, end: prices.loc[start:end - np.timedelta64(1, "D"), tickers]
+
+
+def _stress(context):
+    state, prices, scenarios, factor_returns, proxies, weights = context
+    exposures = factor_exposures(state.returns, factor_returns)
+    moves = historical_moves(scenarios, state.assets, _window_prices(prices))
+    shocks = shock_matrix(scenarios, state.assets, exposures, moves, proxies)
+    return evaluate(shocks, weights).min()
+
+
+# name -> (setup(prices) -> context, run(context)); only run is measured
+CASES = {
+    "historical_var": (_returns, lambda returns: historical_var_cvar(returns, CONFIDENCE_GRID)),
+    "var_table": (_returns, VarTable),
+    "monte_carlo_var": (_monte_carlo_setup, _monte_carlo),
+    "var_table_float32": (_float32_returns, VarTable),
+    "returns_block_float32": (lambda prices: prices, _float32_returns),
+    "risk_state": (lambda prices: prices, lambda prices: RiskState(prices).correlation_frame()),
+    "risk_state_float32": (lambda prices: prices, lambda prices: RiskState(prices, dtype=np.float32).correlation_frame()),
+    "portfolio_returns": (_state_setup, lambda context: context[0].portfolio_returns(context[1])),
+    "stress_scenarios": (_stress_setup, _stress),
+}
+
+
+def measure(run, context, repeat):
+    """
+    :return: Dict with the best wall time (s), peak traced memory (bytes) and allocations
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(context)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = run(context)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+    del result
+    return {"seconds": min(timings), "peak_bytes": peak, "allocations": allocations}
+
+
+def run_suite(assets, years, cases, repeat, seed):
+    results = {}
+    for n_assets in assets:
+        for n_years in years:
+            prices = synthetic_prices(n_assets, n_years, seed=seed)
+            for name in cases:
+                setup, run = CASES[name]
+                key = f"{name}[{n_assets}x{n_years}y]"
+                results[key] = {"case": name, "assets": n_assets, "years": n_years,
+                                **measure(run, setup(prices), repeat)}
+                print(f"{key:<40} {results[key]['seconds'] * 1000:>10.1f} ms {results[key]['peak_bytes'] / 2 ** 20:>10.1f} MiB"
+                      f" {results[key]['allocations']:>10} allocs", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance, metrics=GATED_METRICS):
+    """
+    :param metrics: Metrics to gate on; peak memory and allocations by default, add "seconds" to
+        gate wall times too
+    :return: List of (key, metric, baseline value, current value) where current exceeds
+        baseline * (1 + tolerance) by more than the noise floor
+    """
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in metrics:
+            if metric not in reference:
+                continue
+            excess = current[metric] - reference[metric]
+            if current[metric] > reference[metric] * (1 + tolerance) and excess > NOISE_FLOOR[metric]:
+                regressions.append((key, metric, reference[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, nargs="+")
+    parser.add_argument("--years", type=int, nargs="+")
+    parser.add_argument("--full", action="store_true", help="Up to 5,000 assets and 20 years")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed growth before flagging (0.25 = 25%%)")
+    parser.add_argument("--check-time", action="store_true", help="Also flag wall-time regressions")
+    args = parser.parse_args()
+
+    grid = FULL_GRID if args.full else QUICK_GRID
+    results = run_suite(args.assets or grid["assets"], args.years or grid["years"], args.cases, args.repeat, args.seed)
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    metrics = GATED_METRICS + ("seconds",) if args.check_time else GATED_METRICS
+    regressions = compare(results, baseline, args.tolerance, metrics)
+    for key, metric, reference, current in regressions:
+        print(f"REGRESSION {key} {metric}: {reference:.4g} -> {current:.4g} ({current / reference - 1:+.0%})")
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,23 @@
+import importlib
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-from datetime import datetime
-from layouts import market_data, overview, var_analysis, portfolio_risk, stress_testing
+from layouts.session import portfolio_fingerprint, portfolio_tickers, session_memo
+from utils.instrumentation import get_metrics, span
+
+# Tab -> layout module, imported on first navigation so the Overview starts without plotly or scipy
+TABS = {
+    "Overview": "overview",
+    "Market Data and Trends": "market_data",
+    "VaR Analysis": "var_analysis",
+    "Portfolio Risk Analysis": "portfolio_risk",
+    "Stress Testing and Scenario Analysis": "stress_testing",
+    "Multi-Portfolio Risk": "books",
+    "Live Risk": "live",
+    "Alerts and Monitoring": "alerts",
+    "News and Sentiment": "news",
+}
+
+get_metrics().start_rerun()
 
 
 # Global Inputs (Sidebar)
@@ -22,21 +36,27 @@ def remove_stock():
     if len(st.session_state["portfolio"]) > 1:
         st.session_state["portfolio"].pop()
 
-# Display portfolio input fields
-for i, stock in enumerate(st.session_state["portfolio"]):
-    st.sidebar.text_input(f"Ticker {i + 1}:", value=stock["Asset"], key=f"asset_{i}")
-    st.sidebar.number_input(
-        f"Weight {i + 1}:", min_value=0.0, max_value=1.0, step=0.01, value=stock["Weight"], key=f"weight_{i}"
-    )
+# Display portfolio input fields; edits are applied together, so typing a weight doesn't rerun the tab
+with st.sidebar.form("portfolio_form"):
+    for i, stock in enumerate(st.session_state["portfolio"]):
+        st.text_input(f"Ticker {i + 1}:", value=stock["Asset"], key=f"asset_{i}")
+        st.number_input(
+            f"Weight {i + 1}:", min_value=0.0, max_value=1.0, step=0.01, value=stock["Weight"], key=f"weight_{i}"
+        )
+    st.form_submit_button("Apply")
 
 # Buttons to add/remove stocks
 st.sidebar.button("Add Stock", on_click=add_stock, key="add_stock_button")
 st.sidebar.button("Remove Stock", on_click=remove_stock, key="remove_stock_button")
 
-# Convert session state to portfolio DataFrame
-portfolio_df = pd.DataFrame(
-    [{"Asset": st.session_state[f"asset_{i}"], "Weight": st.session_state[f"weight_{i}"]} for i in range(len(st.session_state["portfolio"]))]
+# Convert session state to portfolio DataFrame, rebuilt only when the applied inputs change; tickers
+# are normalized here once, so every tab sees (and caches under) the same names
+rows = tuple(
+    (st.session_state[f"asset_{i}"].strip().upper(), st.session_state[f"weight_{i}"])
+    for i in range(len(st.session_state["portfolio"]))
 )
+portfolio_df = session_memo("portfolio_df", rows, lambda: pd.DataFrame(rows, columns=["Asset", "Weight"]))
+fingerprint = portfolio_fingerprint(portfolio_df)
 
 # Validate portfolio weights
 if portfolio_df["Weight"].sum() != 1.0:
@@ -60,34 +80,55 @@ granularity = st.sidebar.selectbox("Select Data Granularity:", ["Daily", "Weekly
 st.sidebar.title("Navigation")
 selected_tab = st.sidebar.radio(
     "Choose a tab:",
-    ["Overview", "Market Data and Trends", "VaR Analysis", "Portfolio Risk Analysis", "Stress Testing and Scenario Analysis"],
+    list(TABS),
     key="navigation_tabs"
 )
 
-# Display Selected Tab
-if selected_tab == "Overview":
-    overview.display()
-elif selected_tab == "Market Data and Trends":
-    market_data.display(portfolio_df, focused_stock, start_date, end_date, granularity)
-elif selected_tab == "VaR Analysis":
-    var_analysis.display(portfolio_df, start_date, end_date)
-elif selected_tab == "Portfolio Risk Analysis":
-    portfolio_risk.display(portfolio_df)
-elif selected_tab == "Stress Testing and Scenario Analysis":
-    # Check if the portfolio is valid
-    if portfolio_df.empty:
-        st.warning("Please define a valid portfolio in the sidebar before performing stress testing.")
-    elif portfolio_df["Weight"].sum() != 1.0:
-        st.warning("The weights of your portfolio do not sum to 1.0. Please adjust them in the sidebar.")
-    else:
-        tickers = portfolio_df["Asset"].tolist()
-        weights = portfolio_df["Weight"].tolist()
-        try:
-            data = portfolio_risk.fetch_data(tickers, period="1y")  # Use existing fetch_data function
-            if data is not None and not data.empty:
-                portfolio_returns = portfolio_risk.calculate_portfolio_returns(data, weights)
-                stress_testing.display(portfolio_df, portfolio_returns)
+show_diagnostics = st.sidebar.checkbox("Show diagnostics", key="show_diagnostics")
+
+# Display Selected Tab; the rerun is closed even if the tab raises
+try:
+    with span(selected_tab, stage="tab"):
+        layout = importlib.import_module(f"layouts.{TABS[selected_tab]}")
+        if selected_tab == "Overview":
+            layout.display()
+        elif selected_tab == "Market Data and Trends":
+            layout.display(portfolio_df, focused_stock, start_date, end_date, granularity)
+        elif selected_tab == "VaR Analysis":
+            layout.display(portfolio_df, start_date, end_date, fingerprint)
+        elif selected_tab == "Portfolio Risk Analysis":
+            layout.display(portfolio_df, fingerprint)
+        elif selected_tab == "Stress Testing and Scenario Analysis":
+            # Check if the portfolio is valid
+            if portfolio_df.empty:
+                st.warning("Please define a valid portfolio in the sidebar before performing stress testing.")
+            elif portfolio_df["Weight"].sum() != 1.0:
+                st.warning("The weights of your portfolio do not sum to 1.0. Please adjust them in the sidebar.")
             else:
-                st.error("Failed to fetch data for the given tickers.")
-        except Exception as e:
-            st.error(f"Error fetching data or calculating returns: {e}")
+                from layouts import portfolio_risk
+
+                try:
+                    state, failures = portfolio_risk.risk_state(portfolio_tickers(portfolio_df), "1y")  # Shared with the portfolio tab
+                    if state is not None:
+                        tickers, weights = portfolio_risk.loaded_weights(portfolio_df, state.prices, failures)
+                        portfolio_returns = portfolio_risk.session_portfolio_returns(state, weights, fingerprint)
+                        layout.display(portfolio_df, portfolio_returns, tickers, weights,
+                                       portfolio_risk.state_version(state))
+                    else:
+                        st.error("Failed to fetch data for the given tickers.")
+                except Exception as e:
+                    st.error(f"Error fetching data or calculating returns: {e}")
+        elif selected_tab == "Multi-Portfolio Risk":
+            layout.display()
+        elif selected_tab == "Live Risk":
+            layout.display(portfolio_df)
+        elif selected_tab == "Alerts and Monitoring":
+            layout.display(portfolio_df, fingerprint)
+        elif selected_tab == "News and Sentiment":
+            layout.display(portfolio_df)
+finally:
+    st.session_state["last_rerun"] = get_metrics().end_rerun()
+if show_diagnostics:
+    from layouts import diagnostics
+
+    diagnostics.display()
@@ -0,0 +1,46 @@
+"""
+Headless risk reports for one or many portfolio files.
+
+    python src/cli.py portfolios/ --period 2y --confidence 0.95 0.99 --workers 4 --out results/
+
+Every CSV/Parquet file (columns Asset, Weight) is one portfolio. A single file with Portfolio,
+Asset, Weight and optional Desk columns is a book weight matrix; books are rolled up to their
+desks and the firm. Results are written as summary, drawdown, decomposition and stress Parquet
+files in the output directory.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from utils.batch import CONFIDENCE_LEVELS, load_books, run_batch, write_results
+from utils.price_store import get_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute VaR, CVaR, risk decomposition and stress results.")
+    parser.add_argument("path", help="Portfolio or book weight file (CSV/Parquet), or a directory of portfolio files")
+    parser.add_argument("--period", default="1y", help="History window, e.g. 6mo, 1y, 5y (default: 1y)")
+    parser.add_argument("--confidence", type=float, nargs="+", default=CONFIDENCE_LEVELS, help="Confidence levels")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--out", default="risk_results", help="Output directory (default: risk_results)")
+    parser.add_argument("--no-stress", action="store_true", help="Skip the scenario library")
+    parser.add_argument("--float32", action="store_true", help="Store returns as float32 to halve their memory")
+    args = parser.parse_args(argv)
+
+    weights, parents, normalize = load_books(args.path)
+    if weights.empty:
+        parser.error(f"no portfolio files found in {args.path}")
+    tables, failures = run_batch(weights, get_store(), args.period, args.confidence, stress=not args.no_stress,
+                                 max_workers=args.workers, parents=parents, normalize=normalize,
+                                 dtype=np.float32 if args.float32 else np.float64)
+    for ticker, message in failures.items():
+        print(f"warning: could not load {ticker} ({message})", file=sys.stderr)
+    for path in write_results(tables, args.out):
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,15 @@
-from .overview import display as overview_display
-from .market_data import display as market_data_display
-from .var_analysis import display as var_analysis_display
-from .portfolio_risk import display as portfolio_risk_display
+import importlib
+
+# Tab modules pull in plotly, scipy and pyarrow, so they are only imported on first use
+_DISPLAYS = {
+    "overview_display": "overview",
+    "market_data_display": "market_data",
+    "var_analysis_display": "var_analysis",
+    "portfolio_risk_display": "portfolio_risk",
+}
+
+
+def __getattr__(name):
+    if name in _DISPLAYS:
+        return importlib.import_module(f".{_DISPLAYS[name]}", __name__).display
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,110 @@
+import json
+import streamlit as st
+import pandas as pd
+from utils.alerts import METRICS, OPERATORS, AlertEngine, Rule, load_rules, metric_state
+from .portfolio_risk import append_latest_prices, loaded_weights, risk_state, state_version
+from .session import normalize_tickers, portfolio_fingerprint, portfolio_tickers, session_memo
+
+SEVERITY_ICONS = {"critical": "🔴", "warning": "🟠", "info": "🔵"}
+
+
+def rule_editor():
+    """Editable rule table; returns the valid rules and reports the invalid ones."""
+    if "alert_rules" not in st.session_state:
+        st.session_state["alert_rules"] = pd.DataFrame([
+            {**vars(rule), "assets": ", ".join(rule.assets)} for rule in load_rules()
+        ])
+    edited = st.data_editor(
+        st.session_state["alert_rules"],
+        num_rows="dynamic",
+        column_config={
+            "metric": st.column_config.SelectboxColumn("metric", options=METRICS),
+            "op": st.column_config.SelectboxColumn("op", options=OPERATORS),
+            "severity": st.column_config.SelectboxColumn("severity", options=list(SEVERITY_ICONS)),
+            "assets": st.column_config.TextColumn("assets", help="Comma-separated tickers (or Portfolio); empty for all"),
+        },
+        key="alert_rule_editor",
+        use_container_width=True,
+    )
+    rules = []
+    for row in edited.dropna(subset=["name", "metric", "op", "threshold"]).to_dict("records"):
+        assets = row.get("assets") if isinstance(row.get("assets"), str) else ""
+        severity = row.get("severity") if isinstance(row.get("severity"), str) else "warning"
+        try:
+            rules.append(Rule(row["name"], row["metric"], row["op"], float(row["threshold"]),
+                              tuple(a.strip() for a in assets.split(",") if a.strip()), severity))
+        except ValueError as e:
+            st.warning(str(e))
+    return rules
+
+
+def display(portfolio_df, fingerprint=None):
+    st.title("Alerts and Monitoring")
+    st.write("""
+        Threshold rules are checked against the latest metrics of every asset and of the portfolio in one
+        vectorized pass. An alert is raised when a condition starts to hold; it is not repeated while the
+        condition persists, nor within the cooldown of the last alert for the same rule and asset.
+    """)
+    watchlist = st.text_input("Additional tickers to monitor (comma-separated)", key="alert_watchlist")
+    universe = normalize_tickers(portfolio_tickers(portfolio_df) + tuple(watchlist.split(",")))
+    if not universe:
+        st.warning("Please define a valid portfolio in the sidebar.")
+        return
+
+    state, failures = risk_state(universe, "1y")
+    if state is None:
+        st.error("Failed to fetch data for the given tickers.")
+        return
+    held = portfolio_df.assign(Asset=portfolio_df["Asset"].str.strip().str.upper())
+    _, weights = loaded_weights(held, state.prices, failures)
+
+    columns = st.columns(3)
+    confidence_level = columns[0].slider("VaR Confidence Level (%)", 90, 99, 95, key="alert_confidence") / 100
+    cooldown = columns[1].number_input("Cooldown (minutes)", 0, 24 * 60, 15, key="alert_cooldown")
+    refresh = columns[2].selectbox("Check for new prices every", [None, 60, 300, 900],
+                                   format_func=lambda s: "Manually" if s is None else f"{s // 60} min")
+
+    with st.expander("Rules"):
+        rules = rule_editor()
+        st.download_button("Download rules", json.dumps([
+            {**vars(rule), "assets": list(rule.assets)} for rule in rules
+        ], indent=2), file_name="alert_rules.json")
+
+    # Rebuilding the engine resets de-duplication and cooldowns, so only do it when the rules change
+    key = (tuple((r.name, r.metric, r.op, r.threshold, r.assets, r.severity) for r in rules), cooldown * 60)
+    if st.session_state.get("alert_engine_key") != key:
+        history = st.session_state["alert_engine"].history if "alert_engine" in st.session_state else []
+        st.session_state["alert_engine_key"] = key
+        st.session_state["alert_engine"] = AlertEngine(rules, cooldown=cooldown * 60)
+        st.session_state["alert_engine"].history.extend(history)
+
+    @st.fragment(run_every=refresh)
+    def monitor():
+        engine = st.session_state["alert_engine"]
+        if refresh is not None or st.button("Check for new prices"):
+            appended = append_latest_prices(state)
+            st.caption(f"Appended {appended} new bar(s).")
+        metrics = session_memo(
+            "alert_metrics", (fingerprint or portfolio_fingerprint(portfolio_df), universe, state_version(state), confidence_level),
+            lambda: metric_state(state, confidence_level, weights=weights),
+        )
+        for alert in engine.update(metrics):
+            st.toast(f"{SEVERITY_ICONS.get(alert['Severity'], '')} {alert['Rule']}: {alert['Asset']} "
+                     f"{alert['Metric']} = {alert['Value']:.4g}")
+
+        st.subheader("Active Conditions")
+        active = engine.active_frame()
+        if active.empty:
+            st.success("No rule is currently triggered.")
+        else:
+            st.dataframe(active, use_container_width=True)
+
+        st.subheader("Latest Metrics")
+        st.dataframe(metrics.style.format("{:.4f}"), use_container_width=True)
+
+        st.subheader("Alert History")
+        history = engine.history_frame()
+        st.dataframe(history.iloc[::-1], use_container_width=True)
+        st.download_button("Download history", history.to_csv(index=False), file_name="alert_history.csv")
+
+    monitor()
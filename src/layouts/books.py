@@ -0,0 +1,68 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.batch import book_tables, books_from_frame, rollup
+from .charts import render
+from .diagnostics import cache_data
+from .portfolio_risk import risk_state, state_version
+
+
+@cache_data
+def books_report(weights, parents, confidence_levels, version=None):
+    """
+    Book, desk and firm tables over the shared risk state of the books' assets.
+
+    :param version: state_version of that risk state, so appended bars invalidate the report
+    """
+    state, failures = risk_state(tuple(weights.columns), "1y")
+    if state is None:
+        return None, failures
+    weights, levels = rollup(weights.reindex(columns=state.assets, fill_value=0.0), parents)
+    return book_tables(state, weights, list(confidence_levels), levels=levels), failures
+
+
+def display():
+    """
+    Risk of many books over a shared asset universe, rolled up to desks and the firm.
+    """
+    st.title("Multi-Portfolio Risk")
+    st.write("""
+        Upload a weight matrix with one row per book position (columns Portfolio, Asset, Weight and an
+        optional Desk). Every book's returns come from one matrix product over the shared returns, and
+        desks and the firm are aggregated from their books' positions.
+    """)
+    uploaded = st.file_uploader("Book weights (CSV or Parquet)", type=["csv", "parquet"])
+    if uploaded is None:
+        return
+    try:
+        frame = pd.read_parquet(uploaded) if uploaded.name.endswith(".parquet") else pd.read_csv(uploaded)
+        weights, parents = books_from_frame(frame)
+    except KeyError as e:
+        st.error(f"The file is missing the {e} column.")
+        return
+
+    confidence_level = st.slider("Confidence Level (%)", min_value=90, max_value=99, value=95, step=1) / 100
+    state, _ = risk_state(tuple(weights.columns), "1y")
+    version = state_version(state) if state is not None else None
+    tables, failures = books_report(weights, parents, (confidence_level,), version)
+    if failures:
+        st.warning("Could not load " + ", ".join(f"{t} ({msg})" for t, msg in failures.items()) + ".")
+    if tables is None:
+        st.error("Failed to fetch data for the given tickers.")
+        return
+
+    summary = tables["summary"].drop(columns="Confidence")
+    st.subheader("VaR and CVaR")
+    st.dataframe(summary)
+    fig = px.bar(summary, x="Portfolio", y=["VaR", "CVaR"], barmode="group", title="Historical VaR and CVaR by Book")
+    render(fig, "books.chart")
+
+    st.subheader("Drawdowns")
+    st.dataframe(tables["drawdown"])
+
+    st.download_button(
+        label="Download Book Risk (CSV)",
+        data=summary.merge(tables["drawdown"], on=["Portfolio", "Level"]).to_csv(index=False),
+        file_name="book_risk.csv",
+        mime="text/csv"
+    )
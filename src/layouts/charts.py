@@ -0,0 +1,102 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from utils.downsample import MAX_BARS, MAX_POINTS, downsample, histogram, ohlc_buckets
+from utils.instrumentation import count, span
+
+# Series longer than this are drawn with WebGL so panning and zooming stay smooth
+WEBGL_THRESHOLD = 5000
+
+
+def zoom_window(index, key, budget=MAX_POINTS):
+    """
+    Date range slider for series longer than the point budget.
+
+    Streamlit does not report Plotly zoom events, so zooming is a widget: narrowing the range
+    re-queries the selected window, which is downsampled again at the full budget and so shows
+    more detail the further in the user zooms.
+
+    :param index: DatetimeIndex of the series
+    :param key: Widget key
+    :param budget: Point (or bar) budget of the chart
+    :return: Tuple of (start, end) timestamps to show
+    """
+    if len(index) <= budget or not isinstance(index, pd.DatetimeIndex):
+        return index[0], index[-1]
+    first, last = index[0].date(), index[-1].date()
+    start, end = st.slider("Zoom", min_value=first, max_value=last, value=(first, last), key=key,
+                           help="Narrow the range to re-sample it at full detail.")
+    return pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(1)
+
+
+def line_trace(series, name=None, max_points=MAX_POINTS, method="lttb", **kwargs):
+    """
+    Plotly line trace of a Series downsampled to the point budget (Scattergl for long series).
+
+    :param method: "lttb" for smooth series such as prices, "minmax" for spiky ones such as returns
+    """
+    points = downsample(series, max_points, method)
+    count("chart_points_source", len(series))
+    count("chart_points_sent", len(points))
+    scatter = go.Scattergl if len(series) > WEBGL_THRESHOLD else go.Scatter
+    return scatter(x=points.index, y=points.to_numpy(), mode="lines", name=name or series.name, **kwargs)
+
+
+def render(fig, name, **kwargs):
+    """Send a figure to the browser, timed as a render span."""
+    with span(name, stage="render"):
+        st.plotly_chart(fig, **kwargs)
+
+
+def line_chart(data, key, title=None, max_points=MAX_POINTS, method="lttb", area=False, name="line_chart"):
+    """
+    Downsampled replacement for ``st.line_chart``/``st.area_chart`` with a zoom window.
+
+    :param data: Series or DataFrame (one trace per column) indexed by date
+    :param key: Widget key of the zoom slider
+    """
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    start, end = zoom_window(frame.index, key, max_points)
+    frame = frame.loc[start:end]
+    fig = go.Figure()
+    for column in frame.columns:
+        fig.add_trace(line_trace(frame[column], str(column), max_points, method,
+                                 fill="tozeroy" if area else None))
+    fig.update_layout(title=title, showlegend=len(frame.columns) > 1, margin=dict(t=40 if title else 10))
+    render(fig, name, use_container_width=True)
+
+
+def candlestick_chart(data, key, title=None, max_bars=MAX_BARS, name="candlestick_chart"):
+    """
+    Candlestick chart with consecutive bars aggregated into at most ``max_bars`` OHLC buckets.
+
+    :param data: DataFrame with Open, High, Low and Close columns indexed by date
+    :param key: Widget key of the zoom slider
+    """
+    start, end = zoom_window(data.index, key, max_bars)
+    bars = ohlc_buckets(data.loc[start:end], max_bars)
+    count("chart_points_source", len(data.loc[start:end]))
+    count("chart_points_sent", len(bars))
+    fig = go.Figure(data=[go.Candlestick(
+        x=bars.index, open=bars["Open"], high=bars["High"], low=bars["Low"], close=bars["Close"]
+    )])
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title="Price", xaxis_rangeslider_visible=False)
+    render(fig, name, use_container_width=True)
+
+
+def histogram_chart(values, title=None, bins=50, markers=None, name="histogram_chart"):
+    """
+    Histogram binned on the server, with optional vertical marker lines.
+
+    :param values: Observations
+    :param markers: Dict of label -> (x, color) for dashed vertical lines (e.g. VaR, CVaR)
+    """
+    centers, counts, width = histogram(values, bins)
+    count("chart_points_source", len(values))
+    count("chart_points_sent", len(counts))
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=width, marker_color="gray", opacity=0.7, name="Observations"))
+    for label, (x, color) in (markers or {}).items():
+        fig.add_vline(x=x, line_dash="dash", line_color=color, line_width=2)
+        fig.add_trace(go.Scatter(x=[x, x], y=[0, 0], mode="lines", line=dict(color=color, dash="dash"), name=label))
+    fig.update_layout(title=title, bargap=0, yaxis_title="Frequency")
+    render(fig, name, use_container_width=True)
@@ -0,0 +1,88 @@
+import functools
+import json
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.instrumentation import BUCKETS_MS, STAGES, get_metrics, span
+
+
+def _instrumented(cache_decorator, func, options):
+    name = func.__qualname__
+    metrics = get_metrics()
+
+    # The body only runs on a cache miss
+    @functools.wraps(func)
+    def compute(*args, **kwargs):
+        metrics.cache_call(name, miss=True)
+        return func(*args, **kwargs)
+
+    cached = cache_decorator(**options)(compute)
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        metrics.cache_call(name)
+        with span(name, stage="cache"):
+            return cached(*args, **kwargs)
+
+    call.clear = cached.clear
+    return call
+
+
+def cache_data(func=None, **options):
+    """``st.cache_data`` that also counts calls and misses and times every call."""
+    if func is None:
+        return lambda f: _instrumented(st.cache_data, f, options)
+    return _instrumented(st.cache_data, func, options)
+
+
+def cache_resource(func=None, **options):
+    """``st.cache_resource`` that also counts calls and misses and times every call."""
+    if func is None:
+        return lambda f: _instrumented(st.cache_resource, f, options)
+    return _instrumented(st.cache_resource, func, options)
+
+
+def display():
+    """
+    Sidebar diagnostics: time of the last rerun by stage, span latencies, cache hit rates,
+    bytes fetched and a latency histogram, with the full metrics snapshot as a JSON download.
+    """
+    metrics = get_metrics()
+    # Spans of this session's last rerun, stored by the app when the rerun ended
+    last_rerun = st.session_state.get("last_rerun", [])
+    snapshot = metrics.snapshot(last_rerun)
+    panel = st.sidebar.expander("Diagnostics", expanded=True)
+
+    rerun_ms = next((s["ms"] for s in snapshot["last_rerun"] if s["name"] == "rerun"), None)
+    if rerun_ms is not None:
+        panel.write(f"**Last rerun:** {rerun_ms:.0f} ms (rerun #{snapshot['rerun']})")
+    breakdown = metrics.stage_breakdown(last_rerun)
+    if breakdown:
+        stages = pd.DataFrame(
+            [{"Stage": stage, "ms": breakdown[stage]} for stage in STAGES if stage in breakdown]
+        )
+        panel.dataframe(stages, hide_index=True)
+
+    panel.write(f"**Bytes fetched:** {snapshot['counters'].get('bytes_fetched', 0) / 2 ** 20:.2f} MiB")
+
+    if snapshot["cache"]:
+        panel.write("**Cache**")
+        panel.dataframe(pd.DataFrame(snapshot["cache"]).round({"hit_rate": 2}), hide_index=True)
+
+    if snapshot["spans"]:
+        panel.write("**Spans**")
+        spans = pd.DataFrame(snapshot["spans"])
+        panel.dataframe(spans.round(1), hide_index=True)
+        selected = panel.selectbox("Latency histogram:", spans["name"].tolist(), key="diagnostics_span")
+        labels = [f"<{b}" for b in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}"]
+        histogram = pd.DataFrame({"ms": labels, "Calls": snapshot["histograms"][selected]})
+        fig = px.bar(histogram, x="ms", y="Calls", title=selected)
+        fig.update_layout(height=250, margin=dict(l=0, r=0, t=30, b=0))
+        panel.plotly_chart(fig, use_container_width=True)
+
+    panel.download_button(
+        label="Download Metrics (JSON)",
+        data=json.dumps(snapshot, indent=2, default=str),
+        file_name="metrics.json",
+        mime="application/json"
+    )
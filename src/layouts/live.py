@@ -0,0 +1,95 @@
+import uuid
+
+import streamlit as st
+from utils.batch import align_weights
+from utils.price_store import get_store, period_to_range
+from utils.streaming import DEFAULT_REPLAY_PATH, LiveRisk, ReplayFeed, Streamer
+from .charts import line_chart
+from .diagnostics import cache_resource
+from .session import portfolio_tickers
+
+
+# Streamers kept at once; the least recently used one is stopped when another is created
+MAX_STREAMERS = 8
+
+
+# One producer per ticker set, shared by every session and started by its first subscriber
+@cache_resource(max_entries=MAX_STREAMERS, on_release=lambda stream: stream.stop())
+def streamer(tickers, interval):
+    """
+    Streamer of bars for the tickers.
+
+    Replays ``STREAM_REPLAY_PATH`` when set, otherwise the last two years of stored daily bars,
+    looping so the stream never runs dry.
+    """
+    if DEFAULT_REPLAY_PATH:
+        feed = ReplayFeed.from_path(DEFAULT_REPLAY_PATH, list(tickers), interval=interval, loop=True)
+    else:
+        store = get_store()
+        start, end = period_to_range("2y")
+        feed = ReplayFeed({t: store.get(t, start, end) for t in tickers}, interval=interval, loop=True)
+    return Streamer(feed)
+
+
+def display(portfolio_df):
+    st.title("Live Risk")
+    st.write("""
+        Streamed bars are kept in fixed-size ring buffers per ticker. Every refresh reads only the new
+        bars and updates returns and portfolio VaR incrementally, so nothing is refetched and memory
+        stays flat however long the session runs.
+    """)
+    if portfolio_df.empty or portfolio_df["Asset"].str.strip().eq("").any():
+        st.warning("Please define a valid portfolio in the sidebar.")
+        return
+
+    tickers = portfolio_tickers(portfolio_df)
+    weights = align_weights(portfolio_df.assign(Asset=portfolio_df["Asset"].str.strip().str.upper()), list(tickers))
+    bar_interval = st.select_slider("Seconds between bars", [0.1, 0.25, 0.5, 1.0, 2.0], value=0.5)
+    refresh = st.select_slider("Refresh every (seconds)", [1, 2, 5, 10], value=2)
+    confidence_level = st.slider("Confidence Level (%)", 90, 99, 95, key="live_confidence") / 100
+
+    # Start and Stop only subscribe and unsubscribe this session; other sessions keep streaming
+    session = st.session_state.setdefault("live_session", uuid.uuid4().hex)
+    stream = streamer(tickers, bar_interval)
+    previous = st.session_state.get("live_stream")
+    if previous is not None and previous is not stream:
+        previous.unsubscribe(session)
+    st.session_state["live_stream"] = stream
+    if not st.session_state.get("live_paused"):
+        stream.subscribe(session)
+    columns = st.columns(2)
+    if columns[0].button("Start stream", disabled=stream.subscribed(session)):
+        st.session_state["live_paused"] = False
+        stream.subscribe(session)
+    if columns[1].button("Stop stream", disabled=not stream.subscribed(session)):
+        st.session_state["live_paused"] = True
+        stream.unsubscribe(session)
+
+    key = (tickers, tuple(weights), bar_interval)
+    if st.session_state.get("live_risk_key") != key:
+        st.session_state["live_risk_key"] = key
+        st.session_state["live_risk"] = LiveRisk(tickers, weights)
+
+    @st.fragment(run_every=refresh if stream.subscribed(session) else None)
+    def live_panel():
+        live = st.session_state["live_risk"]
+        processed = live.update(stream.store)
+        metrics = live.var(confidence_level)
+        if metrics is None:
+            st.info("Waiting for bars...")
+            return
+        cols = st.columns(4)
+        cols[0].metric("Historical VaR", f"{metrics['VaR']:.2%}")
+        cols[1].metric("Expected Shortfall", f"{metrics['ES']:.2%}")
+        cols[2].metric("Parametric VaR", f"{metrics['Parametric VaR']:.2%}")
+        cols[3].metric("Bars in window", metrics["Bars"], delta=processed or None)
+
+        latest = stream.store.prices(list(tickers)).ffill().tail(1)
+        st.dataframe(latest)
+        line_chart(live.value_path(), key="live_value_zoom", title="Portfolio Value (streamed bars)", name="live.chart")
+        st.caption(
+            f"Last bar: {live.last_time} | buffered bars: "
+            f"{sum(len(b) for b in stream.store.buffers.values())} | buffer memory: {stream.store.nbytes / 2 ** 10:.0f} KiB"
+        )
+
+    live_panel()
@@ -1,16 +1,17 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
 from datetime import datetime
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+from utils.price_store import get_store
+from .charts import candlestick_chart, line_chart
+from .diagnostics import cache_data
 
-@st.cache_data
+@cache_data
 def fetch_stock_data(stock, start_date, end_date, granularity):
     """
-    Fetch historical stock data using yfinance.
+    Fetch historical stock data from the local price store, topping it up from yfinance.
     :param stock: Stock ticker (string)
     :param start_date: Start date for historical data (datetime)
     :param end_date: End date for historical data (datetime)
@@ -18,13 +19,9 @@ def fetch_stock_data(stock, start_date, end_date, granularity):
     :return: Pandas DataFrame with stock data
     """
     try:
-        interval = {"Daily": "1d", "Weekly": "1wk", "Monthly": "1mo"}[granularity]
-        data = yf.download(stock, start=start_date, end=end_date, interval=interval, auto_adjust=False)
+        data = get_store().get(stock, start_date, end_date, granularity)
         if data.empty:
             return None
-        # Flatten Multi-Index if needed
-        if isinstance(data.columns, pd.MultiIndex):
-            data.columns = [' '.join(col).strip() if isinstance(col, tuple) else col for col in data.columns]
         return data
     except Exception as e:
         return str(e)
@@ -66,15 +63,9 @@ def display(portfolio_df, focused_stock, start_date, end_date, granularity):
             close_col = next((col for col in data.columns if 'close' in col.lower()), None)
 
             if all([open_col, high_col, low_col, close_col]):
-                candlestick = go.Figure(data=[go.Candlestick(
-                    x=data.index,
-                    open=data[open_col],
-                    high=data[high_col],
-                    low=data[low_col],
-                    close=data[close_col]
-                )])
-                candlestick.update_layout(title=f"{focused_stock.upper()} Candlestick Chart", xaxis_title="Date", yaxis_title="Price")
-                st.plotly_chart(candlestick, use_container_width=True)
+                ohlc = data[[open_col, high_col, low_col, close_col]].set_axis(["Open", "High", "Low", "Close"], axis=1)
+                candlestick_chart(ohlc, key="market_data_candles_zoom", title=f"{focused_stock.upper()} Candlestick Chart",
+                                  name="market_data.chart")
             else:
                 st.warning("Required columns for candlestick chart not found.")
 
@@ -83,9 +74,9 @@ def display(portfolio_df, focused_stock, start_date, end_date, granularity):
             st.write("Explore cumulative returns to assess overall performance.")
             close_col = next((col for col in data.columns if 'close' in col.lower()), None)
             if close_col:
-                data['Daily Return'] = data[close_col].pct_change()
-                data['Cumulative Return'] = (1 + data['Daily Return']).cumprod()
-                st.area_chart(data['Cumulative Return'])
+                # Derived series only: the fetched frame is left untouched
+                cumulative = (1 + data[close_col].pct_change()).cumprod().rename("Cumulative Return")
+                line_chart(cumulative, key="market_data_returns_zoom", area=True, name="market_data.chart")
             else:
                 st.warning("Close price column not found for cumulative returns.")
 
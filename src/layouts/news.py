@@ -0,0 +1,91 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from utils.news import NewsClient
+from .charts import render
+from .diagnostics import cache_resource
+from .portfolio_risk import risk_state
+from .session import portfolio_tickers
+
+LOOKBACKS = {"1 week": 7, "1 month": 30, "3 months": 90}
+
+
+# One client per server process, so every session shares the feed cache
+@cache_resource
+def news_client():
+    return NewsClient()
+
+
+def sentiment_summary(index, returns, days):
+    """Headline count, mean sentiment and price return per ticker over the last ``days`` days."""
+    daily = index.daily_sentiment().reset_index()
+    since = pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
+    recent = daily[daily["Date"] >= since]
+    # Headline-weighted mean sentiment; named aggregations keep the columns when nothing is recent
+    summary = recent.assign(Weighted=recent["Sentiment"] * recent["Headlines"]).groupby("Ticker").agg(
+        Headlines=("Headlines", "sum"), Weighted=("Weighted", "sum")
+    )
+    summary["Sentiment"] = summary.pop("Weighted") / summary["Headlines"]
+    # min_count keeps tickers without returns in the lookback (or without a risk state) missing, not 0%
+    moves = (1 + returns[returns.index >= since]).prod(min_count=1) - 1
+    return summary.join(moves.rename("Return"), how="outer").reindex(returns.columns.union(summary.index))
+
+
+def display(portfolio_df):
+    st.title("News and Sentiment")
+    st.write("""
+        Headlines for every portfolio ticker are fetched concurrently and cached, so a refresh only asks
+        the feeds whether anything changed. Stories carried by several tickers' feeds are counted once per
+        ticker and scored once with a local word-list sentiment (-1 to 1), shown next to the price moves.
+    """)
+    tickers = portfolio_tickers(portfolio_df)
+    if not tickers:
+        st.warning("Please define a valid portfolio in the sidebar.")
+        return
+
+    client = news_client()
+    if st.button("Refresh headlines"):
+        client.cache.clear()
+    index, failures = client.collect(tickers)
+    if failures:
+        st.warning("No headlines for " + ", ".join(f"{t} ({e})" for t, e in failures.items()))
+    if not index.stories:
+        st.info("No headlines found for the portfolio.")
+        return
+    st.caption(f"{len(index.stories)} unique stories | {client.requests} feed requests so far, "
+               f"{client.not_modified} answered Not Modified")
+
+    state, _ = risk_state(tickers, "1y")
+    returns = state.returns if state is not None else pd.DataFrame(
+        index=pd.DatetimeIndex([]), columns=list(tickers), dtype=float)
+    lookback = st.radio("Lookback", list(LOOKBACKS), horizontal=True, key="news_lookback")
+    st.subheader("Sentiment and Price Moves")
+    st.dataframe(sentiment_summary(index, returns, LOOKBACKS[lookback]).style.format(
+        {"Headlines": "{:.0f}", "Sentiment": "{:+.2f}", "Return": "{:+.2%}"}, na_rep="-"
+    ), use_container_width=True)
+
+    ticker = st.selectbox("Ticker:", tickers, key="news_ticker")
+    since = pd.Timestamp.now().normalize() - pd.Timedelta(days=LOOKBACKS[lookback])
+    daily = index.daily_sentiment()
+    sentiment = daily.xs(ticker, level="Ticker") if ticker in daily.index.get_level_values("Ticker") else daily.iloc[:0]
+    sentiment = sentiment[sentiment.index >= since]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=sentiment.index, y=sentiment["Sentiment"], name="Mean sentiment",
+                         marker_color=["green" if s > 0 else "red" for s in sentiment["Sentiment"]], opacity=0.6))
+    if ticker in returns.columns:
+        moves = returns[ticker][returns.index >= since]
+        fig.add_trace(go.Scatter(x=moves.index, y=moves, mode="lines+markers", name="Daily return", yaxis="y2"))
+    fig.update_layout(
+        title=f"{ticker}: Headline Sentiment vs Daily Return",
+        yaxis=dict(title="Sentiment", range=[-1.05, 1.05]),
+        yaxis2=dict(title="Return", overlaying="y", side="right", tickformat=".1%"),
+    )
+    render(fig, "news.chart", use_container_width=True)
+
+    st.subheader(f"Headlines for {ticker}")
+    st.dataframe(
+        index.headlines(ticker).reset_index()[["Published", "Title", "Source", "Sentiment", "Link"]],
+        column_config={"Link": st.column_config.LinkColumn("Link")},
+        hide_index=True,
+        use_container_width=True,
+    )
@@ -1,29 +1,123 @@
+from datetime import timedelta
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import plotly.express as px
+from utils.batch import align_weights
+from utils.monte_carlo import METHODS, simulate_var
+from utils.price_store import get_store, period_to_range
+from utils.risk_state import RiskState
+from utils.volatility import MODELS, fit_portfolio, forecast_volatility, load_parameters, save_parameters
+from .charts import line_chart, render
+from .diagnostics import cache_data, cache_resource
+from .session import portfolio_fingerprint, portfolio_tickers, session_memo
 
 
 # Fetch historical data (cached)
-@st.cache_data
+@cache_data
 def fetch_data(tickers, period="1y"):
-    return yf.download(tickers, period=period, auto_adjust=False)["Adj Close"]
+    """
+    Fetch adjusted close prices for the tickers; tickers that fail to load are left out.
+
+    :return: Tuple of (price DataFrame, dict of failed ticker -> error message)
+    """
+    start, end = period_to_range(period)
+    data, failures = get_store().fetch_prices(tickers, start, end)
+    return data, {ticker: str(error) for ticker, error in failures.items()}
+
+
+def loaded_weights(portfolio_df, data, failures):
+    """
+    Restrict the portfolio to the tickers that loaded, rescaling their weights to sum to 1.
 
+    :return: Tuple of (tickers, weights) aligned with the columns of data
+    """
+    if failures:
+        st.warning(
+            "Could not load " + ", ".join(f"{t} ({msg})" for t, msg in failures.items())
+            + ". Running on the remaining assets with rescaled weights."
+        )
+    return list(data.columns), align_weights(portfolio_df, list(data.columns)).tolist()
 
-# Calculate portfolio returns (cached)
-@st.cache_data
-def calculate_portfolio_returns(data, weights):
-    returns = data.pct_change()
-    portfolio_returns = (returns * weights).sum(axis=1)
-    return portfolio_returns
 
+# Returns, covariance and correlation shared by the portfolio, VaR and stress tabs (cached per tickers/window)
+@cache_resource
+def risk_state(tickers, period="1y"):
+    """
+    Build the shared RiskState for the tickers that load over the period.
 
-def display(portfolio_df):
+    :param tickers: Tuple of tickers
+    :return: Tuple of (RiskState or None if nothing loaded, dict of failed ticker -> error message)
+    """
+    data, failures = fetch_data(list(tickers), period)
+    # Keep the window length fixed as new bars are appended
+    return (RiskState(data, window=len(data) - 1) if not data.empty else None), failures
+
+
+def append_latest_prices(state):
+    """
+    Append bars newer than the risk state from the price store, updating its statistics incrementally.
+
+    :return: Number of bars appended
+    """
+    start = state.version + timedelta(days=1)
+    _, end = period_to_range("1d")
+    if start >= end:
+        return 0
+    return state.update_prices(get_store().get_prices(state.assets, start, end))
+
+
+def state_version(state):
+    """
+    Identifies a risk state and the bars it holds, so session values and cached results that read
+    the state refresh after appends.
+    """
+    return id(state), state.version
+
+
+def session_portfolio_returns(state, weights, fingerprint):
+    """Daily portfolio returns, kept for the session until the portfolio or the state changes."""
+    return session_memo(
+        "portfolio_returns", (fingerprint, state_version(state)), lambda: state.portfolio_returns(weights)
+    )
+
+
+@cache_data
+def monte_carlo_portfolio_var(tickers, period, version, weights, confidence_level, method, horizon, n_paths):
+    """
+    Monte Carlo VaR and CVaR of the portfolio from the shared risk state's returns.
+
+    :param version: state_version of the risk state, so appended bars invalidate the result
+    """
+    state, _ = risk_state(tickers, period)
+    # Chunked in this process: a process pool would fork the whole server, streamer and fetch
+    # threads included, once per session that misses the cache. Batch runs use worker processes.
+    return simulate_var(state.returns.dropna().values, weights, confidence_level, method=method, horizon=horizon,
+                        n_paths=n_paths, seed=0, tolerance=0.01)
+
+
+@cache_data
+def volatility_forecasts(tickers, period, version, model):
+    """
+    Next-day volatility forecast per asset from a fitted model, or None for sample volatility.
+
+    :param version: state_version of the risk state, so appended bars invalidate the forecasts
+    """
+    if model == "historical":
+        return None
+    state, _ = risk_state(tickers, period)
+    # Fitted in this process for the same reason as the Monte Carlo run; warm starts keep refits short
+    fits = fit_portfolio(state.returns, model, load_parameters(model))
+    save_parameters(model, fits)
+    return forecast_volatility(fits).reindex(state.assets).to_numpy()
+
+
+def display(portfolio_df, fingerprint=None):
     """
     Perform portfolio risk analysis for the given portfolio DataFrame.
 
     :param portfolio_df: DataFrame containing portfolio with 'Asset' and 'Weight' columns.
+    :param fingerprint: portfolio_fingerprint of portfolio_df, if already computed
     """
     st.title("Portfolio Risk Analysis")
 
@@ -37,37 +131,59 @@ def display(portfolio_df):
     weights = portfolio_df["Weight"].tolist()
 
     if len(tickers) > 0 and all(tickers):
-        data = fetch_data(tickers)
+        fingerprint = fingerprint or portfolio_fingerprint(portfolio_df)
+        key = portfolio_tickers(portfolio_df)
+        state, failures = risk_state(key, "1y")
+        if state is None:
+            st.error("Failed to fetch data for the given tickers.")
+            return
+        if st.button("Append latest prices"):
+            appended = append_latest_prices(state)
+            st.caption(f"Appended {appended} new bar(s); statistics updated without recomputing history.")
+        data = state.prices
+        tickers, weights = loaded_weights(portfolio_df, data, failures)
 
         # Single stock analysis
         if len(tickers) == 1:
             st.header(f"Performance of {tickers[0]}")
-            st.line_chart(data)
+            line_chart(data, key="portfolio_prices_zoom", name="portfolio_risk.chart")
 
         # Portfolio analysis
         elif len(tickers) > 1:
             # Portfolio Returns
-            portfolio_returns = calculate_portfolio_returns(data, weights)
-            cumulative_returns = (1 + portfolio_returns).cumprod()
+            portfolio_returns = session_portfolio_returns(state, weights, fingerprint)
+            cumulative_returns = session_memo(
+                "cumulative_returns", (fingerprint, state_version(state)), lambda: (1 + portfolio_returns).cumprod()
+            )
 
             st.header("Portfolio Performance")
-            st.line_chart(cumulative_returns)
+            line_chart(cumulative_returns.rename("Portfolio"), key="portfolio_returns_zoom", name="portfolio_risk.chart")
 
-            # Risk Decomposition
-            volatilities = data.pct_change().std() * np.sqrt(252)  # Annualized volatility
-            risk_contributions = volatilities * weights
-            risk_contributions_percentage = (risk_contributions / risk_contributions.sum()) * 100
-            risk_df = pd.DataFrame({"Asset": tickers, "Risk Contribution (%)": risk_contributions_percentage})
+            # Risk Decomposition (Euler allocation of portfolio volatility)
+            volatility_labels = {"historical": "Historical", **MODELS}
+            volatility_model = st.selectbox(
+                "Volatility model", list(volatility_labels), format_func=volatility_labels.get
+            )
+            volatilities = volatility_forecasts(key, "1y", state_version(state), volatility_model)
+            risk_df = session_memo(
+                "volatility_decomposition", (fingerprint, state_version(state), volatility_model),
+                lambda: state.volatility_decomposition(weights, volatilities).reset_index(),
+            )
             st.subheader("Risk Decomposition")
+            st.write(
+                "Annualized marginal, component and incremental volatility. "
+                "Component contributions account for correlations and sum to the portfolio volatility."
+            )
             st.dataframe(risk_df)
 
-            # Risk Pie Chart
-            fig = px.pie(risk_df, names="Asset", values="Risk Contribution (%)", title="Risk Contribution by Asset")
-            st.plotly_chart(fig)
+            # Risk Contribution Chart (contributions can be negative for hedging assets)
+            fig = px.bar(risk_df, x="Asset", y="Contribution (%)", title="Risk Contribution by Asset")
+            render(fig, "portfolio_risk.chart")
 
             # Correlation Matrix
             st.subheader("Correlation Matrix")
-            corr_matrix = data.pct_change().corr()
+            correlation = st.radio("Correlation estimate", ["Sample (1y window)", "EWMA"], horizontal=True)
+            corr_matrix = state.correlation_frame(ewma=correlation == "EWMA")
             fig = px.imshow(
                 corr_matrix,
                 labels=dict(x="Assets", y="Assets", color="Correlation"),
@@ -77,7 +193,7 @@ def display(portfolio_df):
                 zmin=-1,
                 zmax=1,
             )
-            st.plotly_chart(fig)
+            render(fig, "portfolio_risk.chart")
 
             # Portfolio VaR and PVaR
             st.header("Portfolio VaR and Parametric VaR")
@@ -87,11 +203,28 @@ def display(portfolio_df):
             # Historical VaR
             historical_var = np.percentile(portfolio_returns, var_percentile)
 
-            # Parametric VaR
-            portfolio_std = portfolio_returns.std()
-            z_score = abs(np.percentile(np.random.normal(0, 1, 10000), var_percentile / 100))
-            parametric_var = z_score * portfolio_std
+            # Parametric (variance-covariance) VaR
+            parametric_var = state.portfolio_var(weights, confidence_level / 100, volatilities)
 
             st.subheader("VaR Results")
             st.write(f"Historical VaR: **{historical_var:.4f}**")
-            st.write(f"Parametric VaR: **{parametric_var:.4f}**")
+            st.write(f"Parametric VaR (variance-covariance): **{parametric_var:.4f}**")
+
+            st.subheader("VaR Decomposition")
+            st.dataframe(session_memo(
+                "var_decomposition", (fingerprint, state_version(state), volatility_model, confidence_level),
+                lambda: state.var_decomposition(weights, confidence_level / 100, volatilities),
+            ))
+
+            # Monte Carlo VaR
+            st.subheader("Monte Carlo VaR")
+            method_labels = {"gbm": "Correlated GBM", "bootstrap": "Historical bootstrap", "fhs": "Filtered historical"}
+            method = st.selectbox("Simulation method", METHODS, format_func=method_labels.get)
+            horizon = st.slider("Horizon (days)", 1, 20, 1)
+            n_paths = st.select_slider("Maximum paths", [100_000, 1_000_000, 5_000_000], value=1_000_000)
+            result = monte_carlo_portfolio_var(
+                key, "1y", state_version(state), weights, confidence_level / 100, method, horizon, n_paths
+            )
+            st.write(f"Monte Carlo VaR: **{result.var:.4f}** (95% CI {result.ci[0]:.4f} to {result.ci[1]:.4f})")
+            st.write(f"Monte Carlo CVaR: **{result.cvar:.4f}**")
+            st.caption(f"{result.paths:,} paths" + (", stopped early at convergence" if result.converged else ""))
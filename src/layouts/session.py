@@ -0,0 +1,48 @@
+import hashlib
+import streamlit as st
+from utils.instrumentation import get_metrics, span
+
+
+def normalize_tickers(tickers):
+    """Tickers stripped, upper-cased and de-duplicated in order, with blanks dropped."""
+    cleaned = (str(t).strip().upper() for t in tickers)
+    return tuple(dict.fromkeys(t for t in cleaned if t))
+
+
+def portfolio_tickers(portfolio_df):
+    """
+    The portfolio's tickers as the one key every tab passes to ``risk_state``, so "aapl", " AAPL"
+    and a repeated AAPL all share the cached state.
+    """
+    return normalize_tickers(portfolio_df["Asset"])
+
+
+def portfolio_fingerprint(portfolio_df):
+    """Short hash of the portfolio's (asset, weight) rows, identifying it across reruns."""
+    rows = [(str(asset).strip().upper(), float(weight)) for asset, weight in zip(portfolio_df["Asset"], portfolio_df["Weight"])]
+    return hashlib.sha1(repr(rows).encode()).hexdigest()[:16]
+
+
+def session_memo(name, key, compute):
+    """
+    Result of ``compute()`` kept in this session's state until ``key`` changes.
+
+    Unlike ``st.cache_data`` nothing is hashed, pickled or copied on a hit, and only the latest
+    value per name is kept, so a rerun that changes an unrelated widget reuses derived state for
+    free and memory stays bounded per session. Hits and misses show up in the diagnostics cache
+    table as ``session.<name>``.
+
+    :param name: Name of the memoized value
+    :param key: Anything comparable with ``==`` that changes whenever the value must be recomputed,
+        typically starting with the portfolio fingerprint
+    :param compute: Function without arguments computing the value
+    """
+    memo = st.session_state.setdefault("session_memo", {})
+    metrics = get_metrics()
+    metrics.cache_call(f"session.{name}")
+    entry = memo.get(name)
+    if entry is None or entry[0] != key:
+        metrics.cache_call(f"session.{name}", miss=True)
+        with span(f"session.{name}"):
+            entry = memo[name] = (key, compute())
+    return entry[1]
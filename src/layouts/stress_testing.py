@@ -1,27 +1,36 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import plotly.express as px
+from utils.price_store import get_store, period_to_range
+from utils.scenarios import evaluate, library_shocks, loss_table, shock_matrix
+from .charts import line_chart, render
+from .diagnostics import cache_data
 
 
-def apply_scenario(returns, scenario_impact):
+@cache_data
+def scenario_shocks(assets, period="1y", version=None):
     """
-    Apply a stress-testing scenario to portfolio returns.
+    Build the (scenarios x assets) shock matrix for the scenario library (cached per asset set).
 
-    :param returns: Series of portfolio returns
-    :param scenario_impact: Percentage impact for the scenario (e.g., -10 for a 10% drop)
-    :return: Adjusted returns after applying the scenario
+    :param assets: Tuple of tickers
+    :param version: state_version of the risk state the portfolio returns come from, so the betas
+        are refitted after new bars are appended
+    :return: Tuple of (shock DataFrame, list of scenario dicts, factor beta DataFrame, dict of
+        dropped factor -> reason)
     """
-    adjusted_returns = returns * (1 + scenario_impact / 100)
-    return adjusted_returns
+    return library_shocks(list(assets), get_store(), *period_to_range(period))
 
 
-def display(portfolio_df, portfolio_returns):
+def display(portfolio_df, portfolio_returns, assets=None, weights=None, version=None):
     """
     Perform stress testing and scenario analysis for the given portfolio.
 
     :param portfolio_df: DataFrame containing portfolio with 'Asset' and 'Weight' columns
     :param portfolio_returns: Series of portfolio daily returns
+    :param assets: Tickers that loaded, aligned with weights (defaults to the portfolio assets)
+    :param weights: Portfolio weights aligned with assets
+    :param version: state_version of the risk state behind portfolio_returns
     """
     st.title("Stress Testing and Scenario Analysis")
 
@@ -29,6 +38,8 @@ def display(portfolio_df, portfolio_returns):
     if portfolio_df.empty or portfolio_returns is None or portfolio_returns.empty:
         st.warning("Please ensure the portfolio is valid and returns are calculated.")
         return
+    if assets is None:
+        assets, weights = portfolio_df["Asset"].tolist(), portfolio_df["Weight"].tolist()
 
     # Section 1: Introduction
     st.header("Introduction")
@@ -37,41 +48,67 @@ def display(portfolio_df, portfolio_returns):
         This helps identify vulnerabilities and improve risk management strategies.
     """)
 
-    # Section 2: Predefined Scenarios
-    st.header("Predefined Scenarios")
-    predefined_scenarios = {
-        "Interest Rate Hike": -10,  # -10% portfolio impact
-        "Oil Price Shock": -8,     # -8% portfolio impact
-        "Market Crash": -30        # -30% portfolio impact
-    }
-
-    selected_scenario = st.selectbox("Select a predefined scenario:", list(predefined_scenarios.keys()))
-
+    # Section 2: Scenario Library
+    st.header("Scenario Library")
+    st.write("""
+        Every scenario in the library (uniform shocks, factor shocks mapped through each asset's betas,
+        and historical replays of 2008, March 2020 and 2022 against today's weights) is evaluated at once.
+    """)
+    shocks, scenarios, exposures, dropped = scenario_shocks(tuple(assets), version=version)
+    if dropped:
+        st.warning(
+            "Left out the " + ", ".join(f"{name} factor ({reason})" for name, reason in dropped.items())
+            + " and the factor scenarios that shock it."
+        )
+    ranked = loss_table(shocks, weights, scenarios)
+    st.dataframe(ranked)
+
+    with st.expander("Factor exposures (betas)"):
+        st.dataframe(exposures)
+
+    selected_scenario = st.selectbox("Inspect a scenario:", ranked["Scenario"].tolist())
     if selected_scenario:
-        scenario_impact = predefined_scenarios[selected_scenario]
-        adjusted_returns = apply_scenario(portfolio_returns, scenario_impact)
-        cumulative_returns = (1 + adjusted_returns).cumprod()
-
+        contributions = pd.DataFrame({
+            "Asset": assets,
+            "Asset Return (%)": shocks.loc[selected_scenario].to_numpy() * 100,
+            "Contribution (%)": shocks.loc[selected_scenario].to_numpy() * np.asarray(weights) * 100,
+        })
+        portfolio_impact = contributions["Contribution (%)"].sum()
         st.write(f"**Selected Scenario:** {selected_scenario}")
-        st.write(f"**Impact Applied:** {scenario_impact}%")
-
-        # Visualization: Impact of the scenario
-        st.header(f"Impact of {selected_scenario} on Portfolio Performance")
-        st.line_chart(cumulative_returns)
+        st.write(f"**Portfolio Impact:** {portfolio_impact:.2f}%")
+        fig = px.bar(contributions, x="Asset", y="Contribution (%)", title=f"Contribution by Asset: {selected_scenario}")
+        render(fig, "stress_testing.chart")
 
     # Section 3: Custom Scenario Builder
     st.header("Custom Scenario Builder")
     custom_scenario_impact = st.slider("Define your custom scenario impact (%)", min_value=-50, max_value=50, value=0)
 
     if custom_scenario_impact != 0:
-        custom_adjusted_returns = apply_scenario(portfolio_returns, custom_scenario_impact)
-        custom_cumulative_returns = (1 + custom_adjusted_returns).cumprod()
-
-        st.write(f"**Custom Scenario Impact Applied:** {custom_scenario_impact}%")
-
-        # Visualization: Impact of the custom scenario
+        # A uniform scenario: every asset moves by the impact, evaluated like the library scenarios
+        uniform = {"name": "Custom", "type": "uniform", "shock": custom_scenario_impact}
+        custom_return = float(evaluate(shock_matrix([uniform], assets), weights).iloc[0])
+        cumulative_returns = (1 + portfolio_returns).cumprod()
+        shocked = pd.Series(
+            [cumulative_returns.iloc[-1] * (1 + custom_return)], index=[cumulative_returns.index[-1] + pd.offsets.BDay()]
+        )
+
+        st.write(f"**Custom Scenario Impact Applied:** {custom_scenario_impact}% "
+                 f"(portfolio return {custom_return * 100:.2f}%)")
+
+        # Visualization: the portfolio's value path with the shock applied on the next business day
         st.header("Impact of Custom Scenario on Portfolio Performance")
-        st.line_chart(custom_cumulative_returns)
+        line_chart(pd.concat([cumulative_returns, shocked]).rename("Portfolio"), key="stress_returns_zoom",
+                   name="stress_testing.chart")
+
+    st.subheader("Per-Asset Shocks")
+    custom_shocks = st.data_editor(
+        pd.DataFrame({"Asset": assets, "Shock (%)": float(custom_scenario_impact)}),
+        disabled=["Asset"],
+        key="custom_asset_shocks",
+    )
+    custom = {"name": "Custom", "type": "asset", "shocks": dict(zip(custom_shocks["Asset"], custom_shocks["Shock (%)"]))}
+    custom_impact = float(evaluate(shock_matrix([custom], assets), weights).iloc[0])
+    st.write(f"**Custom Per-Asset Scenario Portfolio Impact:** {custom_impact * 100:.2f}%")
 
     # Section 4: Summary and Insights
     st.header("Summary and Insights")
@@ -81,14 +118,10 @@ def display(portfolio_df, portfolio_returns):
     """)
 
     # Download Results
-    st.header("Download Adjusted Returns")
-    adjusted_data = pd.DataFrame({
-        "Predefined Scenario Returns": cumulative_returns if selected_scenario else [],
-        "Custom Scenario Returns": custom_cumulative_returns if custom_scenario_impact else []
-    })
+    st.header("Download Scenario Results")
     st.download_button(
-        label="Download Adjusted Returns (CSV)",
-        data=adjusted_data.to_csv(index=False),
+        label="Download Ranked Scenario Losses (CSV)",
+        data=ranked.to_csv(index=False),
         file_name="stress_testing_results.csv",
         mime="text/csv"
     )
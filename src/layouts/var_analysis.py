@@ -1,26 +1,52 @@
-import yfinance as yf
 import numpy as np
-import matplotlib.pyplot as plt
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
+from utils.backtest import backtest, zone_limits
+from utils.monte_carlo import simulate_var
+from utils.price_store import get_store
+from utils.var_engine import VarTable, historical_var_cvar, z_score
+from utils.volatility import MODELS, fit, load_parameters, save_parameters
+from .charts import histogram_chart, line_trace, render
+from .diagnostics import cache_data
+from .portfolio_risk import risk_state, state_version
+from .session import portfolio_fingerprint, portfolio_tickers, session_memo
 
 def calculate_var(data, confidence_level=0.95):
-    sorted_returns = np.sort(data)
-    index = int((1 - confidence_level) * len(sorted_returns))
-    return sorted_returns[index]
+    return historical_var_cvar(data, [confidence_level])[0][0, 0]
 
 def calculate_parametric_var(mean, std_dev, confidence_level=0.95):
-    z_score = np.abs(np.percentile(np.random.randn(100000), (1 - confidence_level) * 100))
-    return mean - z_score * std_dev
+    return mean - z_score(confidence_level) * std_dev
 
 def monte_carlo_var(data, confidence_level=0.95, simulations=10000):
-    simulated_returns = np.random.choice(data, size=simulations, replace=True)
-    return calculate_var(simulated_returns, confidence_level)
+    result = simulate_var(data, [1.0], confidence_level, method="bootstrap", n_paths=simulations, seed=0)
+    return result.var
 
 def calculate_cvar(data, confidence_level=0.95):
-    var = calculate_var(data, confidence_level)
-    return data[data <= var].mean()
+    return historical_var_cvar(data, [confidence_level])[1][0, 0]
 
-def display(portfolio_df, start_date, end_date):
+@cache_data
+def var_table(daily_returns):
+    # Covers every slider position, so moving the slider is a lookup
+    return VarTable(daily_returns)
+
+@cache_data
+def volatility_forecast(ticker, daily_returns, model):
+    # Warm-start from the last stored fit of this ticker
+    volatility_fit = fit(daily_returns, model, load_parameters(model).get(ticker))
+    save_parameters(model, {ticker: volatility_fit})
+    return volatility_fit.forecast
+
+@cache_data
+def var_backtest(daily_returns, confidence_level, window):
+    return backtest(daily_returns, confidence_level, window)
+
+def load_returns(ticker, start_date, end_date):
+    df = get_store().get(ticker, start_date, end_date)
+    df['Daily Returns'] = df['Adj Close'].pct_change().dropna()
+    return df
+
+def display(portfolio_df, start_date, end_date, fingerprint=None):
     st.title("3. VaR Analysis")
     st.write("Performing Value at Risk (VaR) analysis for your portfolio.")
 
@@ -37,8 +63,9 @@ def display(portfolio_df, start_date, end_date):
 
     # Fetch data
     try:
-        df = yf.download(focused_stock, start=start_date, end=end_date, auto_adjust=False)
-        df['Daily Returns'] = df['Adj Close'].pct_change().dropna()
+        # Derived state is kept for the session, so moving an unrelated widget doesn't recompute it
+        window_key = (focused_stock, start_date, end_date)
+        df = session_memo("var_returns", window_key, lambda: load_returns(focused_stock, start_date, end_date))
 
         if df.empty:
             st.error("No data available for the selected stock and date range.")
@@ -49,31 +76,83 @@ def display(portfolio_df, start_date, end_date):
 
         # Calculations
         daily_returns = df['Daily Returns'].dropna().values
-        mean_return = np.mean(daily_returns)
-        std_dev = np.std(daily_returns)
 
-        var = calculate_var(daily_returns, confidence_level)
-        parametric_var = calculate_parametric_var(mean_return, std_dev, confidence_level)
-        monte_carlo_var_value = monte_carlo_var(daily_returns, confidence_level)
-        cvar = calculate_cvar(daily_returns, confidence_level)
+        metrics = session_memo("var_table", window_key, lambda: var_table(daily_returns)).lookup(confidence_level)
+        var = metrics["VaR"]
+        parametric_var = metrics["Parametric VaR"]
+        monte_carlo_var_value = session_memo(
+            "monte_carlo_var", (window_key, confidence_level), lambda: monte_carlo_var(daily_returns, confidence_level)
+        )
+        cvar = metrics["CVaR"]
+        volatility_model = st.selectbox("Volatility model for conditional VaR:", list(MODELS), format_func=MODELS.get)
+        conditional_var = calculate_parametric_var(
+            np.mean(daily_returns), volatility_forecast(focused_stock, daily_returns, volatility_model), confidence_level
+        )
 
         # Display results
         st.write(f"**VaR at {confidence_level*100}% confidence level:** {var:.2%}")
         st.write(f"**Parametric VaR:** {parametric_var:.2%}")
+        st.write(f"**Cornish-Fisher VaR:** {metrics['Cornish-Fisher VaR']:.2%}")
+        st.write(f"**Student-t VaR:** {metrics['Student-t VaR']:.2%}")
+        st.write(f"**{MODELS[volatility_model]} VaR (next day):** {conditional_var:.2%}")
         st.write(f"**Monte Carlo VaR:** {monte_carlo_var_value:.2%}")
         st.write(f"**CVaR (Expected Shortfall):** {cvar:.2%}")
 
+        # Contribution to portfolio VaR, from the risk state shared with the portfolio tab
+        if len(portfolio_df) > 1 and portfolio_df["Weight"].sum() == 1.0:
+            state, _ = risk_state(portfolio_tickers(portfolio_df), "1y")
+            if state is not None and focused_stock in state.assets:
+                weights = portfolio_df.groupby("Asset")["Weight"].sum().reindex(state.assets)
+                decomposition = session_memo(
+                    "var_contribution",
+                    (fingerprint or portfolio_fingerprint(portfolio_df), state_version(state), confidence_level),
+                    lambda: state.var_decomposition((weights / weights.sum()).to_numpy(), confidence_level),
+                )
+                contribution = decomposition.loc[focused_stock]
+                st.write(
+                    f"**Component VaR in portfolio (1y, parametric):** {contribution['Component']:.2%} "
+                    f"({contribution['Contribution (%)']:.1f}% of portfolio VaR)"
+                )
+
         # Visualization
         st.write("Return Distribution:")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.hist(daily_returns, bins=50, alpha=0.7, color='gray', label='Daily Returns')
-        ax.axvline(x=var, color='red', linestyle='dashed', linewidth=2, label='VaR')
-        ax.axvline(x=cvar, color='blue', linestyle='dashed', linewidth=2, label='CVaR')
-        ax.set_title(f"Return Distribution with VaR and CVaR ({confidence_level*100}% Confidence Level)")
-        ax.set_xlabel("Daily Returns")
-        ax.set_ylabel("Frequency")
-        ax.legend()
-        st.pyplot(fig)
+        histogram_chart(
+            daily_returns,
+            title=f"Return Distribution with VaR and CVaR ({confidence_level*100}% Confidence Level)",
+            markers={"VaR": (var, "red"), "CVaR": (cvar, "blue")},
+            name="var_analysis.chart",
+        )
+
+        # Backtesting
+        st.subheader("VaR Backtesting")
+        window = st.slider("Rolling window (days)", 100, 500, 250, step=10)
+        if len(daily_returns) <= window:
+            st.info("Select a longer date range to backtest VaR with this window.")
+            return
+        result, summary = session_memo(
+            "var_backtest", (window_key, confidence_level, window),
+            lambda: var_backtest(df['Daily Returns'].dropna(), confidence_level, window),
+        )
+        st.dataframe(pd.Series(summary, name="Value").astype(str))
+
+        fig = go.Figure()
+        fig.add_trace(line_trace(result["Return"], "Daily Return", method="minmax", line=dict(color="gray")))
+        fig.add_trace(line_trace(result["VaR"], "Rolling VaR", line=dict(color="red")))
+        exceptions = result[result["Exception"]]
+        fig.add_trace(go.Scatter(x=exceptions.index, y=exceptions["Return"], mode="markers", name="Exception", marker=dict(color="black")))
+        fig.update_layout(title="Realized Returns vs Rolling VaR", xaxis_title="Date", yaxis_title="Return")
+        render(fig, "var_analysis.chart", use_container_width=True)
+
+        # Traffic light: exceptions over the trailing 250 days against the Basel zones
+        yellow, red = zone_limits(250, confidence_level)
+        top = max(red + 2, result["Exceptions (250d)"].max() + 1)
+        fig = go.Figure()
+        fig.add_hrect(y0=0, y1=yellow, fillcolor="green", opacity=0.2, line_width=0)
+        fig.add_hrect(y0=yellow, y1=red, fillcolor="yellow", opacity=0.2, line_width=0)
+        fig.add_hrect(y0=red, y1=top, fillcolor="red", opacity=0.2, line_width=0)
+        fig.add_trace(line_trace(result["Exceptions (250d)"], "Exceptions (250d)", method="minmax"))
+        fig.update_layout(title="Traffic Light: Exceptions in Trailing 250 Days", xaxis_title="Date", yaxis_title="Exceptions", yaxis_range=[0, top])
+        render(fig, "var_analysis.chart", use_container_width=True)
 
     except Exception as e:
         st.error(f"An error occurred: {e}")
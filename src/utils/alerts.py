@@ -0,0 +1,215 @@
+import json
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+from utils.var_engine import historical_var_cvar
+
+DEFAULT_RULES = os.environ.get(
+    "ALERT_RULES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "alert_rules.json")
+)
+METRICS = ["return", "zscore", "var", "var_breach", "drawdown", "vol_ratio", "corr_shift"]
+OPERATORS = ["<", "<=", ">", ">=", "abs>"]
+SHORT_WINDOW = 20
+COOLDOWN = 15 * 60
+HISTORY_SIZE = 1000
+
+
+@span("metric_state")
+def metric_state(state, confidence_level=0.95, short_window=SHORT_WINDOW, weights=None):
+    """
+    Latest risk metrics of every asset as one (assets x metrics) frame, computed in a few array passes.
+
+    Metrics:
+        return:     last daily return
+        zscore:     last return in standard deviations of the window's earlier returns
+        var:        historical VaR of the window's earlier returns (a return, losses negative)
+        var_breach: last return minus VaR (negative when the last return breached VaR)
+        drawdown:   current drawdown from the window's peak price
+        vol_ratio:  volatility of the last ``short_window`` returns over the volatility of the
+                    window's earlier returns
+        corr_shift: mean absolute difference between the EWMA and sample correlations with the
+                    other assets, which jumps when the correlation regime changes
+
+    :param state: RiskState of the universe
+    :param weights: Portfolio weights aligned with ``state.assets``; adds a "Portfolio" row
+        (its corr_shift is left missing)
+    :return: DataFrame indexed by asset with one column per metric
+    """
+    returns = state.returns.to_numpy(dtype=float)
+    prices = state.prices.ffill().to_numpy(dtype=float)
+    assets = list(state.assets)
+    n = len(assets)
+    if n > 1:
+        shift = np.abs(np.nan_to_num(state.ewma.corr - state.corr)).sum(axis=1) / (n - 1)
+    else:
+        shift = np.zeros(1)
+    if weights is not None:
+        # The portfolio is one more column: its returns and a value path standing in for prices
+        portfolio = np.nan_to_num(returns) @ np.asarray(weights, dtype=float)
+        returns = np.column_stack([returns, portfolio])
+        prices = np.column_stack([prices, np.r_[1.0, np.cumprod(1 + portfolio)]])
+        shift = np.r_[shift, np.nan]
+        assets.append("Portfolio")
+    # The last return is judged against the returns before it, so it cannot dilute its own breach
+    last, history = returns[-1], returns[:-1]
+    mean = np.nanmean(history, axis=0)
+    volatility = np.nanstd(history, axis=0, ddof=1)
+    var = historical_var_cvar(history, [confidence_level])[0][0]
+    short = np.nanstd(returns[-short_window:], axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "return": last,
+            "zscore": (last - mean) / volatility,
+            "var": var,
+            "var_breach": last - var,
+            "drawdown": prices[-1] / np.nanmax(prices, axis=0) - 1,
+            "vol_ratio": short / volatility,
+            "corr_shift": shift,
+        }, index=pd.Index(assets, name="Asset"))[METRICS]
+
+
+@dataclass
+class Rule:
+    """
+    One alert condition: ``metric op threshold`` for the listed assets (all assets if empty).
+    """
+    name: str
+    metric: str
+    op: str
+    threshold: float
+    assets: tuple = ()
+    severity: str = "warning"
+
+    def __post_init__(self):
+        if self.metric not in METRICS:
+            raise ValueError(f"Unknown metric {self.metric!r} in rule {self.name}")
+        if self.op not in OPERATORS:
+            raise ValueError(f"Unknown operator {self.op!r} in rule {self.name}")
+        self.assets = tuple(a.upper() for a in self.assets)
+
+
+def load_rules(path=DEFAULT_RULES):
+    """Load alert rules from a JSON list of rule objects (see Rule)."""
+    with open(path) as f:
+        return [Rule(**rule) for rule in json.load(f)]
+
+
+class AlertEngine:
+    """
+    Evaluates every rule against every asset in one vectorized pass per update.
+
+    Rules are compiled into arrays (metric column, operator and threshold per rule, plus a
+    rules x assets scope mask), so an update is a handful of (rules x assets) comparisons
+    whatever the number of rules. An alert fires when a condition becomes true for a (rule,
+    asset) pair; it does not fire again while the condition stays true (de-duplication) nor
+    within ``cooldown`` seconds of the last alert for that pair (rate limiting).
+
+    :param rules: List of Rule
+    :param cooldown: Minimum seconds between two alerts of the same rule and asset
+    :param max_alerts: Most alerts emitted per update, most severe breaches first
+    :param history_size: Alerts kept in the history
+    """
+
+    def __init__(self, rules, cooldown=COOLDOWN, max_alerts=100, history_size=HISTORY_SIZE):
+        self.rules = list(rules)
+        self.cooldown = cooldown
+        self.max_alerts = max_alerts
+        self.history = deque(maxlen=history_size)
+        self.assets = None
+        self._metric = np.array([METRICS.index(r.metric) for r in self.rules], dtype=int)
+        self._op = np.array([OPERATORS.index(r.op) for r in self.rules], dtype=int)
+        self._threshold = np.array([r.threshold for r in self.rules], dtype=float)
+
+    def _compile(self, assets):
+        # Scope, previous state and last alert time per (rule, asset); rebuilt if the universe changes
+        self.assets = list(assets)
+        # Rule scopes are upper-cased, so match labels such as "Portfolio" case-insensitively
+        position = {str(asset).upper(): j for j, asset in enumerate(self.assets)}
+        self._scope = np.ones((len(self.rules), len(self.assets)), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            if rule.assets:
+                self._scope[i] = False
+                self._scope[i, [position[a] for a in rule.assets if a in position]] = True
+        self._active = np.zeros_like(self._scope)
+        self._last_alert = np.full(self._scope.shape, -np.inf)
+
+    def check(self, state):
+        """
+        Evaluate all rules without touching the alert state.
+
+        :param state: (assets x metrics) DataFrame from metric_state
+        :return: (rules x assets) boolean array of conditions that hold
+        """
+        if self.assets != list(state.index):
+            self._compile(state.index)
+        values = state[METRICS].to_numpy(dtype=float).T[self._metric]
+        threshold = self._threshold[:, None]
+        op = self._op[:, None]
+        with np.errstate(invalid="ignore"):
+            hit = np.select(
+                [op == 0, op == 1, op == 2, op == 3],
+                [values < threshold, values <= threshold, values > threshold, values >= threshold],
+                np.abs(values) > threshold,
+            )
+        return hit & self._scope & ~np.isnan(values)
+
+    @span("alerts")
+    def update(self, state, now=None):
+        """
+        Evaluate all rules and record the alerts that should be sent.
+
+        :param state: (assets x metrics) DataFrame from metric_state
+        :param now: Time of the update in seconds (time.time() if None)
+        :return: List of new alert dicts, most severe breach first
+        """
+        now = time.time() if now is None else now
+        hit = self.check(state)
+        rising = hit & ~self._active
+        self._active = hit
+        fire = rising & (now - self._last_alert >= self.cooldown)
+        rules, assets = np.nonzero(fire)
+        if len(rules) > self.max_alerts:
+            # Keep the largest breaches relative to their thresholds
+            values = state[METRICS].to_numpy(dtype=float)[assets, self._metric[rules]]
+            excess = np.abs(values - self._threshold[rules]) / np.maximum(np.abs(self._threshold[rules]), 1e-12)
+            keep = np.argpartition(-excess, self.max_alerts)[:self.max_alerts]
+            keep = keep[np.argsort(-excess[keep], kind="stable")]
+            rules, assets = rules[keep], assets[keep]
+        self._last_alert[rules, assets] = now
+        alerts = []
+        for i, j in zip(rules, assets):
+            rule = self.rules[i]
+            alerts.append({
+                "Time": pd.Timestamp(now, unit="s"),
+                "Rule": rule.name,
+                "Asset": self.assets[j],
+                "Metric": rule.metric,
+                "Value": float(state.iat[j, METRICS.index(rule.metric)]),
+                "Condition": f"{rule.op} {rule.threshold:g}",
+                "Severity": rule.severity,
+            })
+        self.history.extend(alerts)
+        return alerts
+
+    def active_frame(self):
+        """Conditions currently holding, one row per (rule, asset)."""
+        if self.assets is None:
+            return pd.DataFrame(columns=["Rule", "Asset", "Severity"])
+        rules, assets = np.nonzero(self._active)
+        return pd.DataFrame({
+            "Rule": [self.rules[i].name for i in rules],
+            "Asset": [self.assets[j] for j in assets],
+            "Severity": [self.rules[i].severity for i in rules],
+        })
+
+    def history_frame(self):
+        return pd.DataFrame(list(self.history), columns=["Time", "Rule", "Asset", "Metric", "Value", "Condition", "Severity"])
+
+    def rules_frame(self):
+        return pd.DataFrame([asdict(rule) for rule in self.rules])
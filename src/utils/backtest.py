@@ -0,0 +1,219 @@
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from utils.instrumentation import span
+from utils.returns_block import as_frame
+
+WINDOW = 250
+# Basel zones by cumulative binomial probability of the exception count
+TRAFFIC_LIGHT_LIMITS = {"green": 0.95, "yellow": 0.9999}
+
+
+class RollingQuantile:
+    """
+    Sliding window of values kept in sorted order.
+
+    Each step finds the positions of the new and the oldest value with a binary search, instead
+    of re-sorting the window, so order statistics are read directly by index. Inserting into and
+    deleting from the list still shift up to ``window`` pointers (a memmove, O(w) but cheap next
+    to a sort for windows of a few hundred days).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.sorted = []
+
+    def push(self, value):
+        self.values.append(value)
+        insort(self.sorted, value)
+        if len(self.values) > self.window:
+            del self.sorted[bisect_left(self.sorted, self.values.popleft())]
+
+    def full(self):
+        return len(self.values) == self.window
+
+    def var_es(self, confidence_level):
+        """Return (VaR, ES) of the current window with the int((1 - c) * n) order statistic."""
+        k = int((1 - confidence_level) * len(self.sorted))
+        return self.sorted[k], sum(self.sorted[:k + 1]) / (k + 1)
+
+
+def _rolling_tail(values, k, window):
+    """
+    VaR and ES (the k-th smallest value and the mean of the k + 1 smallest) of every full window.
+
+    Windows are taken in blocks of about sqrt(window) consecutive ends. All windows of a block
+    share a middle stretch whose k + 1 smallest values are selected once; each window's tail
+    then lies among those and the fewer than ``block`` values at its edges. Every window costs
+    O(window / block + block + k) instead of a sort, vectorized over the columns.
+
+    :param values: (L x N) array; row e - window to e - 1 is the window ending at e
+    :return: Tuple of (VaR, ES) arrays of shape (L - window + 1, N), one row per window end
+    """
+    n_ends = len(values) - window + 1
+    block = max(1, min(int(np.sqrt(window)), window - k))
+    var = np.empty((n_ends, values.shape[1]))
+    es = np.empty((n_ends, values.shape[1]))
+    for first in range(window, len(values) + 1, block):
+        stop = min(first + block, len(values) + 1)
+        size = stop - first
+        # Rows in every window ending in [first, stop)
+        shared = np.partition(values[stop - 1 - window:first], k, axis=0)[:k + 1]
+        # Window ending at first + i also holds rows first + i - window .. stop - 2 - window on the
+        # left and first .. first + i - 1 on the right
+        i, m = np.ogrid[:size, :size - 1]
+        edges = values[np.where(m < size - 1 - i, first + i - window + m, first + m - (size - 1 - i))]
+        candidates = np.concatenate([np.broadcast_to(shared, (size,) + shared.shape), edges], axis=1)
+        tail = np.partition(candidates, k, axis=1)[:, :k + 1]
+        var[first - window:stop - window] = tail[:, k]
+        es[first - window:stop - window] = tail.sum(axis=1) / (k + 1)
+    return var, es
+
+
+def rolling_var(returns, confidence_level=0.95, window=WINDOW):
+    """
+    One-day-ahead historical VaR and ES from a rolling window, for one or many assets.
+
+    The forecast for day t uses the ``window`` returns before t, so it can be compared with the
+    return realized on day t. Missing returns are skipped, so a window always holds ``window``
+    observations; the order statistic is int((1 - c) * window), as in RollingQuantile.
+
+    :param returns: Series, DataFrame or ReturnsBlock of daily returns indexed by date
+    :param confidence_level: VaR confidence level
+    :param window: Window length in days
+    :return: Tuple of (VaR, ES) with the shape of ``returns``; NaN until the window is full
+    """
+    returns = as_frame(returns)
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    values = frame.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    # Observations before each day, per column
+    seen = np.cumsum(present, axis=0) - present
+    counts = present.sum(axis=0)
+    # Each column's observations packed to the end of one array, so windows line up by count
+    packed = np.full((counts.max(initial=0), values.shape[1]), np.nan)
+    for j in range(values.shape[1]):
+        packed[len(packed) - counts[j]:, j] = values[present[:, j], j]
+    var = np.full(frame.shape, np.nan)
+    es = np.full(frame.shape, np.nan)
+    if len(packed) >= window:
+        tail_var, tail_es = _rolling_tail(packed, int((1 - confidence_level) * window), window)
+        full = seen >= window
+        rows, columns = np.nonzero(full)
+        ends = seen[rows, columns] + len(packed) - counts[columns] - window
+        var[rows, columns] = tail_var[ends, columns]
+        es[rows, columns] = tail_es[ends, columns]
+    var = pd.DataFrame(var, index=frame.index, columns=frame.columns)
+    es = pd.DataFrame(es, index=frame.index, columns=frame.columns)
+    if isinstance(returns, pd.Series):
+        return var.iloc[:, 0], es.iloc[:, 0]
+    return var, es
+
+
+def naive_rolling_var(returns, confidence_level=0.95, window=WINDOW):
+    """Reference implementation of rolling_var for one series that sorts every window."""
+    values = returns.dropna().to_numpy(dtype=float)
+    var = np.full(len(values), np.nan)
+    for t in range(window, len(values)):
+        ordered = np.sort(values[t - window:t])
+        var[t] = ordered[int((1 - confidence_level) * window)]
+    return pd.Series(var, index=returns.dropna().index)
+
+
+def kupiec_pof(exceptions, observations, confidence_level):
+    """
+    Kupiec proportion-of-failures test.
+
+    :return: Tuple of (likelihood ratio, p-value)
+    """
+    p = 1 - confidence_level
+    x, n = exceptions, observations
+    observed = x / n if n else 0.0
+    log_null = (n - x) * np.log(1 - p) + x * np.log(p)
+    log_alt = (n - x) * np.log(1 - observed) if observed < 1 else 0.0
+    log_alt += x * np.log(observed) if x > 0 else 0.0
+    ratio = -2 * (log_null - log_alt)
+    return ratio, stats.chi2.sf(ratio, 1)
+
+
+def christoffersen_independence(hits):
+    """
+    Christoffersen test that exceptions do not cluster (first-order Markov independence).
+
+    :param hits: Boolean array, True on days with an exception
+    :return: Tuple of (likelihood ratio, p-value)
+    """
+    hits = np.asarray(hits, dtype=bool)
+    previous, current = hits[:-1], hits[1:]
+    n00 = np.sum(~previous & ~current)
+    n01 = np.sum(~previous & current)
+    n10 = np.sum(previous & ~current)
+    n11 = np.sum(previous & current)
+
+    def log_l(stay, move):
+        prob = move / (stay + move) if stay + move else 0.0
+        return (stay * np.log(1 - prob) if stay else 0.0) + (move * np.log(prob) if move else 0.0)
+
+    pooled = log_l(n00 + n10, n01 + n11)
+    ratio = -2 * (pooled - log_l(n00, n01) - log_l(n10, n11))
+    return ratio, stats.chi2.sf(ratio, 1)
+
+
+def traffic_light(exceptions, observations, confidence_level):
+    """Basel traffic-light zone ("green", "yellow" or "red") of an exception count."""
+    probability = stats.binom.cdf(exceptions, observations, 1 - confidence_level)
+    if probability < TRAFFIC_LIGHT_LIMITS["green"]:
+        return "green"
+    if probability < TRAFFIC_LIGHT_LIMITS["yellow"]:
+        return "yellow"
+    return "red"
+
+
+def zone_limits(observations, confidence_level):
+    """Smallest exception counts that fall in the yellow and red zones."""
+    counts = np.arange(observations + 1)
+    cdf = stats.binom.cdf(counts, observations, 1 - confidence_level)
+    return int(np.argmax(cdf >= TRAFFIC_LIGHT_LIMITS["green"])), int(np.argmax(cdf >= TRAFFIC_LIGHT_LIMITS["yellow"]))
+
+
+@span("backtest")
+def backtest(returns, confidence_level=0.95, window=WINDOW):
+    """
+    Backtest rolling historical VaR against realized returns.
+
+    :param returns: Series of daily returns indexed by date (or a one-column ReturnsBlock)
+    :param confidence_level: VaR confidence level
+    :param window: Window length in days
+    :return: Tuple of (DataFrame with Return, VaR, ES, Exception and rolling exception count,
+        dict of summary statistics)
+    """
+    returns = as_frame(returns)
+    if isinstance(returns, pd.DataFrame):
+        returns = returns.iloc[:, 0]
+    returns = returns.dropna()
+    var, es = rolling_var(returns, confidence_level, window)
+    result = pd.DataFrame({"Return": returns, "VaR": var, "ES": es}).dropna()
+    result["Exception"] = result["Return"] < result["VaR"]
+    result["Exceptions (250d)"] = result["Exception"].rolling(WINDOW, min_periods=1).sum()
+
+    n, x = len(result), int(result["Exception"].sum())
+    pof, pof_p = kupiec_pof(x, n, confidence_level)
+    independence, independence_p = christoffersen_independence(result["Exception"].to_numpy())
+    last_year = result["Exception"].iloc[-WINDOW:]
+    summary = {
+        "Observations": n,
+        "Exceptions": x,
+        "Expected Exceptions": n * (1 - confidence_level),
+        "Kupiec POF": pof,
+        "Kupiec p-value": pof_p,
+        "Christoffersen Independence": independence,
+        "Christoffersen p-value": independence_p,
+        "Conditional Coverage p-value": stats.chi2.sf(pof + independence, 2),
+        "Traffic Light": traffic_light(int(last_year.sum()), len(last_year), confidence_level),
+    }
+    return result, summary
@@ -0,0 +1,303 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+from utils.price_store import period_to_range
+from utils.returns_block import as_frame
+from utils.risk_state import RiskState
+from utils.scenarios import evaluate, library_shocks
+from utils.var_engine import VarTable
+
+CONFIDENCE_LEVELS = [0.95, 0.99]
+PORTFOLIO_EXTENSIONS = (".csv", ".parquet")
+
+
+def load_portfolio(path):
+    """
+    Read a portfolio file with 'Asset' and 'Weight' columns.
+
+    :param path: CSV or Parquet file
+    :return: DataFrame with Asset and Weight columns
+    """
+    if path.endswith(".parquet"):
+        portfolio = pd.read_parquet(path)
+    else:
+        portfolio = pd.read_csv(path)
+    missing = {"Asset", "Weight"} - set(portfolio.columns)
+    if missing:
+        raise ValueError(f"{path} is missing column(s): {', '.join(sorted(missing))}")
+    portfolio = portfolio[["Asset", "Weight"]].dropna()
+    portfolio["Asset"] = portfolio["Asset"].astype(str).str.strip().str.upper()
+    return portfolio
+
+
+def load_portfolios(path):
+    """
+    Read one portfolio file, or every CSV/Parquet portfolio file in a directory.
+
+    :return: Dict of portfolio name (file name without extension) -> portfolio DataFrame
+    """
+    if os.path.isdir(path):
+        files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.endswith(PORTFOLIO_EXTENSIONS))
+    else:
+        files = [path]
+    return {os.path.splitext(os.path.basename(f))[0]: load_portfolio(f) for f in files}
+
+
+def load_books(path):
+    """
+    Read a (portfolios x assets) weight matrix and its desk hierarchy.
+
+    ``path`` is either a directory (or single file) of portfolios, one per file, whose weights are
+    rescaled to sum to 1, or one long file with Portfolio, Asset and Weight columns and an
+    optional Desk column, whose weights are kept as given (e.g. shares of firm capital) so books
+    add up to their desk and the firm.
+
+    :return: Tuple of (weight DataFrame indexed by portfolio, dict of portfolio -> desk or None for
+        independent portfolios, normalize flag)
+    """
+    if os.path.isfile(path):
+        frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        if "Portfolio" in frame.columns:
+            return books_from_frame(frame) + (False,)
+    portfolios = load_portfolios(path)
+    assets = sorted(set().union(*(set(p["Asset"]) for p in portfolios.values())))
+    return weight_matrix(portfolios, assets), None, True
+
+
+def books_from_frame(frame):
+    """
+    Pivot long book positions (Portfolio, Asset, Weight and optional Desk columns) into a weight matrix.
+
+    :return: Tuple of ((portfolios x assets) weight DataFrame, dict of portfolio -> desk)
+    """
+    frame = frame.dropna(subset=["Portfolio", "Asset", "Weight"]).copy()
+    frame["Asset"] = frame["Asset"].astype(str).str.strip().str.upper()
+    frame["Portfolio"] = frame["Portfolio"].astype(str)
+    weights = frame.pivot_table(index="Portfolio", columns="Asset", values="Weight", aggfunc="sum", fill_value=0.0)
+    parents = {}
+    if "Desk" in frame.columns:
+        desks = frame.dropna(subset=["Desk"]).drop_duplicates("Portfolio")
+        parents = dict(zip(desks["Portfolio"], desks["Desk"].astype(str)))
+    return weights.rename_axis(columns=None), parents
+
+
+def align_weights(portfolio_df, assets):
+    """
+    Weights of a portfolio over a list of assets, summing duplicates and rescaling to 1.
+
+    Assets of the portfolio that are not in ``assets`` (e.g. failed to load) are dropped.
+
+    :return: Array of weights aligned with assets
+    """
+    weights = portfolio_df.groupby("Asset")["Weight"].sum().reindex(assets).fillna(0.0)
+    total = weights.sum()
+    return (weights / total).to_numpy() if total else weights.to_numpy()
+
+
+def weight_matrix(portfolios, assets):
+    """
+    Stack portfolios into a (portfolios x assets) weight DataFrame, each row rescaled to sum to 1.
+
+    :param portfolios: Dict of name -> portfolio DataFrame (Asset, Weight)
+    """
+    rows = [align_weights(portfolio, assets) for portfolio in portfolios.values()]
+    return pd.DataFrame(rows, index=pd.Index(list(portfolios), name="Portfolio"), columns=list(assets))
+
+
+def rollup(weights, parents, total="Firm"):
+    """
+    Add aggregate rows for every desk (and its parents) and the firm-wide total.
+
+    Positions of an aggregate are the sum of its books' positions, so aggregate risk reflects
+    diversification between books rather than the sum of their VaRs.
+
+    :param weights: (books x assets) weight DataFrame
+    :param parents: Dict of node -> parent node (book -> desk, desk -> division, ...)
+    :param total: Name of the firm-wide row, or None to leave it out
+    :return: Tuple of (weight DataFrame of books and aggregates, dict of row -> level)
+    """
+    books = list(weights.index)
+    levels = {book: "Book" for book in books}
+    ancestors = {}
+    for book in books:
+        chain, node = [], parents.get(book)
+        while node is not None:
+            chain.append(node)
+            levels.setdefault(node, "Desk" if len(chain) == 1 else f"Level {len(chain) + 1}")
+            node = parents.get(node)
+        ancestors[book] = chain
+    aggregates = [node for node in levels if levels[node] != "Book"]
+    membership = [[node in ancestors[book] for book in books] for node in aggregates]
+    if total is not None:
+        aggregates.append(total)
+        membership.append([True] * len(books))
+        levels[total] = "Total"
+    if not aggregates:
+        return weights, levels
+    # One matrix product gives every aggregate's positions
+    summed = np.asarray(membership, dtype=float) @ weights.to_numpy(dtype=float)
+    combined = pd.concat([weights, pd.DataFrame(summed, index=aggregates, columns=weights.columns)])
+    return combined.rename_axis("Portfolio"), levels
+
+
+def drawdown_table(returns):
+    """
+    Maximum and current drawdown of every column of a (dates x portfolios) return DataFrame or ReturnsBlock.
+
+    :return: DataFrame indexed by portfolio with Max Drawdown, Peak, Trough and Current Drawdown;
+        Peak is NaT when the peak is the starting value, i.e. wealth never rose above it before the trough
+    """
+    returns = as_frame(returns)
+    # Row 0 is the starting wealth, before the first return
+    wealth = np.cumprod(np.vstack([np.ones(returns.shape[1]), 1 + returns.to_numpy(dtype=float)]), axis=0)
+    peaks = np.maximum.accumulate(wealth, axis=0)
+    drawdown = (wealth / peaks - 1)[1:]
+    trough = drawdown.argmin(axis=0)
+    columns = np.arange(wealth.shape[1])
+    # Row of the latest running maximum at every date
+    steps = np.arange(len(wealth))[:, None]
+    peak = np.maximum.accumulate(np.where(wealth >= peaks, steps, 0), axis=0)[trough + 1, columns]
+    dates = returns.index
+    return pd.DataFrame({
+        "Max Drawdown": drawdown[trough, columns],
+        "Peak": dates[np.maximum(peak - 1, 0)].where(peak > 0, pd.NaT),
+        "Trough": dates[trough],
+        "Current Drawdown": drawdown[-1],
+    }, index=returns.columns)
+
+
+@span("book_tables")
+def book_tables(state, weights, confidence_levels=CONFIDENCE_LEVELS, shocks=None, levels=None):
+    """
+    VaR/CVaR, volatility, drawdown and stress tables for every row of a weight matrix at once.
+
+    All portfolio return series come from one (dates x assets) @ (assets x portfolios) product
+    over the shared returns of ``state``.
+
+    :param state: RiskState over the asset universe
+    :param weights: (portfolios x assets) weight DataFrame
+    :param confidence_levels: Confidence levels to report
+    :param shocks: Optional (scenarios x assets) shock matrix from utils.scenarios
+    :param levels: Optional dict of portfolio -> hierarchy level (see rollup)
+    :return: Dict of DataFrames: "summary", "drawdown" and (with shocks) "stress"
+    """
+    returns = state.portfolio_returns(weights)
+    summary = VarTable(returns, confidence_levels).to_frame().swaplevel().reindex(
+        pd.MultiIndex.from_product([weights.index, confidence_levels])
+    ).rename_axis(["Portfolio", "Confidence"]).reset_index()
+    summary["Volatility (annual)"] = state.portfolio_volatility(weights).reindex(summary["Portfolio"]).to_numpy()
+    tables = {
+        "summary": summary,
+        "drawdown": drawdown_table(returns).rename_axis("Portfolio").reset_index(),
+    }
+    if shocks is not None:
+        stress = evaluate(shocks, weights.reindex(columns=shocks.columns, fill_value=0.0))
+        tables["stress"] = stress.rename_axis(index="Scenario", columns="Portfolio").T.stack().rename(
+            "Portfolio Return").reset_index()
+    if levels is not None:
+        for table in tables.values():
+            table.insert(1, "Level", table["Portfolio"].map(levels))
+    return tables
+
+
+def decomposition_report(state, weights, confidence_levels=CONFIDENCE_LEVELS):
+    """
+    Euler decomposition of parametric VaR for one portfolio, for every confidence level.
+
+    :param weights: Weights aligned with state.assets
+    :return: DataFrame with Confidence, Asset and the var_decomposition columns (held assets only)
+    """
+    weights = np.asarray(weights, dtype=float)
+    held = weights != 0
+    decomposition = []
+    for level in confidence_levels:
+        frame = state.var_decomposition(weights, level)[held].reset_index()
+        frame.insert(0, "Confidence", level)
+        decomposition.append(frame)
+    return pd.concat(decomposition, ignore_index=True)
+
+
+_worker_context = None
+
+
+def _init_worker(context):
+    global _worker_context
+    _worker_context = context
+
+
+def _run_portfolio(task):
+    name, weights = task
+    state, confidence_levels = _worker_context
+    report = decomposition_report(state, weights, confidence_levels)
+    report.insert(0, "Portfolio", name)
+    return report
+
+
+def run_batch(weights, store, period="1y", confidence_levels=CONFIDENCE_LEVELS, stress=True, max_workers=1,
+              parents=None, normalize=True, dtype=np.float64):
+    """
+    Risk reports for many portfolios over one shared price matrix.
+
+    Prices for the union of all assets are loaded once. Summary, drawdown and stress tables come
+    from matrix products over all portfolios; the per-asset decompositions are spread over worker
+    processes that receive the RiskState once, so only weight vectors travel per portfolio.
+
+    :param weights: (portfolios x assets) weight DataFrame (see load_books)
+    :param store: PriceStore to load prices from
+    :param period: History window, e.g. "1y"
+    :param confidence_levels: Confidence levels to report
+    :param stress: Evaluate the scenario library
+    :param max_workers: Worker processes; 1 runs in the calling process
+    :param parents: Optional dict of portfolio -> desk for the roll-up to desks and the firm
+    :param normalize: Rescale each portfolio's weights over the assets that loaded to sum to 1
+    :param dtype: Storage type of the returns (np.float32 halves their memory for large universes)
+    :return: Tuple of (dict of table name -> DataFrame, dict of failed tickers)
+    """
+    start, end = period_to_range(period)
+    prices, failures = store.fetch_prices(list(weights.columns), start, end)
+    state = RiskState(prices, dtype=dtype)
+    weights = weights.reindex(columns=state.assets, fill_value=0.0).astype(float)
+    if normalize:
+        totals = weights.sum(axis=1).replace(0.0, 1.0)
+        weights = weights.div(totals, axis=0)
+    levels = None
+    if parents is not None:
+        weights, levels = rollup(weights, parents)
+    shocks = None
+    if stress:
+        shocks, _, _, dropped = library_shocks(state.assets, store, start, end)
+        failures = {**failures, **{f"{name} factor": reason for name, reason in dropped.items()}}
+    tables = book_tables(state, weights, confidence_levels, shocks, levels)
+
+    tasks = list(zip(weights.index, weights.to_numpy()))
+    context = (state, list(confidence_levels))
+    if max_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(context,)) as pool:
+            reports = list(pool.map(_run_portfolio, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+    else:
+        _init_worker(context)
+        reports = [_run_portfolio(task) for task in tasks]
+    tables["decomposition"] = pd.concat(reports, ignore_index=True)
+    if levels is not None:
+        tables["decomposition"].insert(1, "Level", tables["decomposition"]["Portfolio"].map(levels))
+    return tables, failures
+
+
+def write_results(tables, output_dir):
+    """
+    Write each result table to ``<output_dir>/<name>.parquet``.
+
+    :return: List of written paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(output_dir, f"{name}.parquet")
+        table.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from utils.price_store import RESAMPLE_AGG
+
+# Points per trace; about two per horizontal pixel of a full-width chart
+MAX_POINTS = 2000
+# Candles per chart; narrower candles are unreadable anyway
+MAX_BARS = 400
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, from each of ``threshold - 2`` equal buckets in between,
+    the point forming the largest triangle with the previously kept point and the mean of the
+    next bucket, which preserves the visual shape of a line far better than striding.
+
+    :param x: Increasing x values (numbers; convert dates to integers first)
+    :param y: y values without missing values
+    :param threshold: Number of points to keep
+    :return: Array of kept indices, increasing
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    edges = (np.floor(np.arange(threshold - 1) * every) + 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Mean of the next bucket (the last point for the final bucket)
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        kept[i + 1] = previous
+    return kept
+
+
+def minmax(y, n_buckets):
+    """
+    Min-max downsampling: the smallest and largest value of each of ``n_buckets`` buckets.
+
+    Cheaper than LTTB and keeps every spike, so suited to noisy series such as daily returns.
+
+    :param y: Values (missing values are ignored)
+    :param n_buckets: Number of buckets; at most 2 * n_buckets points are kept
+    :return: Array of kept indices, increasing
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    filled = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(n_buckets)[filled] * size
+    low = np.nanargmin(buckets[filled], axis=1) + offsets
+    high = np.nanargmax(buckets[filled], axis=1) + offsets
+    return np.unique(np.concatenate([low, high]))
+
+
+def downsample(series, max_points=MAX_POINTS, method="lttb"):
+    """
+    Reduce a Series to at most ``max_points`` points that draw the same line.
+
+    :param series: Series indexed by date (or number); missing values are dropped
+    :param max_points: Point budget
+    :param method: "lttb" or "minmax"
+    :return: Series of the kept points
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    if method == "minmax":
+        kept = minmax(series.to_numpy(), max_points // 2)
+    else:
+        kept = lttb(x, series.to_numpy(), max_points)
+    return series.iloc[kept]
+
+
+def ohlc_buckets(data, max_bars=MAX_BARS):
+    """
+    Aggregate consecutive bars into at most ``max_bars`` OHLC bars.
+
+    :param data: DataFrame with Open, High, Low, Close (and optionally Adj Close, Volume) columns
+    :param max_bars: Bar budget
+    :return: DataFrame of bars labelled by the first date of each bucket
+    """
+    if len(data) <= max_bars:
+        return data
+    size = -(-len(data) // max_bars)
+    groups = np.arange(len(data)) // size
+    aggregation = {column: rule for column, rule in RESAMPLE_AGG.items() if column in data.columns}
+    bars = data.groupby(groups).agg(aggregation)
+    bars.index = data.index[::size]
+    return bars
+
+
+def histogram(values, bins=50):
+    """
+    Bin values once on the server so charts send bin counts instead of every observation.
+
+    :return: Tuple of (bin centers, counts, bin width)
+    """
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return (edges[:-1] + edges[1:]) / 2, counts, edges[1] - edges[0]
@@ -0,0 +1,81 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+MAX_WORKERS = 8
+CHUNK_SIZE = 50
+RETRIES = 3
+BACKOFF = 0.5
+
+
+class FetchError(Exception):
+    """Base class for per-ticker fetch failures."""
+
+
+class EmptyDataError(FetchError):
+    """The provider returned no rows for the ticker (unknown ticker or no trading in range)."""
+
+
+class ProviderError(FetchError):
+    """The provider kept raising after all retries were used."""
+
+
+@dataclass
+class FetchResult:
+    ticker: str
+    data: object = None
+    error: FetchError = None
+    attempts: int = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def fetch_one(fetch, ticker, retries=RETRIES, backoff=BACKOFF):
+    """
+    Run ``fetch(ticker)`` with exponential backoff, turning any outcome into a FetchResult.
+
+    :param fetch: Callable taking a ticker and returning a DataFrame
+    :param ticker: Stock ticker (string)
+    :param retries: Number of retries after the first attempt
+    :param backoff: Initial backoff in seconds, doubled after every failed attempt
+    :return: FetchResult
+    """
+    for attempt in range(1, retries + 2):
+        try:
+            data = fetch(ticker)
+        except Exception as e:
+            if attempt > retries:
+                return FetchResult(ticker, error=ProviderError(f"{type(e).__name__}: {e}"), attempts=attempt)
+            time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            continue
+        if data is None or data.empty:
+            return FetchResult(ticker, error=EmptyDataError(f"No data returned for {ticker}"), attempts=attempt)
+        return FetchResult(ticker, data=data, attempts=attempt)
+
+
+def fetch_many(fetch, tickers, max_workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, retries=RETRIES, backoff=BACKOFF):
+    """
+    Fetch many tickers concurrently on a bounded thread pool.
+
+    Tickers are submitted in chunks of ``chunk_size`` so a large book does not flood the
+    provider, and a failing ticker never affects the others.
+
+    :param fetch: Callable taking a ticker and returning a DataFrame
+    :param tickers: List of stock tickers
+    :param max_workers: Maximum number of concurrent fetches
+    :param chunk_size: Number of tickers submitted to the pool at a time
+    :param retries: Number of retries per ticker
+    :param backoff: Initial backoff in seconds
+    :return: Dict of ticker -> FetchResult, in the order given
+    """
+    tickers = list(dict.fromkeys(tickers))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as pool:
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            for result in pool.map(lambda t: fetch_one(fetch, t, retries, backoff), chunk):
+                results[result.ticker] = result
+    return results
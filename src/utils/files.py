@@ -0,0 +1,59 @@
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="wb"):
+    """
+    Open a uniquely named temporary file next to ``path`` and move it over ``path`` on success.
+
+    Readers see either the old or the new file, never a half-written one, and concurrent writers
+    of the same path never share a temporary file; the last one to finish wins.
+
+    :param path: Destination file
+    :param mode: File mode ("wb" or "w")
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(mode, dir=directory, prefix=os.path.basename(path) + ".",
+                                         suffix=".tmp", delete=False)
+    try:
+        with handle:
+            yield handle
+        os.replace(handle.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(handle.name)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on ``path`` (created if missing) for a read-modify-write.
+
+    The lock is advisory and taken per open file, so it serializes threads of one process as well
+    as separate processes (Streamlit sessions, CLI workers) that use the same path.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,190 @@
+import numpy as np
+
+from utils.returns_block import ReturnsBlock, column_means, pairwise_covariance, pairwise_sums
+
+EWMA_LAMBDA = 0.94
+
+
+def _fill_missing(x, mean):
+    """Replace missing values by the current mean so they add no deviation."""
+    x = np.asarray(x, dtype=float)
+    return np.where(np.isnan(x), mean, x)
+
+
+class RunningCovariance:
+    """
+    Welford running mean and covariance, updated and downdated one observation at a time.
+
+    Each update or downdate is a rank-one change of the co-moment matrix, O(N^2) per bar
+    instead of recomputing O(T * N^2) over the whole history.
+    """
+
+    def __init__(self, n_assets):
+        self.count = 0
+        self.mean = np.zeros(n_assets)
+        self.comoment = np.zeros((n_assets, n_assets))
+
+    @classmethod
+    def from_moments(cls, count, mean, cov):
+        """Start from the sample mean and covariance of ``count`` existing observations."""
+        stats = cls(len(mean))
+        stats.count = int(count)
+        stats.mean = np.array(mean, dtype=float)
+        stats.comoment = np.array(cov, dtype=float) * max(count - 1, 0)
+        return stats
+
+    def update(self, x):
+        """Add one observation (N,)."""
+        x = _fill_missing(x, self.mean)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, x - self.mean)
+
+    def downdate(self, x):
+        """Remove one observation (N,) that was previously added."""
+        x = _fill_missing(x, self.mean)
+        if self.count <= 1:
+            self.__init__(len(self.mean))
+            return
+        previous_mean = (self.count * self.mean - x) / (self.count - 1)
+        self.comoment -= np.outer(x - previous_mean, x - self.mean)
+        self.mean = previous_mean
+        self.count -= 1
+
+    @property
+    def cov(self):
+        return self.comoment / (self.count - 1) if self.count > 1 else np.full_like(self.comoment, np.nan)
+
+    @property
+    def volatility(self):
+        return np.sqrt(np.diag(self.cov))
+
+    @property
+    def corr(self):
+        volatility = self.volatility
+        return self.cov / np.outer(volatility, volatility)
+
+
+class PairwiseCovariance:
+    """
+    Running pairwise-complete mean and covariance, equal to ``pairwise_moments`` over the same rows.
+
+    Assets listed on different dates leave gaps, so every pair keeps its own count: the sums of
+    x_i, and of x_i * x_j, over the rows where both i and j are present (``pairwise_sums``), taken
+    around a fixed shift for accuracy. Adding or removing a row adds or subtracts its rank-one
+    terms in O(N^2), so rolling the window never drifts from a full recompute, gaps or not.
+    """
+
+    def __init__(self, shift):
+        self.shift = np.nan_to_num(np.array(shift, dtype=float))
+        n_assets = len(self.shift)
+        self.count = 0
+        self.cross = np.zeros((n_assets, n_assets))
+        self.sums = np.zeros((n_assets, n_assets))
+        self.pairs = np.zeros((n_assets, n_assets))
+
+    @classmethod
+    def from_returns(cls, returns):
+        """
+        Start from a (T x N) history, shifted by its column means.
+
+        :param returns: (T x N) array or ReturnsBlock, NaN where missing
+        """
+        values = returns.values if isinstance(returns, ReturnsBlock) else np.asarray(returns)
+        stats = cls(column_means(values)[0])
+        stats.cross, stats.sums, stats.pairs = pairwise_sums(values, stats.shift)
+        stats.count = len(values)
+        return stats
+
+    @classmethod
+    def from_running(cls, running):
+        """Continue a RunningCovariance whose rows were all complete, so every pair counted all of them."""
+        stats = cls(running.mean)
+        stats.count = running.count
+        stats.cross = running.comoment.copy()
+        stats.pairs = np.full_like(stats.cross, running.count)
+        return stats
+
+    def _terms(self, x):
+        x = np.asarray(x, dtype=float) - self.shift
+        mask = (~np.isnan(x)).astype(float)
+        x = np.nan_to_num(x)
+        return np.outer(x, x), np.outer(x, mask), np.outer(mask, mask)
+
+    def update(self, x):
+        """Add one row (N,), NaN where missing."""
+        cross, sums, pairs = self._terms(x)
+        self.cross += cross
+        self.sums += sums
+        self.pairs += pairs
+        self.count += 1
+
+    def downdate(self, x):
+        """Remove one row (N,) that was previously added."""
+        cross, sums, pairs = self._terms(x)
+        self.cross -= cross
+        self.sums -= sums
+        self.pairs -= pairs
+        self.count -= 1
+
+    @property
+    def mean(self):
+        """Mean of every column over the rows where it is present."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.shift + np.diag(self.sums) / np.diag(self.pairs)
+
+    @property
+    def cov(self):
+        return pairwise_covariance(self.cross, self.sums, self.pairs)
+
+    @property
+    def volatility(self):
+        return np.sqrt(np.diag(self.cov))
+
+    @property
+    def corr(self):
+        volatility = self.volatility
+        return self.cov / np.outer(volatility, volatility)
+
+
+class EwmaCovariance:
+    """
+    RiskMetrics exponentially weighted (zero-mean) covariance: S = lam * S + (1 - lam) * x x'.
+    """
+
+    def __init__(self, n_assets, lam=EWMA_LAMBDA):
+        self.lam = lam
+        self.cov = np.zeros((n_assets, n_assets))
+        self.count = 0
+
+    @classmethod
+    def from_returns(cls, returns, lam=EWMA_LAMBDA):
+        """
+        Run the recursion over a (T x N) history, seeded with the sample covariance.
+
+        :param returns: (T x N) array of returns; missing values count as zero
+        """
+        returns = np.nan_to_num(np.asarray(returns, dtype=float))
+        stats = cls(returns.shape[1], lam)
+        stats.cov = np.cov(returns, rowvar=False) if len(returns) > 1 else stats.cov
+        stats.cov = np.atleast_2d(stats.cov)
+        # Closed form of the recursion: weights lam^(T-1-t) * (1 - lam) on each outer product
+        weights = (1 - lam) * lam ** np.arange(len(returns) - 1, -1, -1)
+        stats.cov = lam ** len(returns) * stats.cov + (returns * weights[:, None]).T @ returns
+        stats.count = len(returns)
+        return stats
+
+    def update(self, x):
+        x = np.nan_to_num(np.asarray(x, dtype=float))
+        self.cov = self.lam * self.cov + (1 - self.lam) * np.outer(x, x)
+        self.count += 1
+
+    @property
+    def volatility(self):
+        return np.sqrt(np.diag(self.cov))
+
+    @property
+    def corr(self):
+        volatility = self.volatility
+        return self.cov / np.outer(volatility, volatility)
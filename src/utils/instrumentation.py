@@ -0,0 +1,220 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Stages in the order the diagnostics panel lists them; "tab" time is what the tab spends
+# outside the other spans (pandas work, Streamlit elements)
+STAGES = ["fetch", "cache", "calc", "render", "tab"]
+# Exclusive upper bounds of the latency histogram buckets in milliseconds, so bucket i holds
+# [BUCKETS_MS[i - 1], BUCKETS_MS[i]); the last bucket is open-ended
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+RECENT = 1000
+DEFAULT_LOG_PATH = os.environ.get("RISK_METRICS_LOG")
+
+logger = logging.getLogger("market_risk.metrics")
+# Rerun open in the current context (Streamlit runs each session's script on its own thread), so
+# concurrent sessions collect their spans separately
+_current_rerun = contextvars.ContextVar("current_rerun", default=None)
+
+
+class Metrics:
+    """
+    Thread-safe registry of span latencies, counters and cache hit/miss counts.
+
+    Spans are grouped into reruns (``start_rerun``/``end_rerun``), tracked per context, so the
+    time of a session's last Streamlit rerun can be broken down by stage, while histograms and
+    counters accumulate over the life of the process. Every finished span is also emitted as one JSON line on the
+    ``market_risk.metrics`` logger and, with ``log_path``, appended to a file.
+    """
+
+    def __init__(self, log_path=DEFAULT_LOG_PATH):
+        self._lock = threading.Lock()
+        self.log_path = log_path
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = defaultdict(lambda: [0] * (len(BUCKETS_MS) + 1))
+            self.recent = defaultdict(lambda: deque(maxlen=RECENT))
+            self.totals = defaultdict(float)
+            self.calls = defaultdict(int)
+            self.stages = {}
+            self.counters = defaultdict(float)
+            self.cache = defaultdict(lambda: {"calls": 0, "misses": 0})
+            self.rerun = 0
+
+    def record(self, name, stage, seconds, self_seconds=None, **fields):
+        milliseconds = seconds * 1000
+        self_ms = milliseconds if self_seconds is None else self_seconds * 1000
+        with self._lock:
+            self.histograms[name][bisect.bisect_right(BUCKETS_MS, milliseconds)] += 1
+            self.recent[name].append(milliseconds)
+            self.totals[name] += milliseconds
+            self.calls[name] += 1
+            self.stages[name] = stage
+        current = _current_rerun.get()
+        rerun = None
+        if current is not None:
+            current["spans"].append((name, stage, milliseconds, self_ms))
+            rerun = current["number"]
+        self._emit({"type": "span", "rerun": rerun, "name": name, "stage": stage, "ms": round(milliseconds, 3),
+                    **fields})
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def cache_call(self, name, miss=False):
+        with self._lock:
+            entry = self.cache[name]
+            if miss:
+                entry["misses"] += 1
+            else:
+                entry["calls"] += 1
+
+    def start_rerun(self):
+        """Open a rerun in the current context; spans recorded in it are collected until ``end_rerun``."""
+        with self._lock:
+            self.rerun += 1
+            number = self.rerun
+        _current_rerun.set({"number": number, "start": time.perf_counter(), "spans": []})
+
+    def end_rerun(self):
+        """
+        Close the rerun of the current context.
+
+        :return: List of (name, stage, ms, self ms) spans of the rerun, the rerun itself last; empty
+            if no rerun was open
+        """
+        current = _current_rerun.get()
+        if current is None:
+            return []
+        self.record("rerun", "rerun", time.perf_counter() - current["start"])
+        _current_rerun.set(None)
+        return list(current["spans"])
+
+    def _emit(self, event):
+        if logger.isEnabledFor(logging.DEBUG) or self.log_path:
+            line = json.dumps(event, default=str)
+            logger.debug(line)
+            if self.log_path:
+                with self._lock, open(self.log_path, "a") as f:
+                    f.write(line + "\n")
+
+    def span_table(self):
+        """
+        Latency summary per span name.
+
+        :return: List of dicts with name, stage, calls, total, mean, p50, p95 and max (ms)
+        """
+        with self._lock:
+            rows = []
+            for name, values in self.recent.items():
+                ordered = sorted(values)
+                rows.append({
+                    "name": name,
+                    "stage": self.stages[name],
+                    "calls": self.calls[name],
+                    "total_ms": self.totals[name],
+                    "mean_ms": self.totals[name] / self.calls[name],
+                    "p50_ms": ordered[len(ordered) // 2],
+                    "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                    "max_ms": ordered[-1],
+                })
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def cache_table(self):
+        """:return: List of dicts with name, calls, hits, misses and hit rate per cached function"""
+        with self._lock:
+            return [
+                {"name": name, "calls": entry["calls"], "hits": entry["calls"] - entry["misses"],
+                 "misses": entry["misses"],
+                 "hit_rate": (entry["calls"] - entry["misses"]) / entry["calls"] if entry["calls"] else 0.0}
+                for name, entry in self.cache.items()
+            ]
+
+    @staticmethod
+    def stage_breakdown(spans):
+        """
+        Time of a rerun per stage, from each span's own time excluding nested spans.
+
+        Spans of worker threads overlap their caller, so stages can add up to more than the rerun.
+
+        :param spans: Spans returned by ``end_rerun``
+        :return: Dict of stage -> milliseconds
+        """
+        breakdown = defaultdict(float)
+        for _, stage, _, self_ms in spans:
+            if stage != "rerun":
+                breakdown[stage] += self_ms
+        return dict(breakdown)
+
+    def snapshot(self, last_rerun=()):
+        """
+        All metrics as one JSON-serializable dict.
+
+        :param last_rerun: Spans of the session's last rerun, as returned by ``end_rerun``
+        """
+        with self._lock:
+            histograms = {name: list(counts) for name, counts in self.histograms.items()}
+            counters = dict(self.counters)
+            rerun = self.rerun
+        last_rerun = [{"name": n, "stage": s, "ms": ms, "self_ms": own} for n, s, ms, own in last_rerun]
+        return {
+            "rerun": rerun,
+            "buckets_ms": BUCKETS_MS,
+            "spans": self.span_table(),
+            "histograms": histograms,
+            "cache": self.cache_table(),
+            "counters": counters,
+            "last_rerun": last_rerun,
+        }
+
+
+_metrics = Metrics()
+_active = threading.local()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+class span(contextlib.ContextDecorator):
+    """
+    Time a block or a function and record it under ``name``.
+
+    Use as ``with span("var_table"):`` or ``@span("var_table", stage="calc")``.
+    """
+
+    def __init__(self, name, stage="calc", **fields):
+        self.name = name
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        # Stack of [start, seconds in nested spans] per open span on this thread; kept off the
+        # instance so one decorator instance can time concurrent and recursive calls
+        if not hasattr(_active, "stack"):
+            _active.stack = []
+        _active.stack.append([time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        start, children = _active.stack.pop()
+        elapsed = time.perf_counter() - start
+        if _active.stack:
+            _active.stack[-1][1] += elapsed
+        _metrics.record(self.name, self.stage, elapsed, elapsed - children, **self.fields)
+        return False
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name`` (e.g. bytes fetched)."""
+    _metrics.count(name, value)
@@ -0,0 +1,216 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils.instrumentation import span
+from utils.var_engine import z_score
+
+METHODS = ["gbm", "bootstrap", "fhs"]
+CHUNK_SIZE = 10_000
+# Paths drawn from one child seed; chunks are made of whole blocks, so chunking never changes the draws
+SEED_BLOCK = 1_000
+# Paths between convergence checks
+ROUND_PATHS = 80_000
+EWMA_LAMBDA = 0.94
+
+
+@dataclass
+class SimulationResult:
+    var: float
+    cvar: float
+    ci: tuple
+    paths: int
+    converged: bool
+
+
+def _ewma_volatility(log_returns, lam=EWMA_LAMBDA):
+    """Return EWMA volatilities for each day of history and the one-step-ahead forecast."""
+    variance = np.empty_like(log_returns)
+    current = np.nanvar(log_returns, axis=0)
+    for t, row in enumerate(log_returns):
+        variance[t] = current
+        current = lam * current + (1 - lam) * row ** 2
+    return np.sqrt(variance), np.sqrt(current)
+
+
+def build_model(returns, weights, method="gbm", horizon=1, lam=EWMA_LAMBDA):
+    """
+    Prepare everything a simulation chunk needs from a history of asset returns.
+
+    :param returns: (T x N) array, DataFrame or ReturnsBlock of simple daily returns without missing values
+    :param weights: Portfolio weights (N,)
+    :param method: "gbm" (correlated normal log returns via Cholesky), "bootstrap" (resampled
+        historical days) or "fhs" (filtered historical simulation with EWMA volatility)
+    :param horizon: Horizon in trading days
+    :param lam: EWMA decay used by filtered historical simulation
+    :return: Dict describing the model
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown simulation method: {method}")
+    log_returns = np.log1p(np.asarray(returns, dtype=float))
+    if log_returns.ndim == 1:
+        log_returns = log_returns[:, None]
+    model = {"method": method, "weights": np.asarray(weights, dtype=float), "horizon": int(horizon)}
+    if method == "gbm":
+        cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+        # Small ridge keeps the factorisation stable for nearly collinear assets
+        model["chol"] = np.linalg.cholesky(cov + 1e-12 * np.eye(len(cov)))
+        model["mu"] = log_returns.mean(axis=0)
+    elif method == "bootstrap":
+        model["history"] = log_returns
+    else:
+        volatility, forecast = _ewma_volatility(log_returns, lam)
+        model["residuals"] = log_returns / np.where(volatility > 0, volatility, np.nan)
+        model["residuals"] = np.nan_to_num(model["residuals"])
+        model["volatility"] = forecast
+        model["lam"] = lam
+    return model
+
+
+def simulate_chunk(model, seeds, n_paths):
+    """
+    Simulate portfolio returns over the model horizon for one chunk of paths.
+
+    :param model: Dict from build_model
+    :param seeds: One SeedSequence (or int) per block of SEED_BLOCK paths
+    :param n_paths: Number of paths; only the last block may be shorter than SEED_BLOCK
+    :return: Array of n_paths simple portfolio returns
+    """
+    sizes = [min(SEED_BLOCK, n_paths - i * SEED_BLOCK) for i in range(len(seeds))]
+    return np.concatenate([_simulate_block(model, seed, size) for seed, size in zip(seeds, sizes)])
+
+
+def _simulate_block(model, seed, n_paths):
+    rng = np.random.default_rng(seed)
+    horizon = model["horizon"]
+    if model["method"] == "gbm":
+        # Sums of i.i.d. normal daily log returns are normal, so the horizon is one draw
+        z = rng.standard_normal((n_paths, len(model["mu"])))
+        log_total = horizon * model["mu"] + math.sqrt(horizon) * z @ model["chol"].T
+    elif model["method"] == "bootstrap":
+        history = model["history"]
+        log_total = np.zeros((n_paths, history.shape[1]))
+        for _ in range(horizon):
+            log_total += history[rng.integers(len(history), size=n_paths)]
+    else:
+        residuals = model["residuals"]
+        lam = model["lam"]
+        variance = np.broadcast_to(model["volatility"] ** 2, (n_paths, residuals.shape[1])).copy()
+        log_total = np.zeros_like(variance)
+        for _ in range(horizon):
+            day = residuals[rng.integers(len(residuals), size=n_paths)] * np.sqrt(variance)
+            log_total += day
+            variance = lam * variance + (1 - lam) * day ** 2
+    return np.expm1(log_total) @ model["weights"]
+
+
+class TailQuantile:
+    """
+    Streaming estimate of a lower quantile, its CVaR and a confidence interval.
+
+    Only the smallest ``capacity`` values seen are kept, enough to cover the upper end of the
+    confidence interval at ``max_count`` observations, so memory does not grow with the paths.
+    """
+
+    def __init__(self, confidence_level, max_count, ci_level=0.95):
+        self.p = 1 - confidence_level
+        self.z = z_score(1 - (1 - ci_level) / 2)
+        spread = self.z * math.sqrt(max_count * self.p * (1 - self.p))
+        self.capacity = min(max_count, int(math.ceil(max_count * self.p + 2 * spread)) + 2)
+        self.tail = np.empty(0)
+        self.count = 0
+
+    def update(self, values):
+        self.count += len(values)
+        merged = np.concatenate([self.tail, values])
+        if len(merged) > self.capacity:
+            merged = np.partition(merged, self.capacity - 1)[:self.capacity]
+        self.tail = merged
+
+    def estimate(self):
+        """Return (VaR, CVaR, (lower, upper)) using the order statistic int(p * n)."""
+        ordered = np.sort(self.tail)
+        n = self.count
+        k = min(int(self.p * n), len(ordered) - 1)
+        spread = self.z * math.sqrt(n * self.p * (1 - self.p))
+        lower = ordered[max(int(math.floor(n * self.p - spread)), 0)]
+        upper = ordered[min(int(math.ceil(n * self.p + spread)), len(ordered) - 1)]
+        return ordered[k], ordered[:k + 1].mean(), (lower, upper)
+
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _run_chunk(task):
+    seeds, n_paths = task
+    return simulate_chunk(_worker_model, seeds, n_paths)
+
+
+@span("simulate_var")
+def simulate_var(returns, weights, confidence_level=0.95, method="gbm", horizon=1, n_paths=1_000_000,
+                 chunk_size=CHUNK_SIZE, max_workers=1, seed=None, tolerance=None, min_paths=100_000):
+    """
+    Monte Carlo VaR/CVaR of a portfolio with bounded memory and reproducible parallel paths.
+
+    Paths are drawn in blocks of SEED_BLOCK, block i always from the i-th child of
+    ``SeedSequence(seed)``, and simulated in chunks of whole blocks, so a seeded run gives the
+    same result for any ``chunk_size`` and ``max_workers``. Convergence is checked every
+    ROUND_PATHS paths: when ``tolerance`` is set the run stops early once the half-width of the
+    VaR confidence interval is within ``tolerance`` of |VaR|.
+
+    :param returns: (T x N) array, DataFrame or ReturnsBlock of simple daily returns without missing values
+    :param weights: Portfolio weights (N,)
+    :param confidence_level: VaR confidence level
+    :param method: "gbm", "bootstrap" or "fhs" (see build_model)
+    :param horizon: Horizon in trading days
+    :param n_paths: Maximum number of paths
+    :param chunk_size: Paths per chunk, rounded down to whole blocks (at least one)
+    :param max_workers: Worker processes; 1 runs in the calling process
+    :param seed: Seed for the SeedSequence
+    :param tolerance: Relative CI half-width to stop at, or None to run all paths
+    :param min_paths: Minimum number of paths before stopping early
+    :return: SimulationResult
+    """
+    model = build_model(returns, weights, method, horizon)
+    n_blocks = int(math.ceil(n_paths / SEED_BLOCK))
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    chunk_blocks = max(1, chunk_size // SEED_BLOCK)
+    round_blocks = ROUND_PATHS // SEED_BLOCK
+    tail = TailQuantile(confidence_level, n_paths)
+
+    pool = None
+    if max_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(model,))
+    converged = False
+    try:
+        for start in range(0, n_blocks, round_blocks):
+            stop = min(start + round_blocks, n_blocks)
+            batch = []
+            for first in range(start, stop, chunk_blocks):
+                last = min(first + chunk_blocks, stop)
+                batch.append((seeds[first:last], min(last * SEED_BLOCK, n_paths) - first * SEED_BLOCK))
+            if pool is None:
+                chunks = [simulate_chunk(model, s, n) for s, n in batch]
+            else:
+                chunks = pool.map(_run_chunk, batch)
+            for chunk in chunks:
+                tail.update(chunk)
+            if tolerance is not None and tail.count >= min_paths:
+                var, _, (lower, upper) = tail.estimate()
+                if (upper - lower) / 2 <= tolerance * abs(var):
+                    converged = True
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    var, cvar, (lower, upper) = tail.estimate()
+    return SimulationResult(var=float(var), cvar=float(cvar), ci=(float(lower), float(upper)),
+                            paths=tail.count, converged=converged)
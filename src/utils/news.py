@@ -1,6 +1,417 @@
+import asyncio
+import email.utils
+import hashlib
+import http.client
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import quote, urljoin, urlsplit
+
 import feedparser
+import pandas as pd
+
+from utils.fetch import EmptyDataError, FetchError, ProviderError
+from utils.instrumentation import count, span
+
+FEED_URL = "https://news.google.com/rss/search?q={ticker}&hl=en-US&gl=US&ceid=US:en"
+DEFAULT_FEED_DIR = os.environ.get("NEWS_FEED_DIR")
+DEFAULT_LEXICON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sentiment_lexicon.json")
+TTL = 15 * 60
+TIMEOUT = 10
+MAX_CONNECTIONS = 8
+MAX_REDIRECTS = 3
+USER_AGENT = "market-risk-dashboard"
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict = field(default_factory=dict)
+    body: bytes = b""
+
+
+class FeedSource:
+    """
+    Transport for feed documents.
+
+    ``get`` is a coroutine returning a Response for a ticker's feed, honouring the
+    If-None-Match/If-Modified-Since request headers with a 304 response, and raising on
+    transport errors.
+    """
+
+    def location(self, ticker):
+        raise NotImplementedError
+
+    async def get(self, ticker, headers):
+        raise NotImplementedError
+
+
+class HttpFeedSource(FeedSource):
+    """
+    RSS search feeds over HTTP(S), with keep-alive connections pooled per host.
+
+    Requests run on worker threads so many feeds are in flight at once under asyncio, and
+    finished connections go back to a per-host pool for the next request, which saves a TCP
+    and TLS handshake per feed.
+
+    :param url: Feed URL template with a ``{ticker}`` placeholder
+    :param max_connections: Idle connections kept per host
+    :param timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, url=FEED_URL, max_connections=MAX_CONNECTIONS, timeout=TIMEOUT):
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def location(self, ticker):
+        return self.url.format(ticker=quote(ticker))
+
+    def _connection(self, scheme, host):
+        with self._lock:
+            if self._idle[scheme, host]:
+                return self._idle[scheme, host].pop(), True
+        connection = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection(host, timeout=self.timeout), False
+
+    def _release(self, scheme, host, connection):
+        with self._lock:
+            if len(self._idle[scheme, host]) < self.max_connections:
+                self._idle[scheme, host].append(connection)
+                return
+        connection.close()
+
+    def _request(self, url, headers):
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            connection, reused = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path, headers={"User-Agent": USER_AGENT, **headers})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                # The server may have dropped an idle connection; retry once on a fresh one
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(parts.scheme, parts.netloc, connection)
+            return Response(response.status, dict(response.headers), body)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    async def get(self, ticker, headers):
+        url = self.location(ticker)
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await asyncio.to_thread(self._request, url, headers)
+            if response.status not in (301, 302, 303, 307, 308) or "Location" not in response.headers:
+                count("bytes_fetched", len(response.body))
+                return response
+            url = urljoin(url, response.headers["Location"])
+        raise ProviderError(f"Too many redirects for {ticker}")
+
+
+class LocalFeedSource(FeedSource):
+    """
+    Feeds read from ``<directory>/<TICKER>.xml`` files, as a stand-in for the HTTP feeds.
+
+    ETag and Last-Modified come from the file's modification time and size, so conditional
+    requests and the cache behave as they do against a server.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def location(self, ticker):
+        return os.path.join(self.directory, f"{ticker.upper()}.xml")
+
+    def _read(self, path, headers):
+        if not os.path.exists(path):
+            return Response(404)
+        stat = os.stat(path)
+        validators = {
+            "ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            "Last-Modified": email.utils.formatdate(stat.st_mtime, usegmt=True),
+        }
+        if (headers.get("If-None-Match") == validators["ETag"]
+                or headers.get("If-Modified-Since") == validators["Last-Modified"]):
+            return Response(304, validators)
+        with open(path, "rb") as f:
+            return Response(200, validators, f.read())
+
+    async def get(self, ticker, headers):
+        return await asyncio.to_thread(self._read, self.location(ticker), headers)
+
+
+def default_source():
+    """LocalFeedSource over NEWS_FEED_DIR when set, otherwise Google News RSS search."""
+    return LocalFeedSource(DEFAULT_FEED_DIR) if DEFAULT_FEED_DIR else HttpFeedSource()
+
+
+def parse_entries(body):
+    """
+    Headlines of a feed document.
+
+    :return: List of dicts with title, link, source and published (UTC Timestamp or NaT)
+    """
+    feed = feedparser.parse(io.BytesIO(body))
+    entries = []
+    for entry in feed.entries:
+        published = entry.get("published_parsed") or entry.get("updated_parsed")
+        entries.append({
+            "title": entry.get("title", ""),
+            "link": entry.get("link", ""),
+            "source": entry.get("source", {}).get("title", ""),
+            "published": pd.Timestamp(*published[:6], tz="UTC") if published else pd.NaT,
+        })
+    return entries
+
+
+class FeedCache:
+    """
+    Parsed feeds with their validators, fresh for ``ttl`` seconds.
+
+    A fresh feed is served without a request; a stale one is revalidated with a conditional
+    request and kept as is on 304 Not Modified.
+    """
+
+    def __init__(self, ttl=TTL):
+        self.ttl = ttl
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._feeds.get(key)
+
+    def put(self, key, entries, headers):
+        with self._lock:
+            self._feeds[key] = {
+                "entries": entries,
+                "fetched": time.time(),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+
+    def touch(self, key):
+        with self._lock:
+            self._feeds[key]["fetched"] = time.time()
+
+    def fresh(self, key, now=None):
+        cached = self.get(key)
+        return cached is not None and (now or time.time()) - cached["fetched"] < self.ttl
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+
+
+class NewsClient:
+    """
+    Fetches the feeds of many tickers concurrently with asyncio.
+
+    :param source: FeedSource (default_source() if None)
+    :param ttl: Seconds a fetched feed is served from the cache before it is revalidated
+    :param max_concurrency: Feeds in flight at once
+    """
+
+    def __init__(self, source=None, ttl=TTL, max_concurrency=MAX_CONNECTIONS):
+        self.source = source or default_source()
+        self.cache = FeedCache(ttl)
+        self.max_concurrency = max_concurrency
+        self.requests = 0
+        self.not_modified = 0
+        # The client is shared between sessions, each fetching on its own event loop and thread
+        self._lock = threading.Lock()
+
+    async def fetch(self, ticker, limit=None):
+        """
+        Headlines of one ticker's feed, from the cache while fresh.
+
+        :raises EmptyDataError: if the feed does not exist
+        :raises ProviderError: on any other HTTP or transport failure
+        """
+        key = self.source.location(ticker)
+        cached = self.cache.get(key)
+        if self.cache.fresh(key):
+            return cached["entries"]
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        async with limit or asyncio.Semaphore(1):
+            with self._lock:
+                self.requests += 1
+            try:
+                response = await self.source.get(ticker, headers)
+            except FetchError:
+                raise
+            except Exception as e:
+                raise ProviderError(f"{type(e).__name__}: {e}") from e
+        if response.status == 304 and cached is not None:
+            with self._lock:
+                self.not_modified += 1
+            self.cache.touch(key)
+            return cached["entries"]
+        if response.status == 404:
+            raise EmptyDataError(f"No news feed for {ticker}")
+        if response.status != 200:
+            raise ProviderError(f"HTTP {response.status} for {ticker}")
+        entries = await asyncio.to_thread(parse_entries, response.body)
+        self.cache.put(key, entries, response.headers)
+        return entries
+
+    async def fetch_all(self, tickers):
+        """
+        :return: Tuple of (dict of ticker -> list of headlines, dict of failed ticker -> FetchError)
+        """
+        tickers = list(dict.fromkeys(tickers))
+        # Created per call: a semaphore belongs to the event loop it is first used on
+        limit = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self.fetch(t, limit) for t in tickers), return_exceptions=True)
+        feeds, failures = {}, {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, FetchError):
+                failures[ticker] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                feeds[ticker] = result
+        return feeds, failures
+
+    @span("news", stage="fetch")
+    def collect(self, tickers, lexicon=None):
+        """
+        Fetch every ticker's feed and index the de-duplicated stories.
+
+        :return: Tuple of (NewsIndex, dict of failed ticker -> FetchError)
+        """
+        feeds, failures = asyncio.run(self.fetch_all(tickers))
+        index = NewsIndex(lexicon)
+        for ticker, entries in feeds.items():
+            index.add(ticker, entries)
+        return index, failures
+
+
+class Lexicon:
+    """
+    Word-list headline sentiment: (positive - negative) / (positive + negative) in [-1, 1].
+
+    A negation within the three preceding words flips a word's polarity ("not profitable"). The
+    negation stops at punctuation and at the first word it flips, so it does not reach into the
+    next clause ("not profitable, stock falls"). Crude next to a trained model, but local, instant
+    and stable enough to average per day.
+    """
+
+    def __init__(self, path=DEFAULT_LEXICON):
+        with open(path) as f:
+            words = json.load(f)
+        self.positive = set(words["positive"])
+        self.negative = set(words["negative"])
+        self.negations = set(words["negations"])
+
+    def score(self, text):
+        tokens = re.findall(r"[a-z']+|[.,;:!?]", text.lower())
+        positive = negative = 0
+        # Words still covered by the last negation
+        scope = 0
+        for token in tokens:
+            if token in self.negations:
+                scope = 3
+                continue
+            if token in ".,;:!?":
+                scope = 0
+                continue
+            polarity = (token in self.positive) - (token in self.negative)
+            if polarity and scope:
+                polarity, scope = -polarity, 0
+            else:
+                scope = max(scope - 1, 0)
+            positive += polarity > 0
+            negative += polarity < 0
+        return (positive - negative) / (positive + negative) if positive + negative else 0.0
+
+
+def story_key(title):
+    """Identity of a story across feeds: its headline without the trailing " - Source", normalized."""
+    title = re.sub(r"\s+-\s+[^-]+$", "", title)
+    return hashlib.sha1(re.sub(r"[^a-z0-9]+", " ", title.lower()).strip().encode()).hexdigest()[:16]
+
+
+class NewsIndex:
+    """
+    De-duplicated stories indexed by ticker and publication time.
+
+    A story found in several tickers' feeds is stored and scored once and listed under each
+    of them.
+    """
+
+    COLUMNS = ["Story", "Title", "Source", "Link", "Sentiment"]
+
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon or Lexicon()
+        self.stories = {}
+        self.tickers = defaultdict(set)
+        self._frame = None
+
+    def add(self, ticker, entries):
+        for entry in entries:
+            key = story_key(entry["title"])
+            if key not in self.stories:
+                self.stories[key] = {**entry, "sentiment": self.lexicon.score(entry["title"])}
+            elif pd.isna(self.stories[key]["published"]) or entry["published"] < self.stories[key]["published"]:
+                # Keep the earliest sighting
+                self.stories[key]["published"] = entry["published"]
+            self.tickers[key].add(ticker)
+        self._frame = None
+
+    @property
+    def frame(self):
+        """DataFrame indexed by (Ticker, Published), sorted, with one row per story and ticker."""
+        if self._frame is None:
+            rows = [
+                (ticker, story["published"], key, story["title"], story["source"], story["link"], story["sentiment"])
+                for key, story in self.stories.items() for ticker in sorted(self.tickers[key])
+            ]
+            frame = pd.DataFrame(rows, columns=["Ticker", "Published"] + self.COLUMNS)
+            frame["Published"] = pd.to_datetime(frame["Published"], utc=True)
+            self._frame = frame.set_index(["Ticker", "Published"]).sort_index()
+        return self._frame
+
+    def headlines(self, ticker, start=None, end=None):
+        """Stories of one ticker published in [start, end], newest first."""
+        if ticker not in self.frame.index.get_level_values("Ticker"):
+            return pd.DataFrame(columns=self.COLUMNS)
+        stories = self.frame.xs(ticker, level="Ticker")
+        return stories.loc[start:end].iloc[::-1]
+
+    def daily_sentiment(self):
+        """
+        :return: DataFrame indexed by (Ticker, Date) with the number of headlines and their mean sentiment
+        """
+        frame = self.frame.reset_index()
+        frame["Date"] = frame["Published"].dt.tz_convert(None).dt.normalize()
+        return frame.groupby(["Ticker", "Date"])["Sentiment"].agg(Headlines="count", Sentiment="mean")
+
 
 def fetch_stock_news(stock):
-    feed_url = f"https://news.google.com/rss/search?q={stock}&hl=en-US&gl=US&ceid=US:en"
-    feed = feedparser.parse(feed_url)
-    return [{"title": entry.title, "link": entry.link} for entry in feed.entries]
+    index, _ = NewsClient().collect([stock])
+    return [{"title": row.Title, "link": row.Link} for row in index.headlines(stock).itertuples()]
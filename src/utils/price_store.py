@@ -0,0 +1,319 @@
+import json
+import os
+import re
+import time
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.fetch import fetch_many
+from utils.files import atomic_write, file_lock
+from utils.instrumentation import count, span
+
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+# Resampling rules matching the yfinance 1wk/1mo bar conventions (bars labelled by period start)
+RESAMPLE_RULES = {"Daily": None, "Weekly": "W-MON", "Monthly": "MS"}
+RESAMPLE_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Adj Close": "last", "Volume": "sum"}
+
+# Seconds before the still-open latest bar is downloaded again
+REFRESH_INTERVAL = 15 * 60
+
+DEFAULT_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR", os.path.join(os.path.expanduser("~"), ".market_risk_dashboard", "prices")
+)
+
+
+def _to_date(value):
+    return pd.Timestamp(value).normalize()
+
+
+def _empty_frame():
+    return pd.DataFrame(columns=FIELDS, index=pd.DatetimeIndex([], name="Date"), dtype=float)
+
+
+def period_to_range(period, today=None):
+    """
+    Convert a yfinance-style period string into a (start, end) date range.
+
+    :param period: Period such as "5d", "6mo", "1y" or "10y"
+    :param today: Reference date (defaults to today)
+    :return: Tuple of (start, end) timestamps, end exclusive
+    """
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period}")
+    amount, unit = int(match.group(1)), match.group(2)
+    offset = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}[unit]
+    today = _to_date(today or date.today())
+    return today - pd.DateOffset(**{offset: amount}), today + timedelta(days=1)
+
+
+class DataSource:
+    """
+    Provider interface for daily bars.
+
+    ``download`` returns a DataFrame indexed by date with (a subset of) the FIELDS columns for
+    [start, end), an empty DataFrame if there is no data, and raises on transient errors.
+    """
+
+    def download(self, ticker, start, end):
+        raise NotImplementedError
+
+
+class YahooSource(DataSource):
+    """Daily OHLCV bars downloaded from Yahoo Finance."""
+
+    def download(self, ticker, start, end):
+        import yfinance as yf
+
+        data = yf.download(ticker, start=start, end=end, interval="1d", auto_adjust=False, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        return data
+
+
+class LocalCSVSource(DataSource):
+    """
+    Daily OHLCV bars read from ``<directory>/<TICKER>.csv`` files.
+
+    Used to run the dashboard offline or against a fixed data set.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def download(self, ticker, start, end):
+        path = os.path.join(self.directory, f"{ticker.upper()}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=FIELDS)
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        return data[(data.index >= start) & (data.index < end)]
+
+
+class FakeSource(DataSource):
+    """
+    Synthetic random-walk bars with injected latency and failures, for benchmarks and offline runs.
+
+    :param latency: Seconds to sleep per download
+    :param fail: Tickers that always raise
+    :param empty: Tickers that always return no data
+    """
+
+    def __init__(self, latency=0.0, fail=(), empty=()):
+        self.latency = latency
+        self.fail = {t.upper() for t in fail}
+        self.empty = {t.upper() for t in empty}
+
+    def download(self, ticker, start, end):
+        time.sleep(self.latency)
+        if ticker.upper() in self.fail:
+            raise ConnectionError(f"Injected failure for {ticker}")
+        index = pd.bdate_range(start, pd.Timestamp(end) - timedelta(days=1), name="Date")
+        if ticker.upper() in self.empty or len(index) == 0:
+            return _empty_frame()
+        # One seeded walk per ticker from a fixed origin, so overlapping downloads agree
+        days = (index - pd.Timestamp("1970-01-01")).days.to_numpy()
+        rng = np.random.default_rng(zlib.crc32(ticker.upper().encode()))
+        steps = 0.0002 + 0.015 * rng.standard_normal(days.max() + 1)
+        close = 100 * np.exp(np.cumsum(steps))[days]
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Adj Close": close, "Volume": 1e6}, index=index)
+
+
+class PriceStore:
+    """
+    On-disk store of daily bars, one set of memory-mapped NumPy arrays per ticker.
+
+    Each ticker directory holds ``dates.npy`` (datetime64[ns]), ``values.npy`` (rows x FIELDS)
+    and ``coverage.json``, the half-open date range already requested from the source. Only the
+    parts of a request outside that range are downloaded; everything else is served from disk.
+    Plain .npy files are used rather than Parquet because they can be memory-mapped, so a read
+    maps the stored history instead of decoding it. Top-ups of a ticker hold a lock on its
+    directory, so sessions and processes sharing the store never interleave their writes.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, source=None, refresh_interval=REFRESH_INTERVAL):
+        self.root = root
+        self.source = source or YahooSource()
+        self.refresh_interval = refresh_interval
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, ticker.upper())
+
+    def _read(self, ticker):
+        path = self._ticker_dir(ticker)
+        if not os.path.exists(os.path.join(path, "coverage.json")):
+            return None, None, 0.0
+        with open(os.path.join(path, "coverage.json")) as f:
+            coverage = json.load(f)
+        dates = np.load(os.path.join(path, "dates.npy"), mmap_mode="r")
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        frame = pd.DataFrame(values, index=pd.DatetimeIndex(dates, name="Date"), columns=FIELDS)
+        return frame, (pd.Timestamp(coverage["start"]), pd.Timestamp(coverage["end"])), coverage["updated"]
+
+    def _write(self, ticker, frame, coverage):
+        path = self._ticker_dir(ticker)
+        arrays = {
+            "dates.npy": frame.index.values.astype("datetime64[ns]"),
+            "values.npy": np.ascontiguousarray(frame[FIELDS].to_numpy(dtype=np.float64)),
+        }
+        for name, array in arrays.items():
+            with atomic_write(os.path.join(path, name)) as f:
+                np.save(f, array)
+        # The coverage record goes last, so it never claims dates the arrays do not hold yet
+        with atomic_write(os.path.join(path, "coverage.json"), "w") as f:
+            json.dump({"start": coverage[0].isoformat(), "end": coverage[1].isoformat(), "updated": time.time()}, f)
+
+    def _download(self, ticker, start, end):
+        with span("download", stage="fetch", source=type(self.source).__name__):
+            data = self.source.download(ticker, start, end)
+        if data is None or data.empty:
+            return _empty_frame()
+        data = data.reindex(columns=FIELDS)
+        if data["Adj Close"].isna().all():
+            data["Adj Close"] = data["Close"]
+        data.index = pd.DatetimeIndex(data.index).tz_localize(None).normalize()
+        data.index.name = "Date"
+        count("bytes_fetched", int(data.memory_usage(deep=True).sum()))
+        return data.astype(float)
+
+    def missing_ranges(self, coverage, start, end):
+        """
+        Return the sub-ranges of [start, end) not yet covered by the store.
+
+        :param coverage: (start, end) already covered, or None
+        :param start: Requested start date
+        :param end: Requested end date (exclusive)
+        :return: List of (start, end) tuples to download
+        """
+        if coverage is None:
+            return [(start, end)]
+        ranges = []
+        if start < coverage[0]:
+            ranges.append((start, coverage[0]))
+        if end > coverage[1]:
+            ranges.append((coverage[1], end))
+        return ranges
+
+    def update(self, ticker, start, end):
+        """
+        Top up the stored history of a ticker so that it covers [start, end).
+
+        :param ticker: Stock ticker (string)
+        :param start: Start date
+        :param end: End date (exclusive)
+        :return: DataFrame with the full stored history of the ticker
+        """
+        start, end = _to_date(start), _to_date(end)
+        # A second caller topping up the same ticker waits, then finds the range already covered
+        with file_lock(os.path.join(self._ticker_dir(ticker), ".lock")):
+            return self._update(ticker, start, end)
+
+    def _update(self, ticker, start, end):
+        today = _to_date(date.today())
+        # Never mark today or the future as covered: the latest bar may still change
+        end = min(end, today + timedelta(days=1))
+        frame, coverage, updated = self._read(ticker)
+        missing = [(s, e) for s, e in self.missing_ranges(coverage, start, end) if s < e]
+        if coverage is not None and time.time() - updated < self.refresh_interval:
+            missing = [(s, e) for s, e in missing if s < today]
+        if not missing:
+            return frame if frame is not None else _empty_frame()
+
+        pieces = [frame] if frame is not None else []
+        pieces += [self._download(ticker, s, e) for s, e in missing]
+        pieces = [piece for piece in pieces if not piece.empty]
+        if pieces:
+            merged = pd.concat(pieces).sort_index()
+            merged = merged[~merged.index.duplicated(keep="last")]
+        else:
+            merged = _empty_frame()
+
+        end_cap = min(end, today)
+        new_coverage = (
+            min(start, coverage[0]) if coverage else start,
+            max(end_cap, coverage[1]) if coverage else end_cap,
+        )
+        # Nothing stored at all usually means a bad ticker or a failed download: do not cache it
+        if new_coverage[0] < new_coverage[1] and not merged.empty:
+            self._write(ticker, merged, new_coverage)
+        return merged
+
+    @span("store.get", stage="fetch")
+    def get(self, ticker, start, end, granularity="Daily"):
+        """
+        Return bars for a ticker over [start, end), fetching only what is not stored yet.
+
+        :param ticker: Stock ticker (string)
+        :param start: Start date
+        :param end: End date (exclusive)
+        :param granularity: Data granularity (Daily, Weekly, Monthly)
+        :return: DataFrame with FIELDS columns indexed by date
+        """
+        frame = self.update(ticker, start, end)
+        window = frame[(frame.index >= _to_date(start)) & (frame.index < _to_date(end))]
+        return resample(window, granularity)
+
+    @span("fetch_prices", stage="fetch")
+    def fetch_prices(self, tickers, start, end, field="Adj Close", **fetch_options):
+        """
+        Load one price field for several tickers concurrently, isolating per-ticker failures.
+
+        :param tickers: List of stock tickers
+        :param start: Start date
+        :param end: End date (exclusive)
+        :param field: Price field to extract (default "Adj Close")
+        :param fetch_options: Passed on to utils.fetch.fetch_many (max_workers, chunk_size, ...)
+        :return: Tuple of (DataFrame with one column per loaded ticker, dict of ticker -> FetchError)
+        """
+        results = fetch_many(lambda ticker: self.get(ticker, start, end)[field].dropna(), tickers, **fetch_options)
+        loaded = {ticker: result.data for ticker, result in results.items() if result.ok}
+        failures = {ticker: result.error for ticker, result in results.items() if not result.ok}
+        prices = pd.DataFrame(loaded, columns=list(loaded)).dropna(how="all")
+        return prices, failures
+
+    def get_prices(self, tickers, start, end, field="Adj Close"):
+        """
+        Return one price field for several tickers as a date-aligned DataFrame.
+
+        :param tickers: List of stock tickers
+        :param start: Start date
+        :param end: End date (exclusive)
+        :param field: Price field to extract (default "Adj Close")
+        :return: DataFrame with one column per loaded ticker, in the order given
+        """
+        return self.fetch_prices(tickers, start, end, field)[0]
+
+
+def resample(data, granularity="Daily"):
+    """
+    Aggregate daily bars to the requested granularity.
+
+    :param data: DataFrame of daily bars with FIELDS columns
+    :param granularity: Data granularity (Daily, Weekly, Monthly)
+    :return: Resampled DataFrame
+    """
+    rule = RESAMPLE_RULES[granularity]
+    if rule is None or data.empty:
+        return data.copy()
+    return data.resample(rule, label="left", closed="left").agg(RESAMPLE_AGG).dropna(subset=["Close"])
+
+
+_store = None
+
+
+def get_store():
+    """
+    Return the shared price store.
+
+    ``PRICE_STORE_DIR`` overrides the store location and ``PRICE_SOURCE_DIR`` switches the data
+    source to local CSV files, which lets the dashboard run without network access.
+    """
+    global _store
+    if _store is None:
+        source_dir = os.environ.get("PRICE_SOURCE_DIR")
+        _store = PriceStore(source=LocalCSVSource(source_dir) if source_dir else None)
+    return _store
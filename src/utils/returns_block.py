@@ -0,0 +1,260 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.files import atomic_write, file_lock
+
+DTYPES = (np.float32, np.float64)
+# Rows per slab when a computation needs float64 temporaries or NaN-free copies
+ROW_CHUNK = 1024
+
+
+class ReturnsBlock:
+    """
+    Date-aligned (dates x tickers) prices or returns held in one read-only array.
+
+    Missing observations are NaN. Column lookups go through a ticker -> column index, and row
+    windows, single columns and ``frame()`` are zero-copy views, so a large universe is stored
+    once however many tabs and functions read it. Values can be kept as float32 to halve the
+    memory; calculations that accumulate (covariances, portfolio returns) still accumulate in
+    float64. ``save``/``load`` store the block as .npy files that are memory-mapped back.
+
+    :param values: (dates x tickers) array of float32 or float64 (other dtypes become float64)
+    :param dates: Dates of the rows
+    :param tickers: Tickers of the columns
+    """
+
+    def __init__(self, values, dates, tickers):
+        values = np.asarray(values)
+        if values.dtype not in DTYPES:
+            values = values.astype(np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        # Strided views (a run of columns) are kept as they are, so selecting them never copies
+        if values.flags.writeable:
+            values = values.view()
+            values.flags.writeable = False
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates, name="Date")
+        self.tickers = list(tickers)
+        self.columns = {ticker: j for j, ticker in enumerate(self.tickers)}
+        if values.shape != (len(self.dates), len(self.tickers)):
+            raise ValueError(f"Values of shape {values.shape} do not match {len(self.dates)} dates x {len(self.tickers)} tickers")
+
+    @classmethod
+    def from_frame(cls, frame, dtype=np.float64):
+        """Block of a DataFrame (or Series) indexed by date, one column per ticker."""
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        return cls(frame.to_numpy(dtype=dtype), frame.index, frame.columns)
+
+    @classmethod
+    def from_prices(cls, prices, dtype=np.float64):
+        """
+        Simple returns of a price block or DataFrame, computed once.
+
+        A return is NaN where either price is missing, as ``pct_change`` does without filling.
+        Ratios are taken in float64 slab by slab, so float32 output never needs a float64
+        temporary of the whole block.
+        """
+        prices = prices if isinstance(prices, cls) else cls.from_frame(prices)
+        out = np.empty((max(len(prices) - 1, 0), prices.shape[1]), dtype=dtype)
+        for start in range(0, len(out), ROW_CHUNK):
+            stop = min(start + ROW_CHUNK, len(out))
+            before = prices.values[start:stop].astype(np.float64, copy=False)
+            after = prices.values[start + 1:stop + 1].astype(np.float64, copy=False)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[start:stop] = after / before - 1
+        return cls(out, prices.dates[1:], prices.tickers)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a block written by ``save``, memory-mapped (read-only) unless ``mmap`` is False."""
+        # Under the writers' lock, so the three files come from the same save
+        with file_lock(os.path.join(path, ".lock")):
+            with open(os.path.join(path, "tickers.json")) as f:
+                tickers = json.load(f)
+            values = np.load(os.path.join(path, "values.npy"), mmap_mode="r" if mmap else None)
+            dates = np.load(os.path.join(path, "dates.npy"))
+        return cls(values, dates, tickers)
+
+    def save(self, path):
+        """Write the block as ``values.npy``, ``dates.npy`` and ``tickers.json`` under ``path``."""
+        arrays = {"values.npy": np.ascontiguousarray(self.values), "dates.npy": self.dates.values.astype("datetime64[ns]")}
+        # Each file is replaced atomically, and the lock keeps concurrent saves from mixing files
+        with file_lock(os.path.join(path, ".lock")):
+            for name, array in arrays.items():
+                with atomic_write(os.path.join(path, name)) as f:
+                    np.save(f, array)
+            with atomic_write(os.path.join(path, "tickers.json"), "w") as f:
+                json.dump(self.tickers, f)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self.values.dtype:
+            return self.values.copy() if copy else self.values
+        return self.values.astype(dtype)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    @property
+    def mask(self):
+        """Boolean array, True where a value is present."""
+        return ~np.isnan(self.values)
+
+    def astype(self, dtype):
+        if np.dtype(dtype) == self.dtype:
+            return self
+        return ReturnsBlock(self.values.astype(dtype), self.dates, self.tickers)
+
+    def column(self, ticker):
+        """Values of one ticker (a strided view)."""
+        return self.values[:, self.columns[ticker]]
+
+    def select(self, tickers):
+        """
+        Block of some tickers, in the order given.
+
+        A run of adjacent columns is a view; any other selection copies the selected columns.
+        """
+        positions = [self.columns[ticker] for ticker in tickers]
+        if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+            values = self.values[:, positions[0]:positions[0] + len(positions)]
+        else:
+            values = self.values[:, positions]
+        return ReturnsBlock(values, self.dates, tickers)
+
+    def window(self, start=None, end=None):
+        """Rows dated in [start, end] as a view."""
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        last = len(self) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return ReturnsBlock(self.values[first:last], self.dates[first:last], self.tickers)
+
+    def tail(self, n):
+        """The last ``n`` rows as a view."""
+        return ReturnsBlock(self.values[max(len(self) - n, 0):], self.dates[max(len(self) - n, 0):], self.tickers)
+
+    def frame(self):
+        """Read-only DataFrame over the block, without copying it."""
+        return pd.DataFrame(self.values, index=self.dates, columns=pd.Index(self.tickers), copy=False)
+
+    def series(self, ticker):
+        return pd.Series(self.column(ticker), index=self.dates, name=ticker, copy=False)
+
+    def dot(self, weights):
+        """
+        Returns of one or many portfolios, with missing values counted as zero.
+
+        :param weights: Weights (tickers,) or (tickers x portfolios)
+        :return: float64 array (dates,) or (dates x portfolios)
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if self.dtype == np.float64:
+            out = self.values @ weights
+            # A missing value makes its whole row NaN; redo only those rows with zeros in its place
+            rows = np.flatnonzero(np.isnan(out).reshape(len(out), -1).any(axis=1))
+            if len(rows):
+                out[rows] = np.nan_to_num(self.values[rows]) @ weights
+            return out
+        out = np.empty((len(self),) + weights.shape[1:])
+        for start in range(0, len(self), ROW_CHUNK):
+            slab = np.nan_to_num(self.values[start:start + ROW_CHUNK].astype(np.float64))
+            out[start:start + ROW_CHUNK] = slab @ weights
+        return out
+
+
+def as_frame(returns):
+    """A DataFrame view of a ReturnsBlock; anything else is returned as is."""
+    return returns.frame() if isinstance(returns, ReturnsBlock) else returns
+
+
+def column_means(values):
+    """
+    Column means ignoring NaN, summed in float64 over row slabs rather than on a full copy.
+
+    :param values: (T x N) array, NaN where missing
+    :return: Tuple of (mean (N,), number of values present (N,))
+    """
+    sums = np.zeros(values.shape[1])
+    counts = np.zeros(values.shape[1], dtype=np.int64)
+    for start in range(0, len(values), ROW_CHUNK):
+        slab = values[start:start + ROW_CHUNK]
+        present = ~np.isnan(slab)
+        sums += np.where(present, slab, 0).sum(axis=0, dtype=np.float64)
+        counts += present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts, counts
+
+
+def pairwise_sums(values, shift):
+    """
+    Sums behind the pairwise-complete covariance, from a few matrix products over row slabs.
+
+    :param values: (T x N) array, NaN where missing
+    :param shift: (N,) values subtracted first for accuracy (e.g. the column means)
+    :return: Tuple of (cross, sums, pairs), each (N x N): over the rows where both column i and
+        column j are present, the sums of (x_i - shift_i) * (x_j - shift_j), of x_i - shift_i
+        and of 1
+    """
+    n_assets = values.shape[1]
+    # Slabs at least as large as the covariance itself, so wide blocks need few matrix products
+    rows = max(ROW_CHUNK, n_assets)
+    cross = np.zeros((n_assets, n_assets))
+    sums = np.zeros((n_assets, n_assets))
+    pairs = np.zeros((n_assets, n_assets))
+    for start in range(0, len(values), rows):
+        mask = (~np.isnan(values[start:start + rows])).astype(np.float64)
+        slab = np.nan_to_num(values[start:start + rows] - shift)
+        cross += slab.T @ slab
+        sums += slab.T @ mask
+        pairs += mask.T @ mask
+    return cross, sums, pairs
+
+
+def pairwise_covariance(cross, sums, pairs):
+    """Covariance matrix from ``pairwise_sums``, NaN where fewer than two rows overlap."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # sums[i, j] is the sum of column i over the rows where column j is present
+        cov = (cross - sums * sums.T / pairs) / (pairs - 1)
+    cov[pairs < 2] = np.nan
+    return cov
+
+
+def pairwise_moments(values):
+    """
+    Column means and pairwise-complete covariance matrix, as ``DataFrame.mean``/``DataFrame.cov``.
+
+    The covariance of each pair uses the rows where both columns are present. All pairs come
+    from a few matrix products accumulated in float64 over row slabs, instead of a loop over
+    pairs; without missing values it reduces to one centred cross product.
+
+    :param values: (T x N) array or ReturnsBlock, NaN where missing
+    :return: Tuple of (mean (N,), covariance (N x N)), NaN where fewer than two rows overlap
+    """
+    values = values.values if isinstance(values, ReturnsBlock) else np.asarray(values)
+    n_assets = values.shape[1]
+    mean, counts = column_means(values)
+    if counts.min(initial=len(values)) == len(values):
+        rows = max(ROW_CHUNK, n_assets)
+        cross = np.zeros((n_assets, n_assets))
+        for start in range(0, len(values), rows):
+            slab = values[start:start + rows] - mean
+            cross += slab.T @ slab
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return mean, cross / (len(values) - 1)
+    # Centred on the column means; the pairwise means are corrected in pairwise_covariance
+    return mean, pairwise_covariance(*pairwise_sums(values, mean))
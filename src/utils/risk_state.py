@@ -0,0 +1,292 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.incremental_stats import EwmaCovariance, PairwiseCovariance, RunningCovariance
+from utils.instrumentation import span
+from utils.returns_block import ReturnsBlock, pairwise_moments
+from utils.var_engine import z_score
+
+TRADING_DAYS = 252
+
+
+def _last_valid(values):
+    """Last non-missing value of every column (NaN for empty columns), without filling the array."""
+    present = ~np.isnan(values)
+    rows = len(values) - 1 - np.argmax(present[::-1], axis=0)
+    return np.where(present.any(axis=0), values[rows, np.arange(values.shape[1])], np.nan).astype(float)
+
+
+class RiskState:
+    """
+    Returns, covariance, correlation and Cholesky factor of a price history, computed once.
+
+    Build one per (tickers, window) and share it between tabs; all decompositions are
+    vectorized Euler allocations on top of the stored covariance matrix. New bars are added with
+    ``append``, which updates the statistics incrementally instead of recomputing them: a Welford
+    update while every return is present, and per-pair counts (PairwiseCovariance) once there are
+    gaps, so histories that start on different dates roll forward exactly as a full recompute
+    would. Appends, the lazy materialization of appended bars and the Cholesky factor hold a lock,
+    so one state can be shared across threads.
+    """
+
+    @span("RiskState")
+    def __init__(self, prices, window=None, dtype=np.float64):
+        """
+        :param prices: DataFrame or ReturnsBlock of prices, one column per asset
+        :param window: Number of returns to keep; older returns roll off as new bars are appended.
+            None keeps the whole history.
+        :param dtype: Storage type of the returns; np.float32 halves their memory
+        """
+        block = prices if isinstance(prices, ReturnsBlock) else ReturnsBlock.from_frame(prices)
+        if window is not None:
+            block = block.tail(window + 1)
+        self.assets = list(block.tickers)
+        self.window = window
+        self.dtype = np.dtype(dtype)
+        # Returns are computed once into a compact block; the frames are views over the blocks
+        self._block = ReturnsBlock.from_prices(block, dtype)
+        self._prices = block.frame()
+        self._returns = self._block.frame()
+        self._pending = []
+        self._last_prices = _last_valid(block.values)
+        if np.isnan(self._block.values).any():
+            self.stats = PairwiseCovariance.from_returns(self._block)
+        else:
+            self.stats = RunningCovariance.from_moments(len(self._block), *pairwise_moments(self._block))
+        self._ewma = None
+        self._lock = threading.RLock()
+        self._refresh()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _refresh(self):
+        self.mean = self.stats.mean.copy()
+        self.cov = self.stats.cov
+        self.volatility = np.sqrt(np.diag(self.cov))
+        self.corr = self.cov / np.outer(self.volatility, self.volatility)
+        self._cholesky = None
+
+    def _materialize(self):
+        with self._lock:
+            self._materialize_pending()
+
+    def _materialize_pending(self):
+        if self._pending:
+            dates = [date for date, _, _ in self._pending]
+            prices = pd.DataFrame([p for _, p, _ in self._pending], index=dates, columns=self.assets)
+            returns = pd.DataFrame([r for _, _, r in self._pending], index=dates, columns=self.assets)
+            self._prices = pd.concat([self._prices, prices])
+            self._returns = pd.concat([self._returns, returns])
+            self._pending = []
+            self._block = None
+        if self.window is not None and len(self._returns) > self.window:
+            self._returns = self._returns.iloc[-self.window:]
+            self._prices = self._prices.iloc[-self.window - 1:]
+            self._block = None
+
+    @property
+    def prices(self):
+        """
+        Prices as a DataFrame shared with every other reader of the state; ``.copy()`` it before
+        changing it. Until bars are appended it is a zero-copy view over the read-only price block
+        (assigning into it raises ValueError, "assignment destination is read-only"); after
+        appends it is a new frame with the appended rows concatenated, and the window trimmed.
+        """
+        self._materialize()
+        return self._prices
+
+    @property
+    def returns(self):
+        """
+        Returns as a DataFrame shared with every other reader of the state; ``.copy()`` it before
+        changing it. Until bars are appended it is a zero-copy view over the read-only returns
+        block (assigning into it raises ValueError); after appends it is a new frame with the
+        appended rows concatenated, and the window trimmed.
+        """
+        self._materialize()
+        return self._returns
+
+    @property
+    def version(self):
+        """Date of the last bar, pending ones included; changes whenever bars are appended."""
+        with self._lock:
+            return self._pending[-1][0] if self._pending else self._prices.index[-1]
+
+    @property
+    def block(self):
+        """The returns as a ReturnsBlock, rebuilt only after appended bars are materialized."""
+        with self._lock:
+            self._materialize_pending()
+            if self._block is None:
+                self._block = ReturnsBlock.from_frame(self._returns, self.dtype)
+            return self._block
+
+    @property
+    def ewma(self):
+        """EwmaCovariance over the returns, built on first use and updated by ``append``."""
+        with self._lock:
+            if self._ewma is None:
+                self._ewma = EwmaCovariance.from_returns(self.returns.to_numpy())
+            return self._ewma
+
+    def _oldest_return(self):
+        # Oldest return still counted in the statistics, without materializing appended rows
+        position = len(self._returns) + len(self._pending) - self.window - 1
+        if position < len(self._returns):
+            return self._returns.iloc[position].to_numpy(dtype=float)
+        return self._pending[position - len(self._returns)][2]
+
+    def append(self, date, prices):
+        """
+        Add one bar of prices and update returns, covariance and correlation in O(N^2).
+
+        :param date: Date of the bar
+        :param prices: Prices aligned with ``assets``; missing values carry the last price forward
+        """
+        prices = np.asarray(prices, dtype=float)
+        with self._lock:
+            returns = prices / self._last_prices - 1
+            self._last_prices = np.where(np.isnan(prices), self._last_prices, prices)
+            self._pending.append((pd.Timestamp(date), prices, returns))
+            if isinstance(self.stats, RunningCovariance) and np.isnan(returns).any():
+                # First gap: from here on every pair of assets keeps its own count
+                self.stats = PairwiseCovariance.from_running(self.stats)
+            self.stats.update(returns)
+            if self.window is not None and self.stats.count > self.window:
+                self.stats.downdate(self._oldest_return())
+            if self._ewma is not None:
+                self._ewma.update(returns)
+            self._refresh()
+
+    def update_prices(self, prices):
+        """
+        Append every bar of a price DataFrame that is newer than the last stored bar.
+
+        :param prices: DataFrame of prices with (at least) the ``assets`` columns
+        :return: Number of bars appended
+        """
+        with self._lock:
+            new = prices[prices.index > self.version].reindex(columns=self.assets)
+            for date, row in zip(new.index, new.to_numpy(dtype=float)):
+                self.append(date, row)
+            return len(new)
+
+    @property
+    def cholesky(self):
+        """Lower Cholesky factor of the covariance matrix, with negative eigenvalues clipped if needed."""
+        with self._lock:
+            if self._cholesky is None:
+                try:
+                    self._cholesky = np.linalg.cholesky(self.cov)
+                except np.linalg.LinAlgError:
+                    # Pairwise covariances over uneven histories need not be positive definite
+                    values, vectors = np.linalg.eigh(self.cov)
+                    cov = (vectors * np.clip(values, 1e-12, None)) @ vectors.T
+                    self._cholesky = np.linalg.cholesky(cov)
+            return self._cholesky
+
+    def correlation_frame(self, ewma=False):
+        corr = self.ewma.corr if ewma else self.corr
+        return pd.DataFrame(corr, index=self.assets, columns=self.assets)
+
+    def portfolio_returns(self, weights):
+        """
+        Daily portfolio returns; missing asset returns count as zero.
+
+        :param weights: Weight vector aligned with ``assets``, or DataFrame of weights (portfolios x assets)
+        :return: Series of returns, or DataFrame (dates x portfolios) from one matrix product
+        """
+        block = self.block
+        if isinstance(weights, pd.DataFrame):
+            matrix = weights.reindex(columns=self.assets, fill_value=0.0).to_numpy(dtype=float)
+            return pd.DataFrame(block.dot(matrix.T), index=block.dates, columns=weights.index)
+        return pd.Series(block.dot(weights), index=block.dates)
+
+    def portfolio_volatility(self, weights, annualize=True):
+        """Volatility of every row of a (portfolios x assets) weight DataFrame."""
+        matrix = weights.reindex(columns=self.assets, fill_value=0.0).to_numpy(dtype=float)
+        variance = np.einsum("pi,ij,pj->p", matrix, self.cov, matrix)
+        scale = np.sqrt(TRADING_DAYS) if annualize else 1.0
+        return pd.Series(np.sqrt(np.maximum(variance, 0.0)) * scale, index=weights.index)
+
+    def _covariance(self, volatilities):
+        if volatilities is None:
+            return self.cov
+        volatilities = np.asarray(volatilities, dtype=float)
+        return self.corr * np.outer(volatilities, volatilities)
+
+    def volatility_decomposition(self, weights, volatilities=None, annualize=True):
+        """
+        Euler decomposition of portfolio volatility.
+
+        :param weights: Portfolio weights aligned with ``assets``
+        :param volatilities: Daily volatilities to combine with the stored correlations (e.g. GARCH
+            forecasts); the sample volatilities if omitted
+        :param annualize: Scale results to annual volatility
+        :return: DataFrame indexed by asset with Weight, Marginal, Component, Contribution (%) and
+            Incremental volatility
+        """
+        w = np.asarray(weights, dtype=float)
+        cov = self._covariance(volatilities)
+        cov_w = cov @ w
+        sigma = np.sqrt(w @ cov_w)
+        marginal = cov_w / sigma
+        # Portfolio volatility without asset i, for every i at once
+        without = np.sqrt(np.maximum(sigma ** 2 - 2 * w * cov_w + w ** 2 * np.diag(cov), 0.0))
+        scale = np.sqrt(TRADING_DAYS) if annualize else 1.0
+        return pd.DataFrame({
+            "Weight": w,
+            "Marginal": marginal * scale,
+            "Component": w * marginal * scale,
+            "Contribution (%)": w * marginal / sigma * 100,
+            "Incremental": (sigma - without) * scale,
+        }, index=pd.Index(self.assets, name="Asset"))
+
+    def var_decomposition(self, weights, confidence_level=0.95, volatilities=None):
+        """
+        Euler decomposition of parametric (variance-covariance) portfolio VaR.
+
+        VaR is expressed as a return (losses negative) like the rest of the VaR functions; the
+        components sum to the portfolio VaR.
+
+        :param weights: Portfolio weights aligned with ``assets``
+        :param confidence_level: VaR confidence level
+        :param volatilities: Daily volatilities to use instead of the sample volatilities
+        :return: DataFrame indexed by asset with Weight, Marginal, Component, Contribution (%) and
+            Incremental VaR
+        """
+        w = np.asarray(weights, dtype=float)
+        z = z_score(confidence_level)
+        cov = self._covariance(volatilities)
+        cov_w = cov @ w
+        sigma = np.sqrt(w @ cov_w)
+        portfolio_var = w @ self.mean - z * sigma
+        marginal = self.mean - z * cov_w / sigma
+        without_sigma = np.sqrt(np.maximum(sigma ** 2 - 2 * w * cov_w + w ** 2 * np.diag(cov), 0.0))
+        without_var = (w @ self.mean - w * self.mean) - z * without_sigma
+        return pd.DataFrame({
+            "Weight": w,
+            "Marginal": marginal,
+            "Component": w * marginal,
+            "Contribution (%)": w * marginal / portfolio_var * 100,
+            "Incremental": portfolio_var - without_var,
+        }, index=pd.Index(self.assets, name="Asset"))
+
+    def portfolio_var(self, weights, confidence_level=0.95, volatilities=None):
+        """
+        Parametric (variance-covariance) VaR of the portfolio as a return.
+
+        :param volatilities: Daily volatilities to use instead of the sample volatilities, as in
+            ``var_decomposition`` (whose components sum to this VaR)
+        """
+        w = np.asarray(weights, dtype=float)
+        return w @ self.mean - z_score(confidence_level) * np.sqrt(w @ self._covariance(volatilities) @ w)
@@ -0,0 +1,221 @@
+import itertools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+from utils.returns_block import as_frame
+
+DEFAULT_LIBRARY = os.environ.get(
+    "SCENARIO_LIBRARY", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "scenarios.json")
+)
+SCENARIO_TYPES = ["uniform", "asset", "factor", "factor_grid", "historical"]
+
+
+def load_library(path=DEFAULT_LIBRARY):
+    """
+    Load a scenario library, expanding factor grids into individual scenarios.
+
+    Scenario types (shocks in percent):
+        uniform:     {"shock": -10}, the same return for every asset
+        asset:       {"shocks": {"AAPL": -20}, "default": -5}, per-asset returns
+        factor:      {"shocks": {"Equity": -20}}, factor returns mapped through asset betas
+        factor_grid: {"ranges": {"Equity": [start, stop, step], ...}}, every combination of factor shocks
+        historical:  {"start": "2020-02-19", "end": "2020-03-24"}, replay of realized returns
+
+    :param path: Path to a JSON library
+    :return: Tuple of (dict of factor name -> proxy ticker, list of scenario dicts)
+    """
+    with open(path) as f:
+        library = json.load(f)
+    scenarios = []
+    for scenario in library["scenarios"]:
+        if scenario["type"] not in SCENARIO_TYPES:
+            raise ValueError(f"Unknown scenario type {scenario['type']!r} in {scenario['name']}")
+        if scenario["type"] == "factor_grid":
+            scenarios.extend(factor_grid(scenario["ranges"], scenario["name"]))
+        else:
+            scenarios.append(scenario)
+    return library.get("factors", {}), scenarios
+
+
+def factor_grid(ranges, prefix="Grid"):
+    """
+    Build factor scenarios for every combination of factor shocks.
+
+    :param ranges: Dict of factor -> [start, stop, step] in percent (stop inclusive)
+    :param prefix: Prefix of the scenario names
+    :return: List of factor scenario dicts
+    """
+    axes = {factor: np.arange(start, stop + step / 2, step) for factor, (start, stop, step) in ranges.items()}
+    scenarios = []
+    for values in itertools.product(*axes.values()):
+        shocks = {factor: float(v) for factor, v in zip(axes, values)}
+        label = ", ".join(f"{factor} {v:+g}%" for factor, v in shocks.items())
+        scenarios.append({"name": f"{prefix}: {label}", "type": "factor", "shocks": shocks, "description": label})
+    return scenarios
+
+
+def factor_exposures(asset_returns, factor_returns):
+    """
+    OLS betas of every asset on the factors, solved for all assets in one least-squares call.
+
+    :param asset_returns: DataFrame or ReturnsBlock of asset returns (T x N)
+    :param factor_returns: DataFrame or ReturnsBlock of factor returns (T x K)
+    :return: DataFrame of betas (N x K)
+    """
+    asset_returns, factor_returns = as_frame(asset_returns), as_frame(factor_returns)
+    joined = asset_returns.join(factor_returns, how="inner", rsuffix=" (factor)")
+    factors = joined.iloc[:, asset_returns.shape[1]:].dropna()
+    assets = joined.iloc[:, :asset_returns.shape[1]].loc[factors.index].fillna(0.0)
+    design = np.column_stack([np.ones(len(factors)), factors.to_numpy()])
+    coefficients = np.linalg.lstsq(design, assets.to_numpy(), rcond=None)[0]
+    return pd.DataFrame(coefficients[1:].T, index=asset_returns.columns, columns=factor_returns.columns)
+
+
+def window_returns(prices, start, end):
+    """
+    Total return of every column over [start, end] from the first and last available prices.
+
+    :return: Series of returns (NaN where the asset has no prices in the window)
+    """
+    window = prices.loc[pd.Timestamp(start):pd.Timestamp(end)]
+    if window.empty:
+        return pd.Series(np.nan, index=prices.columns)
+    return window.ffill().iloc[-1] / window.bfill().iloc[0] - 1
+
+
+def historical_moves(scenarios, tickers, get_prices):
+    """
+    Realized return of every ticker over the window of each historical scenario.
+
+    Each window's prices are loaded on their own and dropped once its returns are taken, so
+    replaying crises years apart never holds the years between them in memory.
+
+    :param scenarios: Scenario dicts; only historical ones are used
+    :param tickers: Tickers to load (assets and factor proxies; duplicates are loaded once)
+    :param get_prices: Callable (tickers, start, end) -> price DataFrame over [start, end), such
+        as PriceStore.get_prices
+    :return: DataFrame of returns (historical scenarios x tickers), NaN where a ticker has no
+        prices in the window
+    """
+    tickers = list(dict.fromkeys(tickers))
+    historical = [s for s in scenarios if s["type"] == "historical"]
+    moves = np.full((len(historical), len(tickers)), np.nan)
+    for i, scenario in enumerate(historical):
+        start, end = pd.Timestamp(scenario["start"]), pd.Timestamp(scenario["end"])
+        prices = get_prices(tickers, start, end + pd.Timedelta(days=1))
+        moves[i] = window_returns(prices, start, end).reindex(tickers).to_numpy(dtype=float)
+    return pd.DataFrame(moves, index=[s["name"] for s in historical], columns=tickers)
+
+
+def shock_matrix(scenarios, assets, exposures=None, moves=None, factors=None):
+    """
+    Build the (scenarios x assets) matrix of asset returns for a list of scenarios.
+
+    :param scenarios: Scenario dicts (see load_library)
+    :param assets: Asset tickers
+    :param exposures: Factor betas (assets x factors), required for factor scenarios and to
+        proxy assets without history in historical scenarios
+    :param moves: Realized returns of historical scenarios (scenario name x tickers, from
+        ``historical_moves``), with asset and factor proxy columns
+    :param factors: Dict of factor name -> proxy ticker
+    :return: DataFrame of asset returns (fractions) indexed by scenario name
+    """
+    factor_names = list(exposures.columns) if exposures is not None else []
+    betas = exposures.reindex(assets).fillna(0.0).to_numpy() if exposures is not None else None
+    rows = []
+    for scenario in scenarios:
+        kind = scenario["type"]
+        if kind == "uniform":
+            row = np.full(len(assets), scenario["shock"] / 100)
+        elif kind == "asset":
+            default = scenario.get("default", 0.0)
+            row = np.array([scenario["shocks"].get(asset, default) for asset in assets], dtype=float) / 100
+        elif kind == "factor":
+            shocks = np.array([scenario["shocks"].get(factor, 0.0) for factor in factor_names]) / 100
+            row = betas @ shocks
+        else:
+            realized = moves.loc[scenario["name"]] if moves is not None else pd.Series(dtype=float)
+            row = realized.reindex(assets).to_numpy(dtype=float)
+            if exposures is not None and factors and np.isnan(row).any():
+                # Assets without history in the window move with their factor betas
+                factor_moves = realized.reindex([factors[name] for name in factor_names]).fillna(0.0).to_numpy()
+                proxy = betas @ factor_moves
+                row = np.where(np.isnan(row), proxy, row)
+            row = np.nan_to_num(row)
+        rows.append(row)
+    rows = np.array(rows).reshape(len(scenarios), len(assets))
+    return pd.DataFrame(rows, index=[s["name"] for s in scenarios], columns=list(assets))
+
+
+@span("library_shocks")
+def library_shocks(assets, store, start, end, path=DEFAULT_LIBRARY):
+    """
+    Build the shock matrix of a scenario library for a set of assets.
+
+    Factor betas are estimated over [start, end); each historical window is read from the price
+    store separately.
+    Factors whose proxy has no prices are dropped along with the factor scenarios that shock them,
+    rather than fitting betas on an empty sample.
+
+    :param assets: Asset tickers
+    :param store: PriceStore
+    :param start: Start of the beta estimation window
+    :param end: End of the beta estimation window (exclusive)
+    :param path: Path to a JSON library
+    :return: Tuple of (shock DataFrame, list of scenario dicts, factor beta DataFrame, dict of
+        dropped factor -> reason)
+    """
+    factors, scenarios = load_library(path)
+    prices, failures = store.fetch_prices(list(assets) + list(factors.values()), start, end)
+    dropped = {}
+    for name, proxy in factors.items():
+        if proxy not in prices.columns or prices[proxy].isna().all():
+            dropped[name] = f"proxy {proxy} has no prices" + (f": {failures[proxy]}" if proxy in failures else "")
+    if dropped:
+        factors = {name: proxy for name, proxy in factors.items() if name not in dropped}
+        scenarios = [
+            s for s in scenarios
+            if s["type"] != "factor" or not any(s["shocks"].get(name, 0.0) for name in dropped)
+        ]
+    proxies = list(factors.values())
+    returns = prices.pct_change().iloc[1:]
+    factor_returns = returns.reindex(columns=proxies).set_axis(list(factors), axis=1)
+    exposures = factor_exposures(returns.reindex(columns=list(assets)), factor_returns)
+
+    moves = historical_moves(scenarios, list(assets) + proxies, store.get_prices)
+    return shock_matrix(scenarios, list(assets), exposures, moves, factors), scenarios, exposures, dropped
+
+
+def evaluate(shocks, weights):
+    """
+    Portfolio return for every scenario and every weight vector in one matrix product.
+
+    :param shocks: (scenarios x assets) DataFrame from shock_matrix
+    :param weights: Weight vector (assets,) or DataFrame of weights (portfolios x assets)
+    :return: Series of portfolio returns per scenario, or DataFrame (scenarios x portfolios)
+    """
+    if isinstance(weights, pd.DataFrame):
+        return shocks @ weights[shocks.columns].T
+    return shocks @ np.asarray(weights, dtype=float)
+
+
+def loss_table(shocks, weights, scenarios):
+    """
+    Rank scenarios by portfolio loss, worst first.
+
+    :return: DataFrame with Scenario, Type, Description, Portfolio Return (%) and Worst Asset
+    """
+    portfolio = evaluate(shocks, weights)
+    contributions = shocks * np.asarray(weights, dtype=float)
+    table = pd.DataFrame({
+        "Scenario": shocks.index,
+        "Type": [s["type"] for s in scenarios],
+        "Description": [s.get("description", "") for s in scenarios],
+        "Portfolio Return (%)": portfolio.to_numpy() * 100,
+        "Worst Asset": contributions.idxmin(axis=1).to_numpy(),
+    })
+    return table.sort_values("Portfolio Return (%)").reset_index(drop=True)
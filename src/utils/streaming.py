@@ -0,0 +1,310 @@
+import glob
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.backtest import RollingQuantile
+from utils.incremental_stats import RunningCovariance
+from utils.price_store import FIELDS
+from utils.var_engine import z_score
+
+BUFFER_SIZE = 5000
+LIVE_WINDOW = 250
+DEFAULT_REPLAY_PATH = os.environ.get("STREAM_REPLAY_PATH")
+
+
+class RingBuffer:
+    """
+    Fixed-size, array-backed buffer of the latest bars of one ticker.
+
+    Appending overwrites the oldest bar once full, so memory is allocated once and stays flat
+    however long the stream runs.
+    """
+
+    def __init__(self, capacity=BUFFER_SIZE, fields=FIELDS):
+        self.capacity = capacity
+        self.fields = list(fields)
+        self.times = np.zeros(capacity, dtype="int64")
+        self.values = np.full((capacity, len(self.fields)), np.nan)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, time, values):
+        """
+        :param time: Bar timestamp
+        :param values: Values aligned with ``fields``
+        """
+        with self._lock:
+            slot = self.count % self.capacity
+            self.times[slot] = pd.Timestamp(time).value
+            self.values[slot] = values
+            self.count += 1
+
+    def _order(self):
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        return (np.arange(self.capacity) + self.count) % self.capacity
+
+    @property
+    def last_time(self):
+        with self._lock:
+            return pd.Timestamp(self.times[(self.count - 1) % self.capacity]) if self.count else None
+
+    def since(self, time=None):
+        """
+        Bars newer than ``time`` (all buffered bars if None), oldest first.
+
+        :return: Tuple of (int64 nanosecond timestamps, (bars x fields) array), both copies
+        """
+        with self._lock:
+            order = self._order()
+            times, values = self.times[order], self.values[order]
+        if time is not None:
+            newer = times > pd.Timestamp(time).value
+            times, values = times[newer], values[newer]
+        return times, values
+
+    def to_frame(self):
+        times, values = self.since()
+        return pd.DataFrame(values, index=pd.DatetimeIndex(times, name="Date"), columns=self.fields)
+
+
+class BarStore:
+    """Ring buffers of streamed bars, one per ticker, created on first use."""
+
+    def __init__(self, capacity=BUFFER_SIZE):
+        self.capacity = capacity
+        self.buffers = {}
+        self._lock = threading.Lock()
+
+    def buffer(self, ticker):
+        with self._lock:
+            if ticker not in self.buffers:
+                self.buffers[ticker] = RingBuffer(self.capacity)
+            return self.buffers[ticker]
+
+    def push(self, ticker, time, values):
+        self.buffer(ticker).append(time, values)
+
+    def frame(self, ticker):
+        return self.buffer(ticker).to_frame()
+
+    def prices(self, tickers, field="Close"):
+        """Buffered prices of one field, one column per ticker, aligned on time."""
+        column = FIELDS.index(field)
+        series = {}
+        for ticker in tickers:
+            times, values = self.buffer(ticker).since()
+            series[ticker] = pd.Series(values[:, column], index=pd.DatetimeIndex(times))
+        return pd.DataFrame(series).sort_index()
+
+    @property
+    def nbytes(self):
+        return sum(b.times.nbytes + b.values.nbytes for b in self.buffers.values())
+
+
+class Feed:
+    """
+    Source of streamed bars.
+
+    Subclasses implement ``run``, calling ``push(ticker, time, values)`` for every bar (values
+    aligned with FIELDS) until the feed is exhausted or ``stop`` is set.
+    """
+
+    def run(self, push, stop):
+        raise NotImplementedError
+
+
+class ReplayFeed(Feed):
+    """
+    Replays stored bars in time order, as a stand-in for a live feed in tests and demos.
+
+    :param frames: Dict of ticker -> DataFrame of bars (FIELDS columns) indexed by time
+    :param interval: Seconds to wait between timestamps (0 replays as fast as possible)
+    :param loop: Start again from the first bar when exhausted, shifting times forward
+
+    A stopped replay resumes where it left off when run again.
+    """
+
+    def __init__(self, frames, interval=0.5, loop=False):
+        self.frames = {ticker: frame.reindex(columns=FIELDS) for ticker, frame in frames.items()}
+        self.interval = interval
+        self.loop = loop
+        self._cursor = 0
+        self._shift = pd.Timedelta(0)
+
+    @classmethod
+    def from_path(cls, path, tickers=None, interval=0.5, loop=False):
+        """
+        Load bars from a directory of ``<TICKER>.csv`` files or one CSV with a Ticker column.
+
+        :param tickers: Tickers to keep (all if None)
+        """
+        if os.path.isdir(path):
+            frames = {
+                os.path.splitext(os.path.basename(f))[0].upper(): pd.read_csv(f, index_col=0, parse_dates=True)
+                for f in glob.glob(os.path.join(path, "*.csv"))
+            }
+        else:
+            data = pd.read_csv(path, index_col=0, parse_dates=True)
+            frames = {str(ticker).upper(): group.drop(columns="Ticker") for ticker, group in data.groupby("Ticker")}
+        if tickers is not None:
+            frames = {t: frames[t] for t in tickers if t in frames}
+        return cls(frames, interval, loop)
+
+    def run(self, push, stop):
+        long = pd.concat(self.frames, names=["Ticker", "Time"]).reset_index().sort_values(["Time", "Ticker"], kind="stable")
+        if long.empty:
+            return
+        times = long["Time"].to_numpy()
+        tickers = long["Ticker"].to_numpy()
+        values = long[FIELDS].to_numpy(dtype=float)
+        # Group rows sharing a timestamp so a whole cross-section arrives together
+        starts = np.flatnonzero(np.r_[True, times[1:] != times[:-1]])
+        ends = np.r_[starts[1:], len(times)]
+        length = pd.Timestamp(times[-1]) - pd.Timestamp(times[0]) + pd.Timedelta(days=1)
+        while not stop.is_set():
+            while self._cursor < len(starts):
+                for i in range(starts[self._cursor], ends[self._cursor]):
+                    push(tickers[i], pd.Timestamp(times[i]) + self._shift, values[i])
+                self._cursor += 1
+                if stop.wait(self.interval):
+                    return
+            if not self.loop:
+                return
+            self._cursor = 0
+            self._shift += length
+
+
+class Streamer:
+    """
+    Background thread pushing bars from a feed into a BarStore.
+
+    Shared streamers are driven through ``subscribe``/``unsubscribe``: the thread runs while at
+    least one subscriber (e.g. a session) wants it, so one subscriber stopping does not stop the
+    others.
+    """
+
+    def __init__(self, feed, store=None):
+        self.feed = feed
+        self.store = store or BarStore()
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.feed.run, args=(self.store.push, self._stop), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def subscribed(self, subscriber):
+        return subscriber in self._subscribers
+
+    def subscribe(self, subscriber):
+        """Register a subscriber, starting the thread if it is not running."""
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self.start()
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber; the thread stops once nobody is subscribed."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self.stop()
+
+
+class LiveRisk:
+    """
+    Portfolio VaR over the latest ``window`` streamed bars, updated incrementally.
+
+    Each refresh reads only the bars newer than the last processed timestamp; returns are
+    pushed into a sorted sliding window (historical VaR/ES) and a Welford covariance with
+    downdates (parametric VaR), so a refresh costs O(new bars * N^2) and memory is bounded by
+    the window.
+    """
+
+    def __init__(self, tickers, weights, window=LIVE_WINDOW):
+        self.tickers = list(tickers)
+        self.weights = np.asarray(weights, dtype=float)
+        self.window = window
+        self.last_time = None
+        self.last_prices = np.full(len(self.tickers), np.nan)
+        self.portfolio = RollingQuantile(window)
+        self.stats = RunningCovariance(len(self.tickers))
+        self.returns = deque()
+        self.history = deque(maxlen=BUFFER_SIZE)
+
+    def update(self, store, field="Close"):
+        """
+        Process every complete cross-section of new bars in ``store``.
+
+        A timestamp is complete once every ticker has published a bar at or after it; tickers
+        without a bar at that time carry their last price forward. Returns start at the first
+        timestamp at which every ticker already has a previous price.
+
+        :return: Number of timestamps processed
+        """
+        column = FIELDS.index(field)
+        new = {ticker: store.buffer(ticker).since(self.last_time) for ticker in self.tickers}
+        if any(len(times) == 0 for times, _ in new.values()):
+            return 0
+        complete = min(times[-1] for times, _ in new.values())
+        stamps = np.unique(np.concatenate([times[times <= complete] for times, _ in new.values()]))
+        prices = np.full((len(stamps), len(self.tickers)), np.nan)
+        for j, (times, values) in enumerate(new.values()):
+            rows = np.searchsorted(stamps, times[times <= complete])
+            prices[rows, j] = values[times <= complete, column]
+        for stamp, row in zip(stamps, prices):
+            previous = self.last_prices
+            self.last_prices = np.where(np.isnan(row), previous, row)
+            if np.isnan(previous).any():
+                # A ticker without a previous bar has no return yet, not a 0% one
+                continue
+            returns = self.last_prices / previous - 1
+            self.returns.append(returns)
+            self.stats.update(returns)
+            if len(self.returns) > self.window:
+                self.stats.downdate(self.returns.popleft())
+            portfolio_return = float(returns @ self.weights)
+            self.portfolio.push(portfolio_return)
+            self.history.append((stamp, portfolio_return))
+        if len(stamps):
+            self.last_time = pd.Timestamp(stamps[-1])
+        return len(stamps)
+
+    def var(self, confidence_level=0.95):
+        """
+        :return: Dict with historical VaR, ES and parametric VaR over the window (returns, losses
+            negative), or None until two returns have been seen
+        """
+        if self.stats.count < 2:
+            return None
+        var, es = self.portfolio.var_es(confidence_level)
+        sigma = np.sqrt(max(self.weights @ self.stats.cov @ self.weights, 0.0))
+        parametric = self.weights @ self.stats.mean - z_score(confidence_level) * sigma
+        return {"VaR": var, "ES": es, "Parametric VaR": parametric, "Bars": len(self.returns)}
+
+    def value_path(self):
+        """Cumulative portfolio value over the streamed bars kept in memory."""
+        if not self.history:
+            return pd.Series(dtype=float)
+        times, returns = zip(*self.history)
+        return pd.Series(np.cumprod(1 + np.asarray(returns)), index=pd.DatetimeIndex(times), name="Portfolio")
@@ -0,0 +1,206 @@
+from functools import lru_cache
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from utils.instrumentation import span
+from utils.returns_block import DTYPES, ROW_CHUNK, ReturnsBlock, column_means
+
+# Confidence levels reachable with the VaR slider (0.90 to 0.99 in steps of 0.01)
+CONFIDENCE_GRID = np.round(np.arange(0.90, 0.995, 0.01), 2)
+
+
+# Acts as the z-table: each confidence level is computed once per process
+@lru_cache(maxsize=None)
+def z_score(confidence_level):
+    """
+    One-sided standard normal critical value, e.g. 1.645 at 95%.
+
+    :param confidence_level: Confidence level (e.g. 0.95)
+    :return: Positive z-score
+    """
+    return -NormalDist().inv_cdf(1 - confidence_level)
+
+
+def z_scores(confidence_levels):
+    """Return the z-scores of a sequence of confidence levels as an array."""
+    return np.array([z_score(float(c)) for c in np.atleast_1d(confidence_levels)])
+
+
+def _as_matrix(returns):
+    """Return a (T x N) float array and the asset labels for a ReturnsBlock, Series, DataFrame or array (float32 kept)."""
+    if isinstance(returns, ReturnsBlock):
+        # Used as is, float32 included: no copy of a large block
+        return returns.values, list(returns.tickers)
+    if isinstance(returns, pd.DataFrame):
+        return returns.to_numpy(dtype=float), list(returns.columns)
+    if isinstance(returns, pd.Series):
+        return returns.to_numpy(dtype=float)[:, None], [returns.name]
+    returns = np.asarray(returns)
+    if returns.dtype not in DTYPES:
+        returns = returns.astype(float)
+    if returns.ndim == 1:
+        returns = returns[:, None]
+    return returns, list(range(returns.shape[1]))
+
+
+def _lower_tail(returns, confidence_levels):
+    """
+    Order the lower tail of every column once for all confidence levels.
+
+    :return: Tuple of (tail, k, counts) where tail[:k + 1, j] holds the k + 1 smallest returns of
+        column j in ascending order at the order-statistic rows, and k is (levels x assets)
+    """
+    levels = np.atleast_1d(np.asarray(confidence_levels, dtype=float))
+    counts = np.sum(~np.isnan(returns), axis=0)
+    # Same order statistic as a full sort indexed at int((1 - c) * n)
+    k = ((1 - levels)[:, None] * counts[None, :]).astype(int)
+    k = np.minimum(k, np.maximum(counts - 1, 0))
+    kmax = int(k.max()) if k.size else 0
+    if len(returns) == 0:
+        # Nothing to order: one missing row, so every column ends up NaN like other empty columns
+        return np.full((1, returns.shape[1]), np.nan), k, counts
+    if counts.min(initial=len(returns)) == len(returns):
+        # No missing data: the order statistics are at the same rows in every column, so one
+        # partition around all of them gives exact prefix sums for CVaR without a full sort
+        tail = np.partition(returns, np.unique(k), axis=0)[:kmax + 1]
+    else:
+        # NaNs sort last, so each column's valid values still start at row 0
+        tail = np.sort(returns, axis=0)[:kmax + 1]
+    return tail, k, counts
+
+
+def historical_var_cvar(returns, confidence_levels=CONFIDENCE_GRID):
+    """
+    Historical VaR and CVaR for every asset and confidence level in one pass.
+
+    :param returns: (T x N) returns as a ReturnsBlock, DataFrame or array, or a single return series
+    :param confidence_levels: Sequence of confidence levels (e.g. [0.95, 0.99])
+    :return: Tuple of (VaR, CVaR) arrays of shape (levels x assets), as returns (losses negative)
+    """
+    returns, _ = _as_matrix(returns)
+    tail, k, counts = _lower_tail(returns, confidence_levels)
+    columns = np.arange(returns.shape[1])
+    # float64 like the CVaR, whatever the storage type of the returns
+    var = tail[k, columns].astype(np.float64)
+    cvar = np.cumsum(tail, axis=0, dtype=np.float64)[k, columns] / (k + 1)
+    var[:, counts == 0] = np.nan
+    cvar[:, counts == 0] = np.nan
+    return var, cvar
+
+
+def parametric_var(returns, confidence_levels=CONFIDENCE_GRID):
+    """
+    Normal (variance) VaR for every asset and confidence level.
+
+    :param returns: (T x N) returns as a ReturnsBlock, DataFrame or array, or a single return series
+    :param confidence_levels: Sequence of confidence levels
+    :return: Array of shape (levels x assets)
+    """
+    returns, _ = _as_matrix(returns)
+    z = z_scores(confidence_levels)
+    mean, std, _, _ = _moments(returns)
+    return mean - z[:, None] * std
+
+
+def _moments(returns):
+    mean, counts = column_means(returns)
+    # Central moments summed in float64 over row slabs, so no float64 copy of the whole matrix
+    power_sums = np.zeros((3, returns.shape[1]))
+    for start in range(0, len(returns), ROW_CHUNK):
+        deviation = np.nan_to_num(returns[start:start + ROW_CHUNK] - mean)
+        squared = deviation ** 2
+        power_sums += [squared.sum(axis=0), (squared * deviation).sum(axis=0), (squared ** 2).sum(axis=0)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m2, m3, m4 = power_sums / counts
+        std = np.sqrt(m2)
+        scale = np.where(std > 0, std, np.nan)
+        skew = m3 / scale ** 3
+        excess_kurtosis = m4 / scale ** 4 - 3
+    return mean, std, skew, excess_kurtosis
+
+
+def cornish_fisher_var(returns, confidence_levels=CONFIDENCE_GRID):
+    """
+    Modified VaR with the normal quantile adjusted for sample skewness and excess kurtosis.
+
+    :param returns: (T x N) returns as a ReturnsBlock, DataFrame or array, or a single return series
+    :param confidence_levels: Sequence of confidence levels
+    :return: Array of shape (levels x assets)
+    """
+    returns, _ = _as_matrix(returns)
+    mean, std, s, k = _moments(returns)
+    z = -z_scores(confidence_levels)[:, None]
+    z_cf = z + (z ** 2 - 1) * s / 6 + (z ** 3 - 3 * z) * k / 24 - (2 * z ** 3 - 5 * z) * s ** 2 / 36
+    return mean + z_cf * std
+
+
+def student_t_var(returns, confidence_levels=CONFIDENCE_GRID, dof=None):
+    """
+    VaR under a Student-t distribution scaled to the sample volatility.
+
+    :param returns: (T x N) returns as a ReturnsBlock, DataFrame or array, or a single return series
+    :param confidence_levels: Sequence of confidence levels
+    :param dof: Degrees of freedom; estimated per asset from excess kurtosis (6 / K + 4) if omitted
+    :return: Array of shape (levels x assets)
+    """
+    returns, _ = _as_matrix(returns)
+    mean, std, _, k = _moments(returns)
+    if dof is None:
+        # Method of moments, capped where tails are no fatter than normal
+        dof = np.where(k > 0.01, 6 / np.maximum(k, 0.01) + 4, 604.0)
+    dof = np.broadcast_to(np.asarray(dof, dtype=float), mean.shape)
+    levels = np.atleast_1d(np.asarray(confidence_levels, dtype=float))[:, None]
+    t = stats.t.ppf(1 - levels, dof)
+    return mean + t * std * np.sqrt((dof - 2) / dof)
+
+
+class VarTable:
+    """
+    Precomputed VaR, CVaR and parametric VaR for a grid of confidence levels and assets.
+
+    Build it once per returns matrix; changing the confidence level is then a lookup.
+    """
+
+    @span("VarTable")
+    def __init__(self, returns, confidence_levels=CONFIDENCE_GRID):
+        matrix, self.assets = _as_matrix(returns)
+        self.confidence_levels = np.atleast_1d(np.asarray(confidence_levels, dtype=float))
+        self.var, self.cvar = historical_var_cvar(matrix, self.confidence_levels)
+        self.parametric_var = parametric_var(matrix, self.confidence_levels)
+        self.cornish_fisher_var = cornish_fisher_var(matrix, self.confidence_levels)
+        self.student_t_var = student_t_var(matrix, self.confidence_levels)
+
+    def _level_index(self, confidence_level):
+        i = int(np.argmin(np.abs(self.confidence_levels - confidence_level)))
+        if not np.isclose(self.confidence_levels[i], confidence_level):
+            raise KeyError(f"Confidence level {confidence_level} is not in the table")
+        return i
+
+    def lookup(self, confidence_level, asset=None):
+        """
+        Return the metrics at one confidence level.
+
+        :param confidence_level: Confidence level on the table grid
+        :param asset: Asset label; defaults to the first asset
+        :return: Dict of metric name -> value
+        """
+        i = self._level_index(confidence_level)
+        j = self.assets.index(asset) if asset is not None else 0
+        return {name: values[i, j] for name, values in self._metrics().items()}
+
+    def _metrics(self):
+        return {
+            "VaR": self.var,
+            "CVaR": self.cvar,
+            "Parametric VaR": self.parametric_var,
+            "Cornish-Fisher VaR": self.cornish_fisher_var,
+            "Student-t VaR": self.student_t_var,
+        }
+
+    def to_frame(self):
+        """Return the table as a long DataFrame indexed by (confidence level, asset)."""
+        index = pd.MultiIndex.from_product([self.confidence_levels, self.assets], names=["Confidence", "Asset"])
+        return pd.DataFrame({name: values.ravel() for name, values in self._metrics().items()}, index=index)
@@ -0,0 +1,204 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.signal import lfilter
+
+from utils.files import atomic_write, file_lock
+from utils.instrumentation import span
+from utils.price_store import DEFAULT_STORE_DIR
+from utils.returns_block import as_frame
+
+MODELS = {"garch": "GARCH(1,1)", "gjr": "GJR-GARCH(1,1)", "ewma": "EWMA"}
+PARAMETER_NAMES = {"garch": ["omega", "alpha", "beta"], "gjr": ["omega", "alpha", "gamma", "beta"], "ewma": ["lam"]}
+EWMA_LAMBDA = 0.94
+# Returns are fitted in percent, which keeps omega away from the optimizer's tolerance
+SCALE = 100.0
+
+DEFAULT_PARAMS_PATH = os.path.join(os.path.dirname(DEFAULT_STORE_DIR), "volatility_params.json")
+
+
+@dataclass
+class VolatilityFit:
+    model: str
+    params: dict
+    volatility: np.ndarray = field(repr=False)
+    forecast: float
+    log_likelihood: float
+    converged: bool = True
+
+    def forecast_path(self, horizon):
+        """
+        Expected daily volatility for each of the next ``horizon`` days.
+
+        :param horizon: Number of days
+        :return: Array of daily volatilities
+        """
+        p = self.params
+        if self.model == "ewma":
+            return np.full(horizon, self.forecast)
+        persistence = p["alpha"] + p.get("gamma", 0.0) / 2 + p["beta"]
+        long_run = p["omega"] / (1 - persistence)
+        steps = persistence ** np.arange(horizon)
+        return np.sqrt(long_run + steps * (self.forecast ** 2 - long_run))
+
+
+def conditional_variance(returns, model, params, initial_variance=None):
+    """
+    Run the variance recursion for a return series as a linear filter.
+
+    sigma2[t] = omega + (alpha + gamma * 1[r < 0]) * r[t-1]^2 + beta * sigma2[t-1] is a first-order
+    IIR filter in sigma2, so scipy.signal.lfilter evaluates it in compiled code.
+
+    :param returns: 1-D array of (demeaned) returns
+    :param model: "garch", "gjr" or "ewma"
+    :param params: Dict of model parameters
+    :param initial_variance: Starting variance; the sample variance if omitted
+    :return: Tuple of (variance for each day, one-step-ahead variance forecast)
+    """
+    if initial_variance is None:
+        initial_variance = returns.var()
+    squared = returns ** 2
+    if model == "ewma":
+        beta = params["lam"]
+        shock = (1 - beta) * squared
+    else:
+        beta = params["beta"]
+        shock = params["omega"] + params["alpha"] * squared
+        if model == "gjr":
+            shock = shock + params["gamma"] * squared * (returns < 0)
+    filtered = lfilter([1.0], [1.0, -beta], shock, zi=[beta * initial_variance])[0]
+    variance = np.concatenate([[initial_variance], filtered[:-1]])
+    return variance, filtered[-1]
+
+
+def log_likelihood(returns, variance):
+    """Gaussian log-likelihood of returns given their conditional variances."""
+    return -0.5 * np.sum(np.log(2 * np.pi * variance) + returns ** 2 / variance)
+
+
+def _initial_guess(model, variance):
+    if model == "garch":
+        return np.array([0.05 * variance, 0.08, 0.9])
+    if model == "gjr":
+        return np.array([0.05 * variance, 0.04, 0.08, 0.9])
+    return np.array([EWMA_LAMBDA])
+
+
+def _bounds(model):
+    if model == "ewma":
+        return [(0.5, 0.9999)]
+    return [(1e-8, None)] + [(0.0, 1.0)] * (len(PARAMETER_NAMES[model]) - 1)
+
+
+def _to_params(model, x):
+    return dict(zip(PARAMETER_NAMES[model], (float(v) for v in x)))
+
+
+def _scale_params(params, factor):
+    return {name: value * factor if name == "omega" else value for name, value in params.items()}
+
+
+def fit(returns, model="garch", previous=None):
+    """
+    Fit a volatility model to one return series by maximum likelihood.
+
+    :param returns: 1-D array or Series of daily returns
+    :param model: "garch", "gjr" or "ewma"
+    :param previous: Parameters of an earlier fit to warm-start from (e.g. yesterday's refit)
+    :return: VolatilityFit with volatilities in the units of ``returns``
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown volatility model: {model}")
+    r = np.asarray(returns, dtype=float)
+    r = r[~np.isnan(r)]
+    r = (r - r.mean()) * SCALE
+    sample_variance = r.var()
+
+    def objective(x):
+        params = _to_params(model, x)
+        if model != "ewma" and params["alpha"] + params.get("gamma", 0.0) / 2 + params["beta"] >= 0.9999:
+            return 1e10
+        variance, _ = conditional_variance(r, model, params, sample_variance)
+        return -log_likelihood(r, np.maximum(variance, 1e-12))
+
+    if previous is not None:
+        x0 = np.array([_scale_params(previous, SCALE ** 2)[name] for name in PARAMETER_NAMES[model]])
+    else:
+        x0 = _initial_guess(model, sample_variance)
+    result = minimize(objective, x0, method="L-BFGS-B", bounds=_bounds(model))
+    params = _to_params(model, result.x)
+    variance, forecast = conditional_variance(r, model, params, sample_variance)
+    return VolatilityFit(
+        model=model,
+        params=_scale_params(params, SCALE ** -2),
+        volatility=np.sqrt(variance) / SCALE,
+        forecast=float(np.sqrt(forecast) / SCALE),
+        log_likelihood=float(-result.fun),
+        converged=bool(result.success),
+    )
+
+
+def _fit_task(task):
+    returns, model, previous = task
+    return fit(returns, model, previous)
+
+
+@span("fit_portfolio")
+def fit_portfolio(returns, model="garch", previous=None, max_workers=1):
+    """
+    Fit a volatility model to every column of a returns DataFrame, in parallel across processes.
+
+    :param returns: DataFrame or ReturnsBlock of daily returns, one column per asset
+    :param model: "garch", "gjr" or "ewma"
+    :param previous: Dict of asset -> parameters to warm-start from
+    :param max_workers: Worker processes; 1 fits in the calling process
+    :return: Dict of asset -> VolatilityFit
+    """
+    returns = as_frame(returns)
+    previous = previous or {}
+    tasks = [(returns[asset].dropna().to_numpy(), model, previous.get(asset)) for asset in returns.columns]
+    if max_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            fits = list(pool.map(_fit_task, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+    else:
+        fits = [_fit_task(task) for task in tasks]
+    return dict(zip(returns.columns, fits))
+
+
+def forecast_volatility(fits):
+    """Return the one-step-ahead daily volatility forecasts of several fits as a Series."""
+    return pd.Series({asset: f.forecast for asset, f in fits.items()})
+
+
+def load_parameters(model, path=DEFAULT_PARAMS_PATH):
+    """
+    Load stored parameters for warm-starting refits.
+
+    :return: Dict of asset -> parameters for the model (empty if nothing is stored)
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get(model, {})
+
+
+def save_parameters(model, fits, path=DEFAULT_PARAMS_PATH):
+    """
+    Store the parameters of converged fits so the next refit can start from them.
+
+    The file is shared by every session and process, so the read-merge-write holds a lock and
+    parameters saved by another writer in the meantime are kept.
+    """
+    with file_lock(path + ".lock"):
+        stored = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+        stored.setdefault(model, {}).update({asset: f.params for asset, f in fits.items() if f.converged})
+        with atomic_write(path, "w") as f:
+            json.dump(stored, f)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.alerts import METRICS, AlertEngine, Rule, load_rules, metric_state
+from utils.risk_state import RiskState
+
+
+def breaching_state():
+    """Metrics of one asset and the portfolio, with every shipped default rule triggered."""
+    row = {"return": -0.1, "zscore": -4.0, "var": -0.03, "var_breach": -0.07, "drawdown": -0.3,
+           "vol_ratio": 2.0, "corr_shift": 0.5}
+    return pd.DataFrame([row, row], index=pd.Index(["AAPL", "Portfolio"], name="Asset"))[METRICS]
+
+
+def test_default_rules_fire():
+    rules = load_rules()
+    alerts = AlertEngine(rules).update(breaching_state(), now=0.0)
+    fired = {(alert["Rule"], alert["Asset"]) for alert in alerts}
+    assert {rule.name for rule in rules} <= {name for name, _ in fired}
+    assert ("Portfolio VaR Breach", "Portfolio") in fired
+    assert ("Portfolio VaR Breach", "AAPL") not in fired
+
+
+def state_ending_with(previous, last):
+    """RiskState of one asset whose returns are ``previous`` followed by ``last``."""
+    returns = np.r_[previous, last]
+    dates = pd.bdate_range("2024-01-01", periods=len(returns) + 1)
+    prices = pd.DataFrame({"AAPL": 100 * np.r_[1.0, np.cumprod(1 + returns)]}, index=dates)
+    return RiskState(prices)
+
+
+def test_var_breach_fires_on_newest_tail_loss():
+    # 20 earlier returns put the 95% VaR on the second-smallest, -4%; counting the newest -5%
+    # as well would move VaR onto the loss itself and hide the breach
+    previous = np.r_[-0.06, -0.04, np.tile([0.002, -0.001], 9)]
+    metrics = metric_state(state_ending_with(previous, -0.05))
+    assert metrics.loc["AAPL", "var"] == pytest.approx(-0.04)
+    assert metrics.loc["AAPL", "var_breach"] == pytest.approx(-0.01)
+    rule = Rule("VaR Breach", "var_breach", "<", 0)
+    fired = AlertEngine([rule]).update(metrics, now=0.0)
+    assert [(alert["Rule"], alert["Asset"]) for alert in fired] == [("VaR Breach", "AAPL")]
+
+
+def test_zscore_excludes_newest_return():
+    # With the newest return in its own mean and volatility, 10 returns can never be 3 sigma apart
+    previous = np.tile([0.002, -0.002], 5)[:9]
+    metrics = metric_state(state_ending_with(previous, -0.05))
+    expected = (-0.05 - previous.mean()) / previous.std(ddof=1)
+    assert metrics.loc["AAPL", "zscore"] == pytest.approx(expected)
+    assert metrics.loc["AAPL", "zscore"] < -3
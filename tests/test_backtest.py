@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.backtest import (RollingQuantile, backtest, christoffersen_independence, kupiec_pof, naive_rolling_var,
+                            rolling_var, zone_limits)
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(7)
+    data = pd.DataFrame(rng.standard_t(4, size=(900, 4)) * 0.01, index=pd.bdate_range("2018-01-01", periods=900),
+                        columns=["A", "B", "C", "D"])
+    data.iloc[:150, 1] = np.nan
+    data.iloc[::11, 2] = np.nan
+    data.iloc[400:420, 3] = np.nan
+    return data
+
+
+@pytest.mark.parametrize("confidence_level", [0.95, 0.99])
+@pytest.mark.parametrize("window", [20, 250])
+def test_rolling_var_matches_sorting_every_window(returns, confidence_level, window):
+    var, es = rolling_var(returns, confidence_level, window)
+    assert var.shape == returns.shape
+    for column in returns:
+        expected = naive_rolling_var(returns[column], confidence_level, window)
+        present = returns[column].notna()
+        pd.testing.assert_series_equal(var[column][present], expected, check_freq=False, check_names=False)
+        # A day without a return still gets the forecast from the window before it
+        ahead = var[column].where(present).bfill()
+        gaps = ~present & var[column].notna()
+        pd.testing.assert_series_equal(var[column][gaps], ahead[gaps], check_freq=False)
+
+
+def test_rolling_es_matches_rolling_quantile(returns):
+    var, es = rolling_var(returns["C"], 0.95, 60)
+    window = RollingQuantile(60)
+    for date, value in returns["C"].dropna().items():
+        if window.full():
+            expected_var, expected_es = window.var_es(0.95)
+            assert var[date] == expected_var
+            assert es[date] == pytest.approx(expected_es, rel=1e-12)
+        else:
+            assert np.isnan(var[date])
+        window.push(value)
+
+
+def test_short_history_has_no_forecasts():
+    var, es = rolling_var(pd.Series([0.01, -0.02, 0.005]), 0.95, 250)
+    assert var.isna().all() and es.isna().all()
+
+
+def test_kupiec_pof_reference_values():
+    # 10 exceptions in 250 days at 99% (Jorion's example): rejected
+    ratio, p_value = kupiec_pof(10, 250, 0.99)
+    assert ratio == pytest.approx(12.9555, abs=1e-4)
+    assert p_value < 0.001
+    assert kupiec_pof(0, 250, 0.99)[0] == pytest.approx(-2 * 250 * np.log(0.99))
+    assert kupiec_pof(3, 250, 0.99)[1] > 0.5
+
+
+def test_christoffersen_independence_from_transition_counts():
+    hits = np.array([0, 0, 1, 1, 0, 0, 0, 1, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 1], dtype=bool)
+    # n00 = 9, n01 = 4, n10 = 3, n11 = 3
+    pooled = 12 * np.log(12 / 19) + 7 * np.log(7 / 19)
+    markov = 9 * np.log(9 / 13) + 4 * np.log(4 / 13) + 6 * np.log(0.5)
+    ratio, _ = christoffersen_independence(hits)
+    assert ratio == pytest.approx(-2 * (pooled - markov))
+    assert christoffersen_independence(np.zeros(50, dtype=bool))[0] == 0
+
+
+def test_basel_zone_limits():
+    assert zone_limits(250, 0.99) == (5, 10)
+
+
+def test_backtest_counts_exceptions(returns):
+    result, summary = backtest(returns["A"], 0.95, 250)
+    assert summary["Observations"] == len(returns) - 250
+    assert summary["Exceptions"] == int((result["Return"] < result["VaR"]).sum())
+    assert summary["Kupiec POF"] == pytest.approx(kupiec_pof(summary["Exceptions"], summary["Observations"], 0.95)[0])
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cli
+from utils import price_store
+from utils.batch import load_books, run_batch
+from utils.price_store import FakeSource, PriceStore
+from utils.risk_state import RiskState
+from utils.var_engine import historical_var_cvar
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(root=str(tmp_path / "prices"), source=FakeSource(empty=["BAD"]))
+
+
+@pytest.fixture
+def portfolios(tmp_path):
+    directory = tmp_path / "portfolios"
+    directory.mkdir()
+    pd.DataFrame({"Asset": ["aapl", "MSFT", "BAD"], "Weight": [0.5, 0.3, 0.2]}).to_csv(directory / "growth.csv", index=False)
+    pd.DataFrame({"Asset": ["XOM", "AAPL"], "Weight": [0.7, 0.3]}).to_parquet(directory / "value.parquet")
+    return directory
+
+
+def test_load_books_reads_a_directory_of_portfolios(portfolios):
+    weights, parents, normalize = load_books(str(portfolios))
+    assert list(weights.index) == ["growth", "value"]
+    assert list(weights.columns) == ["AAPL", "BAD", "MSFT", "XOM"]
+    assert parents is None and normalize
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+
+
+def test_batch_matches_single_portfolio_calculations(portfolios, store):
+    weights, parents, normalize = load_books(str(portfolios))
+    tables, failures = run_batch(weights, store, "1y", [0.95, 0.99], stress=False)
+    assert list(failures) == ["BAD"]
+
+    # BAD failed to load, so growth is rescaled over AAPL and MSFT
+    start, end = price_store.period_to_range("1y")
+    prices = store.get_prices(["AAPL", "MSFT", "XOM"], start, end)
+    returns = RiskState(prices).portfolio_returns([0.5 / 0.8, 0.3 / 0.8, 0.0])
+    var, cvar = historical_var_cvar(returns, [0.95, 0.99])
+    summary = tables["summary"].set_index(["Portfolio", "Confidence"])
+    np.testing.assert_allclose(summary.loc["growth", "VaR"], var[:, 0])
+    np.testing.assert_allclose(summary.loc["growth", "CVaR"], cvar[:, 0])
+
+    decomposition = tables["decomposition"]
+    growth = decomposition[(decomposition["Portfolio"] == "growth") & (decomposition["Confidence"] == 0.99)]
+    assert set(growth["Asset"]) == {"AAPL", "MSFT"}
+    assert growth["Component"].sum() == pytest.approx(summary.loc[("growth", 0.99), "Parametric VaR"], rel=0.05)
+
+
+def test_workers_give_the_same_tables(portfolios, store):
+    weights, _, _ = load_books(str(portfolios))
+    serial, _ = run_batch(weights, store, "1y", stress=False)
+    parallel, _ = run_batch(weights, store, "1y", stress=False, max_workers=2)
+    for name in serial:
+        pd.testing.assert_frame_equal(serial[name], parallel[name], check_dtype=False)
+
+
+def test_cli_writes_every_table(portfolios, store, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(price_store, "_store", store)
+    out = tmp_path / "out"
+    assert cli.main([str(portfolios), "--workers", "1", "--out", str(out)]) == 0
+    assert sorted(p.name for p in out.iterdir()) == [
+        "decomposition.parquet", "drawdown.parquet", "stress.parquet", "summary.parquet"]
+    assert "could not load BAD" in capsys.readouterr().err
+    stress = pd.read_parquet(out / "stress.parquet")
+    assert set(stress["Portfolio"]) == {"growth", "value"}
+    assert stress.loc[stress["Scenario"] == "Market Crash", "Portfolio Return"].tolist() == pytest.approx([-0.3, -0.3])
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.batch import book_tables, books_from_frame, drawdown_table, rollup
+from utils.risk_state import RiskState
+
+POSITIONS = pd.DataFrame({
+    "Portfolio": ["Tech", "Tech", "Energy", "Macro", "Macro"],
+    "Asset": ["aapl", "MSFT", "XOM", "TLT", "AAPL"],
+    "Weight": [0.2, 0.1, 0.3, 0.25, 0.15],
+    "Desk": ["Equities", "Equities", "Equities", "Rates", "Rates"],
+})
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(12)
+    returns = rng.multivariate_normal(np.zeros(4), 1e-4 * (np.eye(4) + 0.3), size=300)
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=pd.bdate_range("2022-01-03", periods=300),
+                        columns=["AAPL", "MSFT", "TLT", "XOM"])
+
+
+def test_books_pivot_to_a_weight_matrix():
+    weights, parents = books_from_frame(POSITIONS)
+    assert weights.loc["Tech", "AAPL"] == 0.2 and weights.loc["Macro", "AAPL"] == 0.15
+    assert weights.loc["Energy"].sum() == pytest.approx(0.3)
+    assert parents == {"Tech": "Equities", "Energy": "Equities", "Macro": "Rates"}
+
+
+def test_rollup_sums_book_positions():
+    weights, parents = books_from_frame(POSITIONS)
+    combined, levels = rollup(weights, {**parents, "Equities": "Risk Assets"})
+    pd.testing.assert_series_equal(combined.loc["Equities"], weights.loc[["Tech", "Energy"]].sum(), check_names=False)
+    pd.testing.assert_series_equal(combined.loc["Risk Assets"], combined.loc["Equities"], check_names=False)
+    np.testing.assert_allclose(combined.loc["Firm"], weights.sum())
+    assert levels == {"Tech": "Book", "Energy": "Book", "Macro": "Book", "Equities": "Desk", "Risk Assets": "Level 3",
+                      "Rates": "Desk", "Firm": "Total"}
+
+
+def test_book_tables_come_from_one_matrix_product(prices):
+    weights, parents = books_from_frame(POSITIONS)
+    state = RiskState(prices)
+    combined, levels = rollup(weights.reindex(columns=state.assets, fill_value=0.0), parents)
+    tables = book_tables(state, combined, [0.95], levels=levels)
+    summary = tables["summary"].set_index("Portfolio")
+    for name, row in combined.iterrows():
+        returns = state.returns.to_numpy() @ row.to_numpy()
+        assert summary.loc[name, "VaR"] == pytest.approx(np.sort(returns)[int(0.05 * len(returns))], rel=1e-12)
+    # Diversification: the firm's VaR is no worse than the sum of its books'
+    assert summary.loc["Firm", "VaR"] >= summary.loc[["Tech", "Energy", "Macro"], "VaR"].sum()
+    assert summary.loc["Firm", "Level"] == "Total"
+
+
+def test_drawdown_of_a_portfolio_that_only_declines():
+    dates = pd.bdate_range("2024-01-02", periods=4)
+    table = drawdown_table(pd.DataFrame({"Short": [-0.01, -0.02, 0.01, -0.03]}, index=dates))
+    row = table.loc["Short"]
+    assert pd.isna(row["Peak"])
+    assert row["Trough"] == dates[3]
+    assert row["Max Drawdown"] == pytest.approx(0.99 * 0.98 * 1.01 * 0.97 - 1)
+
+
+def test_drawdown_peak_and_recovery():
+    dates = pd.bdate_range("2024-01-02", periods=6)
+    table = drawdown_table(pd.DataFrame({"Long": [0.05, 0.02, -0.1, -0.05, 0.2, 0.01]}, index=dates))
+    row = table.loc["Long"]
+    assert row["Peak"] == dates[1] and row["Trough"] == dates[3]
+    assert row["Max Drawdown"] == pytest.approx(0.9 * 0.95 - 1)
+    assert row["Current Drawdown"] == 0
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from utils.fetch import EmptyDataError, ProviderError, fetch_many, fetch_one
+from utils.price_store import FakeSource, PriceStore
+
+
+class Flaky:
+    """Fetch callable that raises a given number of times per ticker before returning data."""
+
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.attempts = {}
+
+    def __call__(self, ticker):
+        self.attempts[ticker] = self.attempts.get(ticker, 0) + 1
+        if self.attempts[ticker] <= self.failures.get(ticker, 0):
+            raise ConnectionError(f"{ticker} timed out")
+        return pd.Series([1.0, 2.0], name=ticker)
+
+
+def test_transient_errors_are_retried():
+    result = fetch_one(Flaky({"AAPL": 2}), "AAPL", retries=3, backoff=0)
+    assert result.ok and result.attempts == 3
+
+
+def test_persistent_errors_become_provider_errors():
+    fetch = Flaky({"AAPL": 10})
+    result = fetch_one(fetch, "AAPL", retries=2, backoff=0)
+    assert isinstance(result.error, ProviderError)
+    assert "ConnectionError" in str(result.error)
+    assert result.attempts == fetch.attempts["AAPL"] == 3
+
+
+def test_empty_data_is_not_retried():
+    calls = []
+
+    def fetch(ticker):
+        calls.append(ticker)
+        return pd.Series(dtype=float)
+
+    result = fetch_one(fetch, "ZZZZ", retries=3, backoff=0)
+    assert isinstance(result.error, EmptyDataError)
+    assert calls == ["ZZZZ"]
+
+
+def test_failures_are_isolated_per_ticker():
+    results = fetch_many(Flaky({"BAD": 10, "SLOW": 1}), ["AAPL", "BAD", "SLOW", "AAPL"], chunk_size=2, backoff=0)
+    assert list(results) == ["AAPL", "BAD", "SLOW"]
+    assert results["AAPL"].ok and results["SLOW"].ok and results["SLOW"].attempts == 2
+    assert isinstance(results["BAD"].error, ProviderError)
+
+
+def test_fetch_prices_returns_loaded_tickers_and_typed_failures(tmp_path):
+    store = PriceStore(root=str(tmp_path), source=FakeSource(fail=["BAD"], empty=["NONE"]))
+    prices, failures = store.fetch_prices(["AAPL", "BAD", "NONE", "MSFT"], "2020-01-01", "2020-04-01", backoff=0)
+    assert list(prices.columns) == ["AAPL", "MSFT"]
+    assert prices.notna().all().all()
+    assert isinstance(failures["BAD"], ProviderError)
+    assert isinstance(failures["NONE"], EmptyDataError)
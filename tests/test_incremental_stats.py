@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.incremental_stats import EwmaCovariance, PairwiseCovariance, RunningCovariance
+from utils.returns_block import pairwise_moments
+from utils.risk_state import RiskState
+
+
+def uneven_prices(n_days=400, seed=8):
+    """Prices of four assets where two list later and one has a trading halt."""
+    rng = np.random.default_rng(seed)
+    returns = rng.multivariate_normal(np.full(4, 3e-4), 1e-4 * (np.eye(4) + 0.5), size=n_days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=pd.bdate_range("2020-01-01", periods=n_days),
+                          columns=["OLD", "MID", "NEW", "HALT"])
+    prices.iloc[:120, 1] = np.nan
+    prices.iloc[:300, 2] = np.nan
+    prices.iloc[150:160, 3] = np.nan
+    return prices
+
+
+def test_running_covariance_update_and_downdate():
+    rows = np.random.default_rng(1).normal(size=(60, 3))
+    stats = RunningCovariance(3)
+    for row in rows:
+        stats.update(row)
+    np.testing.assert_allclose(stats.cov, np.cov(rows, rowvar=False), rtol=1e-10)
+    for row in rows[:20]:
+        stats.downdate(row)
+    np.testing.assert_allclose(stats.mean, rows[20:].mean(axis=0), rtol=1e-10)
+    np.testing.assert_allclose(stats.cov, np.cov(rows[20:], rowvar=False), rtol=1e-10)
+
+
+def test_pairwise_covariance_rolls_without_drift():
+    prices = uneven_prices()
+    rows = (prices / prices.shift(1) - 1).to_numpy()[1:]
+    stats = PairwiseCovariance.from_returns(rows[:100])
+    for t in range(100, len(rows)):
+        stats.update(rows[t])
+        stats.downdate(rows[t - 100])
+        mean, cov = pairwise_moments(rows[t - 99:t + 1])
+        np.testing.assert_allclose(stats.mean, mean, rtol=1e-9, atol=1e-15)
+        np.testing.assert_allclose(stats.cov, cov, rtol=1e-8, atol=1e-15)
+        assert stats.count == 100
+
+
+def test_risk_state_appends_match_a_full_recompute():
+    prices = uneven_prices()
+    state = RiskState(prices.iloc[:200], window=150)
+    for date, row in prices.iloc[200:].iterrows():
+        state.append(date, row.to_numpy())
+    assert len(state.returns) == 150
+    assert state.returns.index[-1] == prices.index[-1]
+    mean, cov = pairwise_moments(state.returns.to_numpy())
+    np.testing.assert_allclose(state.mean, mean, rtol=1e-9)
+    np.testing.assert_allclose(state.cov, cov, rtol=1e-8)
+    # The halt has rolled out of the window (NEW still lists inside it), so a fresh state agrees
+    fresh = RiskState(prices.iloc[-151:])
+    np.testing.assert_allclose(state.cov, fresh.cov, rtol=1e-8)
+
+
+def test_risk_state_switches_to_pairwise_counts_at_the_first_gap():
+    prices = uneven_prices()[["OLD", "HALT"]]
+    state = RiskState(prices.iloc[:121], window=120)
+    assert isinstance(state.stats, RunningCovariance)
+    for date, row in prices.iloc[121:].iterrows():
+        state.append(date, row.to_numpy())
+        mean, cov = pairwise_moments(state.returns.to_numpy())
+        np.testing.assert_allclose(state.mean, mean, rtol=1e-9)
+        np.testing.assert_allclose(state.cov, cov, rtol=1e-8)
+    assert isinstance(state.stats, PairwiseCovariance)
+
+
+def test_ewma_closed_form_matches_the_recursion():
+    rows = np.random.default_rng(2).normal(0, 0.01, size=(50, 3))
+    stats = EwmaCovariance.from_returns(rows[:30])
+    recursive = np.cov(rows[:30], rowvar=False)
+    for row in rows[:30]:
+        recursive = 0.94 * recursive + 0.06 * np.outer(row, row)
+    np.testing.assert_allclose(stats.cov, recursive, rtol=1e-12)
+    for row in rows[30:]:
+        stats.update(row)
+        recursive = 0.94 * recursive + 0.06 * np.outer(row, row)
+    np.testing.assert_allclose(stats.cov, recursive, rtol=1e-12)
+    assert stats.corr[0, 0] == pytest.approx(1.0)
@@ -0,0 +1,12 @@
+from utils.instrumentation import BUCKETS_MS, Metrics
+
+
+def test_histogram_buckets_are_half_open():
+    metrics = Metrics(log_path=None)
+    # A latency equal to a bound opens the next bucket: [0, 1), [1, 2), [2, 5), [5, 10), ...
+    for milliseconds in [0.5, 0.999, 1.0, 1.5, 4.999, 5.0, 10000.0, 20000.0]:
+        metrics.record("case", "calc", milliseconds / 1000)
+    expected = [0] * (len(BUCKETS_MS) + 1)
+    expected[:4] = [2, 2, 1, 1]
+    expected[-1] = 2
+    assert metrics.histograms["case"] == expected
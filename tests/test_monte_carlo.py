@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from utils.monte_carlo import METHODS, TailQuantile, simulate_var
+
+
+@pytest.fixture(scope="module")
+def returns():
+    rng = np.random.default_rng(6)
+    return rng.multivariate_normal([0.0005, 0.0003], [[4e-4, 1e-4], [1e-4, 2e-4]], size=500)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_seeded_runs_do_not_depend_on_chunks_or_workers(returns, method):
+    reference = simulate_var(returns, [0.6, 0.4], method=method, horizon=5, n_paths=45_500, seed=7)
+    for chunk_size, max_workers in [(1_000, 1), (7_000, 1), (100_000, 1), (3_000, 2)]:
+        result = simulate_var(returns, [0.6, 0.4], method=method, horizon=5, n_paths=45_500, chunk_size=chunk_size,
+                              max_workers=max_workers, seed=7)
+        assert result == reference
+
+
+def test_early_stopping_does_not_depend_on_chunks(returns):
+    runs = [simulate_var(returns, [0.6, 0.4], n_paths=1_000_000, chunk_size=chunk_size, seed=3, tolerance=0.05)
+            for chunk_size in (2_000, 10_000, 50_000)]
+    assert runs[0].converged and runs[0].paths < 1_000_000
+    assert runs[1] == runs[0] and runs[2] == runs[0]
+
+
+def test_seeds_give_different_paths(returns):
+    assert simulate_var(returns, [0.6, 0.4], n_paths=20_000, seed=1) != simulate_var(returns, [0.6, 0.4], n_paths=20_000, seed=2)
+
+
+def test_gbm_var_matches_the_normal_quantile(returns):
+    weights = np.array([0.6, 0.4])
+    log_returns = np.log1p(returns)
+    mu, sigma = log_returns.mean(axis=0) @ weights, np.sqrt(weights @ np.cov(log_returns, rowvar=False) @ weights)
+    result = simulate_var(returns, weights, 0.99, n_paths=200_000, seed=1)
+    assert result.var == pytest.approx(mu - 2.326 * sigma, rel=0.03)
+    assert result.cvar < result.var
+
+
+def test_tail_quantile_matches_a_full_sort():
+    values = np.random.default_rng(2).standard_normal(50_000)
+    tail = TailQuantile(0.95, len(values))
+    for chunk in np.array_split(values, 13):
+        tail.update(chunk)
+    var, cvar, (lower, upper) = tail.estimate()
+    ordered = np.sort(values)
+    k = int(0.05 * len(values))
+    assert var == ordered[k]
+    assert cvar == pytest.approx(ordered[:k + 1].mean())
+    assert lower <= var <= upper
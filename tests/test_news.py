@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from layouts.news import sentiment_summary
+from utils.fetch import EmptyDataError
+from utils.news import Lexicon, LocalFeedSource, NewsClient, NewsIndex, story_key
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>{ticker}</title>
+{items}
+</channel></rss>"""
+ITEM = "<item><title>{title}</title><link>{link}</link><pubDate>{published}</pubDate></item>"
+
+
+def write_feed(directory, ticker, items):
+    body = "\n".join(ITEM.format(title=t, link=f"https://example.com/{i}", published=p) for i, (t, p) in enumerate(items))
+    (directory / f"{ticker}.xml").write_text(FEED.format(ticker=ticker, items=body))
+
+
+@pytest.fixture(scope="module")
+def lexicon():
+    return Lexicon()
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Apple beats estimates", 1.0),
+    ("Apple not profitable, stock falls", -1.0),
+    # The negation flips only the first word it reaches and stops at punctuation
+    ("Not profitable, but beats estimates", 0.0),
+    ("Apple beats estimates despite debt concerns", -1 / 3),
+    ("Apple to hold annual meeting", 0.0),
+])
+def test_lexicon_score(lexicon, title, expected):
+    assert lexicon.score(title) == pytest.approx(expected)
+
+
+def test_story_key_ignores_source_and_punctuation():
+    assert story_key("Apple beats estimates - Reuters") == story_key("Apple beats  estimates! - Bloomberg")
+    assert story_key("Apple beats estimates - Reuters") != story_key("Apple misses estimates - Reuters")
+
+
+def test_client_deduplicates_stories_across_tickers(tmp_path, lexicon):
+    write_feed(tmp_path, "AAPL", [
+        ("Apple and Microsoft shares climb - Reuters", "Tue, 02 Jan 2024 15:00:00 GMT"),
+        ("Apple faces lawsuit - Bloomberg", "Mon, 01 Jan 2024 10:00:00 GMT"),
+    ])
+    write_feed(tmp_path, "MSFT", [
+        # Same story from another outlet, seen earlier
+        ("Apple and Microsoft shares climb - Bloomberg", "Tue, 02 Jan 2024 09:00:00 GMT"),
+    ])
+    client = NewsClient(LocalFeedSource(str(tmp_path)))
+    index, failures = client.collect(["AAPL", "MSFT", "AAPL", "NOPE"], lexicon)
+
+    assert list(failures) == ["NOPE"]
+    assert isinstance(failures["NOPE"], EmptyDataError)
+    assert len(index.stories) == 2
+    shared = index.stories[story_key("Apple and Microsoft shares climb")]
+    assert shared["published"] == pd.Timestamp("2024-01-02 09:00", tz="UTC")
+    assert index.tickers[story_key("Apple and Microsoft shares climb")] == {"AAPL", "MSFT"}
+    assert index.headlines("AAPL")["Title"].tolist() == [
+        "Apple and Microsoft shares climb - Reuters", "Apple faces lawsuit - Bloomberg",
+    ]
+    daily = index.daily_sentiment()
+    assert daily.loc[("MSFT", pd.Timestamp("2024-01-02")), "Headlines"] == 1
+    assert daily.loc[("AAPL", pd.Timestamp("2024-01-02")), "Sentiment"] == pytest.approx(1.0)
+    assert client.requests == 3
+
+
+def test_client_serves_fresh_feeds_from_cache_and_revalidates_stale_ones(tmp_path, lexicon):
+    write_feed(tmp_path, "AAPL", [("Apple beats estimates - Reuters", "Mon, 01 Jan 2024 10:00:00 GMT")])
+    client = NewsClient(LocalFeedSource(str(tmp_path)))
+    client.collect(["AAPL"], lexicon)
+    client.collect(["AAPL"], lexicon)
+    assert (client.requests, client.not_modified) == (1, 0)
+
+    client.cache.ttl = 0
+    index, _ = client.collect(["AAPL"], lexicon)
+    assert (client.requests, client.not_modified) == (2, 1)
+    assert len(index.stories) == 1
+
+
+def test_sentiment_summary_without_returns_is_missing(lexicon):
+    today = pd.Timestamp.now(tz="UTC").floor("D") + pd.Timedelta(hours=1)
+    index = NewsIndex(lexicon)
+    index.add("AAPL", [{"title": "Apple beats estimates", "link": "", "source": "", "published": today}])
+    # No risk state: no returns at all, which must not read as a 0% move
+    empty = pd.DataFrame(index=pd.DatetimeIndex([]), columns=["AAPL", "MSFT"], dtype=float)
+    summary = sentiment_summary(index, empty, days=7)
+    assert summary.loc["AAPL", "Headlines"] == 1
+    assert np.isnan(summary.loc["AAPL", "Return"])
+    assert np.isnan(summary.loc["MSFT", "Return"])
+
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=3)
+    returns = pd.DataFrame({"AAPL": [0.01, 0.02, -0.01], "MSFT": [np.nan] * 3}, index=dates)
+    summary = sentiment_summary(index, returns, days=30)
+    assert summary.loc["AAPL", "Return"] == pytest.approx(1.01 * 1.02 * 0.99 - 1)
+    assert np.isnan(summary.loc["MSFT", "Return"])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from utils.var_engine import CONFIDENCE_GRID, cornish_fisher_var, parametric_var, student_t_var, z_score, z_scores
+
+
+def test_z_scores_are_closed_form():
+    assert z_score(0.95) == pytest.approx(1.6448536269514722, abs=1e-12)
+    assert z_score(0.99) == pytest.approx(2.3263478740408408, abs=1e-12)
+    np.testing.assert_allclose(z_scores(CONFIDENCE_GRID), -stats.norm.ppf(1 - CONFIDENCE_GRID), atol=1e-12)
+
+
+def test_z_scores_are_deterministic():
+    assert z_score(0.975) == z_score(0.975)
+    np.testing.assert_array_equal(z_scores([0.9, 0.95]), z_scores(np.array([0.9, 0.95])))
+
+
+@pytest.fixture
+def returns():
+    return np.random.default_rng(4).normal(0.001, 0.02, size=(1000, 3))
+
+
+def test_parametric_var_is_mean_minus_z_sigma(returns):
+    var = parametric_var(returns, [0.95, 0.99])
+    expected = returns.mean(axis=0) - z_scores([0.95, 0.99])[:, None] * returns.std(axis=0)
+    np.testing.assert_allclose(var, expected, rtol=1e-12)
+
+
+def test_cornish_fisher_adjusts_for_sample_moments():
+    data = np.random.default_rng(5).standard_t(5, size=(2000, 1)) * 0.01
+    skew, kurtosis = stats.skew(data[:, 0]), stats.kurtosis(data[:, 0])
+    z = -z_score(0.99)
+    z_cf = z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurtosis / 24 - (2 * z ** 3 - 5 * z) * skew ** 2 / 36
+    assert cornish_fisher_var(data, [0.99])[0, 0] == pytest.approx(data.mean() + z_cf * data.std(), rel=1e-10)
+
+
+def test_student_t_var_converges_to_normal(returns):
+    np.testing.assert_allclose(student_t_var(returns, [0.99], dof=1e7), parametric_var(returns, [0.99]), rtol=1e-6)
+
+
+def test_student_t_var_is_fatter_than_normal(returns):
+    assert (student_t_var(returns, [0.99], dof=4) < parametric_var(returns, [0.99])).all()
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.price_store import FakeSource, PriceStore
+
+
+class CountingSource(FakeSource):
+    """FakeSource that records every range it is asked for."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def download(self, ticker, start, end):
+        self.calls.append((ticker, pd.Timestamp(start), pd.Timestamp(end)))
+        return super().download(ticker, start, end)
+
+
+def test_top_up_downloads_only_missing_ranges(tmp_path):
+    source = CountingSource()
+    store = PriceStore(root=str(tmp_path), source=source)
+    first = store.get("AAPL", "2020-01-01", "2021-01-01")
+    assert source.calls == [("AAPL", pd.Timestamp("2020-01-01"), pd.Timestamp("2021-01-01"))]
+
+    store.get("AAPL", "2020-03-01", "2020-06-01")
+    assert len(source.calls) == 1
+
+    wider = store.get("AAPL", "2019-07-01", "2021-04-01")
+    assert source.calls[1:] == [
+        ("AAPL", pd.Timestamp("2019-07-01"), pd.Timestamp("2020-01-01")),
+        ("AAPL", pd.Timestamp("2021-01-01"), pd.Timestamp("2021-04-01")),
+    ]
+    pd.testing.assert_frame_equal(wider.loc[first.index], first, check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(wider, FakeSource().download("AAPL", "2019-07-01", "2021-04-01"), check_freq=False, check_index_type=False)
+
+
+def test_store_is_shared_across_instances(tmp_path):
+    PriceStore(root=str(tmp_path), source=FakeSource()).get("MSFT", "2020-01-01", "2020-07-01")
+    source = CountingSource()
+    prices = PriceStore(root=str(tmp_path), source=source).get("MSFT", "2020-02-01", "2020-05-01")
+    assert source.calls == []
+    assert prices.index.min() >= pd.Timestamp("2020-02-01") and prices.index.max() < pd.Timestamp("2020-05-01")
+
+
+def test_concurrent_top_ups_do_not_corrupt_the_store(tmp_path):
+    stores = [PriceStore(root=str(tmp_path), source=FakeSource(latency=0.01)) for _ in range(4)]
+    ranges = [("2020-01-01", "2020-07-01"), ("2019-01-01", "2020-03-01"), ("2020-05-01", "2021-01-01"), ("2019-06-01", "2020-09-01")]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda args: args[0].get("IBM", *args[1]), zip(stores, ranges)))
+
+    stored, coverage, _ = PriceStore(root=str(tmp_path))._read("IBM")
+    assert coverage == (pd.Timestamp("2019-01-01"), pd.Timestamp("2021-01-01"))
+    pd.testing.assert_frame_equal(stored, FakeSource().download("IBM", "2019-01-01", "2021-01-01"), check_freq=False, check_index_type=False)
+    assert not list(tmp_path.glob("IBM/*.tmp"))
+
+
+def test_weekly_bars_are_resampled_from_stored_days(tmp_path):
+    store = PriceStore(root=str(tmp_path), source=FakeSource())
+    daily = store.get("AAPL", "2020-01-06", "2020-03-02")
+    weekly = store.get("AAPL", "2020-01-06", "2020-03-02", granularity="Weekly")
+    assert len(weekly) == 8
+    assert weekly["Close"].iloc[0] == daily["Close"].iloc[4]
+    assert weekly["High"].iloc[0] == daily["High"].iloc[:5].max()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.returns_block import ReturnsBlock
+
+
+@pytest.fixture
+def block():
+    dates = pd.bdate_range("2024-01-01", periods=6)
+    values = np.arange(24, dtype=float).reshape(6, 4) / 100
+    values[1, 2] = np.nan
+    return ReturnsBlock(values, dates, ["A", "B", "C", "D"])
+
+
+def test_views_share_memory_and_are_read_only(block):
+    window = block.window("2024-01-02", "2024-01-04")
+    assert len(window) == 3 and np.shares_memory(window.values, block.values)
+    assert np.shares_memory(block.column("B"), block.values)
+    assert np.shares_memory(block.tail(2).values, block.values)
+    adjacent = block.select(["B", "C"])
+    assert np.shares_memory(adjacent.values, block.values)
+    frame = block.frame()
+    assert np.shares_memory(frame.to_numpy(), block.values)
+
+    for view in [block.values, window.values, block.column("B"), adjacent.values]:
+        with pytest.raises(ValueError, match="read-only"):
+            view[0] = 1.0
+    with pytest.raises(ValueError, match="read-only"):
+        frame.iloc[0, 0] = 1.0
+    assert block.values[0, 0] == 0.0
+
+
+def test_select_copies_non_adjacent_columns(block):
+    selected = block.select(["D", "A"])
+    assert not np.shares_memory(selected.values, block.values)
+    assert selected.tickers == ["D", "A"]
+    np.testing.assert_array_equal(selected.values, block.values[:, [3, 0]])
+    with pytest.raises(ValueError, match="read-only"):
+        selected.values[0, 0] = 1.0
+
+
+def test_constructor_does_not_lock_the_callers_array():
+    values = np.zeros((2, 1))
+    ReturnsBlock(values, pd.bdate_range("2024-01-01", periods=2), ["A"])
+    values[0, 0] = 1.0
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_save_and_memory_mapped_load_round_trip(tmp_path, block, dtype):
+    block = block.astype(dtype)
+    block.save(tmp_path / "block")
+    loaded = ReturnsBlock.load(tmp_path / "block")
+    assert isinstance(loaded.values.base, np.memmap)
+    assert loaded.dtype == dtype
+    assert loaded.tickers == block.tickers
+    assert loaded.dates.equals(block.dates)
+    np.testing.assert_array_equal(loaded.values, block.values)
+    with pytest.raises(ValueError, match="read-only"):
+        loaded.values[0, 0] = 1.0
+    in_memory = ReturnsBlock.load(tmp_path / "block", mmap=False)
+    assert not isinstance(in_memory.values.base, np.memmap)
+    np.testing.assert_array_equal(in_memory.values, block.values)
+
+
+def test_save_replaces_previous_block_without_temporary_files(tmp_path, block):
+    block.save(tmp_path)
+    block.select(["A", "B"]).tail(2).save(tmp_path)
+    loaded = ReturnsBlock.load(tmp_path)
+    assert loaded.tickers == ["A", "B"] and len(loaded) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".lock", "dates.npy", "tickers.json", "values.npy"]
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.price_store import FakeSource, PriceStore
+from utils.scenarios import evaluate, factor_grid, historical_moves, library_shocks, loss_table, shock_matrix
+
+ASSETS = ["AAPL", "MSFT", "XOM"]
+EXPOSURES = pd.DataFrame({"Equity": [1.2, 1.0, 0.8], "Oil": [0.0, 0.1, 0.9]}, index=ASSETS)
+SCENARIOS = [
+    {"name": "Crash", "type": "uniform", "shock": -30},
+    {"name": "Tech", "type": "asset", "shocks": {"AAPL": -20, "MSFT": -15}, "default": -5},
+    {"name": "Oil Spike", "type": "factor", "shocks": {"Oil": 40, "Equity": -5}},
+    {"name": "Replay", "type": "historical", "start": "2020-02-19", "end": "2020-03-23"},
+]
+
+
+def test_shock_matrix_builds_every_scenario_type():
+    moves = pd.DataFrame({"AAPL": [-0.3], "MSFT": [-0.25], "XOM": [np.nan], "SPY": [-0.33], "USO": [-0.5]},
+                         index=["Replay"])
+    shocks = shock_matrix(SCENARIOS, ASSETS, EXPOSURES, moves, {"Equity": "SPY", "Oil": "USO"})
+    assert list(shocks.index) == ["Crash", "Tech", "Oil Spike", "Replay"]
+    np.testing.assert_allclose(shocks.loc["Crash"], -0.3)
+    np.testing.assert_allclose(shocks.loc["Tech"], [-0.2, -0.15, -0.05])
+    np.testing.assert_allclose(shocks.loc["Oil Spike"], EXPOSURES.to_numpy() @ [-0.05, 0.4])
+    # XOM has no prices in the window, so it moves with its betas on the factor proxies
+    np.testing.assert_allclose(shocks.loc["Replay"], [-0.3, -0.25, 0.8 * -0.33 + 0.9 * -0.5])
+
+
+def test_evaluate_one_or_many_portfolios():
+    shocks = shock_matrix(SCENARIOS[:3], ASSETS, EXPOSURES)
+    weights = pd.DataFrame([[0.5, 0.5, 0.0], [0.2, 0.3, 0.5]], index=["Tech", "Mixed"], columns=ASSETS)
+    single = evaluate(shocks, weights.loc["Mixed"].to_numpy())
+    both = evaluate(shocks, weights[["XOM", "AAPL", "MSFT"]])
+    np.testing.assert_allclose(both["Mixed"], single)
+    np.testing.assert_allclose(both["Tech"], shocks.to_numpy() @ [0.5, 0.5, 0.0])
+
+
+def test_loss_table_ranks_worst_first():
+    shocks = shock_matrix(SCENARIOS[:3], ASSETS, EXPOSURES)
+    table = loss_table(shocks, [0.2, 0.3, 0.5], SCENARIOS[:3])
+    assert table["Scenario"].iloc[0] == "Crash"
+    assert table["Portfolio Return (%)"].is_monotonic_increasing
+    assert table.loc[table["Scenario"] == "Tech", "Worst Asset"].item() == "MSFT"
+
+
+def test_factor_grid_covers_every_combination():
+    grid = factor_grid({"Equity": [-20, 0, 10], "Rates": [-5, 5, 10]})
+    assert len(grid) == 6
+    assert {"Equity": -10.0, "Rates": 5.0} in [s["shocks"] for s in grid]
+
+
+def test_historical_windows_are_loaded_one_at_a_time():
+    index = pd.bdate_range("2008-01-01", "2022-12-30")
+    prices = pd.DataFrame({"A": np.linspace(100, 200, len(index))}, index=index)
+    requested = []
+
+    def get_prices(tickers, start, end):
+        requested.append((start, end))
+        return prices.loc[start:end - pd.Timedelta(days=1), tickers]
+
+    scenarios = [{"name": "GFC", "type": "historical", "start": "2008-09-01", "end": "2009-03-10"},
+                 {"name": "Crash", "type": "uniform", "shock": -30},
+                 {"name": "2022", "type": "historical", "start": "2022-01-03", "end": "2022-10-14"}]
+    moves = historical_moves(scenarios, ["A"], get_prices)
+    assert requested == [(pd.Timestamp("2008-09-01"), pd.Timestamp("2009-03-11")),
+                         (pd.Timestamp("2022-01-03"), pd.Timestamp("2022-10-15"))]
+    assert list(moves.index) == ["GFC", "2022"]
+    window = prices.loc["2022-01-03":"2022-10-14", "A"]
+    assert moves.loc["2022", "A"] == pytest.approx(window.iloc[-1] / window.iloc[0] - 1)
+
+
+def test_library_with_assets_that_are_also_factor_proxies(tmp_path):
+    store = PriceStore(root=str(tmp_path), source=FakeSource())
+    shocks, _, exposures, _ = library_shocks(["SPY", "AAPL"], store, "2021-01-01", "2022-01-01")
+    assert exposures.loc["SPY", "Equity"] == pytest.approx(1.0)
+    window = store.get_prices(["SPY"], "2008-09-01", "2009-03-11")["SPY"]
+    assert shocks.loc["Global Financial Crisis (2008)", "SPY"] == pytest.approx(window.iloc[-1] / window.iloc[0] - 1)
+
+
+def test_library_drops_factors_without_proxy_prices(tmp_path):
+    store = PriceStore(root=str(tmp_path), source=FakeSource(empty=["USO"]))
+    shocks, scenarios, exposures, dropped = library_shocks(["AAPL", "MSFT"], store, "2021-01-01", "2022-01-01")
+    assert set(dropped) == {"Oil"}
+    assert "Oil" not in exposures.columns
+    assert "Oil Spike" not in shocks.index and "Equity Selloff" in shocks.index
+    assert {"Global Financial Crisis (2008)", "2022 Rate Shock"} <= set(shocks.index)
+    assert not shocks.isna().any().any()
+    assert len(scenarios) == len(shocks)
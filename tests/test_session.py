@@ -0,0 +1,11 @@
+import pandas as pd
+
+from layouts.session import portfolio_fingerprint, portfolio_tickers
+
+
+def test_portfolio_tickers_share_one_key():
+    raw = pd.DataFrame({"Asset": ["aapl", " MSFT ", "AAPL", ""], "Weight": [0.25, 0.5, 0.25, 0.0]})
+    clean = pd.DataFrame({"Asset": ["AAPL", "MSFT", "AAPL", ""], "Weight": [0.25, 0.5, 0.25, 0.0]})
+    assert portfolio_tickers(raw) == ("AAPL", "MSFT")
+    assert portfolio_tickers(raw) == portfolio_tickers(clean)
+    assert portfolio_fingerprint(raw) == portfolio_fingerprint(clean)
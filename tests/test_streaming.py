@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from utils.incremental_stats import RunningCovariance
+from utils.price_store import FIELDS
+from utils.streaming import BarStore, LiveRisk, RingBuffer
+
+
+def bar(price):
+    return [price if field == "Close" else np.nan for field in FIELDS]
+
+
+def test_ring_buffer_wraps_around_oldest_first():
+    buffer = RingBuffer(capacity=3)
+    times = pd.date_range("2024-01-01", periods=5, freq="min")
+    for i, time in enumerate(times):
+        buffer.append(time, bar(100.0 + i))
+    assert len(buffer) == 3
+    assert buffer.last_time == times[-1]
+    stamps, values = buffer.since()
+    assert list(pd.DatetimeIndex(stamps)) == list(times[2:])
+    assert values[:, FIELDS.index("Close")].tolist() == [102.0, 103.0, 104.0]
+    stamps, values = buffer.since(times[3])
+    assert list(pd.DatetimeIndex(stamps)) == [times[4]]
+    # Copies, so later appends do not change what a reader already has
+    buffer.append(times[-1] + pd.Timedelta(minutes=1), bar(105.0))
+    assert values[0, FIELDS.index("Close")] == 104.0
+    assert buffer.to_frame()["Close"].tolist() == [103.0, 104.0, 105.0]
+
+
+def test_live_risk_skips_returns_before_first_bar():
+    store = BarStore(capacity=100)
+    times = pd.date_range("2024-01-01", periods=6, freq="min")
+    a = [100.0, 101.0, 99.0, 102.0, 103.0, 101.0]
+    b = [np.nan, np.nan, 50.0, 51.0, 50.5, 52.0]
+    for time, price_a, price_b in zip(times, a, b):
+        store.push("A", time, bar(price_a))
+        if not np.isnan(price_b):
+            store.push("B", time, bar(price_b))
+
+    live = LiveRisk(["A", "B"], [0.5, 0.5], window=10)
+    assert live.update(store) == len(times)
+    # B's first bar comes at times[2], so the first return is the one ending at times[3]
+    returns = pd.DataFrame({"A": a, "B": b}, index=times).pct_change().iloc[3:]
+    assert list(pd.DatetimeIndex([time for time, _ in live.history])) == list(returns.index)
+    np.testing.assert_allclose([r for _, r in live.history], returns.to_numpy() @ live.weights)
+    np.testing.assert_allclose(live.stats.cov, np.cov(returns.to_numpy(), rowvar=False))
+    np.testing.assert_allclose(live.last_prices, [a[-1], b[-1]])
+
+
+def test_live_risk_window_rolls_off_oldest_returns():
+    store = BarStore(capacity=100)
+    rng = np.random.default_rng(0)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (40, 2)), axis=0)
+    times = pd.date_range("2024-01-01", periods=len(prices), freq="min")
+    live = LiveRisk(["A", "B"], [0.6, 0.4], window=10)
+    for time, row in zip(times, prices):
+        store.push("A", time, bar(row[0]))
+        store.push("B", time, bar(row[1]))
+        live.update(store)
+    returns = prices[1:] / prices[:-1] - 1
+    expected = RunningCovariance(2)
+    for row in returns[-10:]:
+        expected.update(row)
+    assert live.var()["Bars"] == 10
+    np.testing.assert_allclose(live.stats.cov, expected.cov)
+    np.testing.assert_allclose(live.stats.mean, expected.mean)
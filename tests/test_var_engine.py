@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.returns_block import ReturnsBlock
+from utils.var_engine import CONFIDENCE_GRID, VarTable, historical_var_cvar
+
+
+def baseline_var(data, confidence_level):
+    """The original per-call calculate_var of the VaR tab: sort and index."""
+    sorted_returns = np.sort(data)
+    return sorted_returns[int((1 - confidence_level) * len(sorted_returns))]
+
+
+def baseline_cvar(data, confidence_level):
+    var = baseline_var(data, confidence_level)
+    return data[data <= var].mean()
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(3)
+    return rng.standard_t(4, size=(757, 5)) * 0.01
+
+
+def test_matches_baseline_for_every_asset_and_level(returns):
+    var, cvar = historical_var_cvar(returns, CONFIDENCE_GRID)
+    assert var.shape == cvar.shape == (len(CONFIDENCE_GRID), returns.shape[1])
+    for i, level in enumerate(CONFIDENCE_GRID):
+        for j in range(returns.shape[1]):
+            assert var[i, j] == baseline_var(returns[:, j], level)
+            assert cvar[i, j] == pytest.approx(baseline_cvar(returns[:, j], level), rel=1e-12)
+
+
+def test_missing_values_are_skipped_per_column(returns):
+    returns = returns.copy()
+    returns[:200, 1] = np.nan
+    returns[::7, 3] = np.nan
+    var, cvar = historical_var_cvar(pd.DataFrame(returns), [0.95, 0.99])
+    for i, level in enumerate([0.95, 0.99]):
+        for j in range(returns.shape[1]):
+            column = returns[:, j][~np.isnan(returns[:, j])]
+            assert var[i, j] == baseline_var(column, level)
+            assert cvar[i, j] == pytest.approx(baseline_cvar(column, level), rel=1e-12)
+
+
+def test_float32_block_gives_float64_results(returns):
+    block = ReturnsBlock(returns.astype(np.float32), pd.bdate_range("2020-01-01", periods=len(returns)), list("ABCDE"))
+    var, cvar = historical_var_cvar(block, [0.95])
+    assert var.dtype == cvar.dtype == np.float64
+    expected = [baseline_var(returns.astype(np.float32)[:, j], 0.95) for j in range(5)]
+    np.testing.assert_array_equal(var[0], expected)
+
+
+def test_empty_and_all_missing_columns_are_nan():
+    var, cvar = historical_var_cvar(np.empty((0, 2)), [0.95, 0.99])
+    assert var.shape == (2, 2) and np.isnan(var).all() and np.isnan(cvar).all()
+    data = np.column_stack([np.linspace(-0.05, 0.05, 100), np.full(100, np.nan)])
+    var, cvar = historical_var_cvar(data, [0.95])
+    assert var[0, 0] == baseline_var(data[:, 0], 0.95)
+    assert np.isnan(var[0, 1]) and np.isnan(cvar[0, 1])
+
+
+def test_var_table_lookup(returns):
+    table = VarTable(pd.DataFrame(returns, columns=list("ABCDE")))
+    metrics = table.lookup(0.97, "C")
+    assert metrics["VaR"] == baseline_var(returns[:, 2], 0.97)
+    assert metrics["CVaR"] == pytest.approx(baseline_cvar(returns[:, 2], 0.97))
+    with pytest.raises(KeyError):
+        table.lookup(0.975)
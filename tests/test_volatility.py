@@ -0,0 +1,57 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from utils.volatility import VolatilityFit, conditional_variance, fit, load_parameters, save_parameters
+
+
+def simulate_garch(n, omega=2e-6, alpha=0.08, beta=0.9, seed=0):
+    rng = np.random.default_rng(seed)
+    returns = np.empty(n)
+    variance = omega / (1 - alpha - beta)
+    for t in range(n):
+        returns[t] = np.sqrt(variance) * rng.standard_normal()
+        variance = omega + alpha * returns[t] ** 2 + beta * variance
+    return returns
+
+
+def test_filter_matches_the_recursion():
+    returns = simulate_garch(300)
+    params = {"omega": 1e-6, "alpha": 0.05, "gamma": 0.1, "beta": 0.85}
+    variance, forecast = conditional_variance(returns, "gjr", params, 1e-4)
+    expected = [1e-4]
+    for r in returns:
+        expected.append(params["omega"] + (params["alpha"] + params["gamma"] * (r < 0)) * r ** 2 + params["beta"] * expected[-1])
+    np.testing.assert_allclose(variance, expected[:-1], rtol=1e-10)
+    assert forecast == pytest.approx(expected[-1], rel=1e-10)
+
+
+def test_warm_start_reaches_the_same_fit():
+    returns = simulate_garch(2000)
+    cold = fit(returns, "garch")
+    warm = fit(returns, "garch", previous=cold.params)
+    assert cold.converged and warm.converged
+    assert warm.log_likelihood == pytest.approx(cold.log_likelihood, rel=1e-6)
+    assert cold.params["alpha"] + cold.params["beta"] == pytest.approx(0.98, abs=0.03)
+
+
+def test_concurrent_saves_keep_every_asset(tmp_path):
+    path = str(tmp_path / "params.json")
+
+    def save(i):
+        fits = {f"A{i}": VolatilityFit("ewma", {"lam": 0.9 + i / 1000}, np.empty(0), 0.01, 0.0)}
+        save_parameters("ewma", fits, path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(save, range(40)))
+    assert load_parameters("ewma", path) == {f"A{i}": {"lam": 0.9 + i / 1000} for i in range(40)}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["params.json", "params.json.lock"]
+
+
+def test_unconverged_fits_are_not_saved(tmp_path):
+    path = str(tmp_path / "params.json")
+    save_parameters("garch", {"A": VolatilityFit("garch", {"omega": 1.0}, np.empty(0), 0.01, 0.0, converged=False)}, path)
+    with open(path) as f:
+        assert json.load(f) == {"garch": {}}